@@ -3,8 +3,17 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config.database import Config
 from models import init_db, db
-from utils.metrics import metrics_collector
+from utils.metrics import metrics_collector, install_query_timing, get_request_db_stats, EXCLUDED_ENDPOINTS
+from utils.identity import is_token_revoked, get_verified_user_id
+from utils.system_sampler import system_sampler
+from utils.metrics_history import metrics_history
+from utils.nplusone import install_nplusone_detection
+from utils.count_cache import install_table_change_tracking
+from utils.counters import install_counters
+from utils.typeahead import install_typeahead
+from utils.profiler import start_request_profile, finish_request_profile, discard_request_profile
 import os
+import time
 
 def create_app():
     app = Flask(__name__)
@@ -27,9 +36,14 @@ def create_app():
     CORS(app, 
          resources={r"/api/*": {"origins": frontend_url if frontend_url != '*' else "*"}},
          supports_credentials=True,
-         allow_headers=["Content-Type", "Authorization"])
+         allow_headers=["Content-Type", "Authorization", "X-Profile"],
+         expose_headers=["X-Profile-Id", "Server-Timing"])
     # JWTManager là một extension của Flask-JWT-Extended để quản lý JWT token, token sẽ biến mất sau khi đăng nhập khoảng 1 giờ, 1 giờ này là default của JWTManager 
     jwt = JWTManager(app)
+    # token của user đã bị đổi role/khóa/xóa sẽ bị từ chối (xem utils/identity.py)
+    @jwt.token_in_blocklist_loader
+    def _check_token_revoked(jwt_header, jwt_payload):
+        return is_token_revoked(jwt_payload)
     
     # Import and register blueprints
     from routes.auth import auth_bp
@@ -66,34 +80,55 @@ def create_app():
             }
         })
     
+    install_query_timing()
+    install_nplusone_detection(app)
+    install_table_change_tracking()
+    install_counters(app)
+    install_typeahead()
+    system_sampler.ensure_started()
+    metrics_history.ensure_started()
+
     @app.before_request
     def _metrics_before_request():
-        g._metrics_start = os.times()[4] if hasattr(os, 'times') else None
+        g._metrics_start = time.perf_counter()
+        start_request_profile()
 
     @app.after_request
     def _metrics_after_request(response):
         try:
             start = getattr(g, '_metrics_start', None)
-            if start is not None:
-                end = os.times()[4] if hasattr(os, 'times') else None
-                duration_ms = max((end - start) * 1000.0, 0) if end is not None else 0
-            else:
-                duration_ms = 0
-            # try to read user id from JWT if present
-            user_id = None
-            try:
-                from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-                verify_jwt_in_request(optional=True)
-                identity = get_jwt_identity()
-                if identity is not None:
-                    user_id = int(identity)
-            except Exception:
-                user_id = None
-            metrics_collector.record_request(response.status_code, duration_ms, user_id)
+            duration_ms = (time.perf_counter() - start) * 1000.0 if start is not None else 0
+            db_time_ms, db_queries = get_request_db_stats()
+            if app.config.get('SERVER_TIMING'):
+                # hiển thị thời gian SQL/Python của request trong tab Network của devtools
+                response.headers['Server-Timing'] = (
+                    f'db;dur={db_time_ms:.1f};desc="{db_queries} queries", '
+                    f'app;dur={max(duration_ms - db_time_ms, 0):.1f}, '
+                    f'total;dur={duration_ms:.1f}'
+                )
+                response.headers['Timing-Allow-Origin'] = frontend_url
+            finish_request_profile(response, duration_ms)
+            if request.endpoint in EXCLUDED_ENDPOINTS:
+                return response
+            # dùng url rule (vd: /api/teams/<int:team_id>) thay vì path thật để số route được theo dõi luôn có giới hạn
+            # user id lấy từ JWT đã được xác thực trong request (nếu có), không decode token lần nữa
+            metrics_collector.record_request(
+                response.status_code, duration_ms, get_verified_user_id(),
+                method=request.method,
+                route=request.url_rule.rule if request.url_rule else None,
+                blueprint=request.blueprint,
+                db_time_ms=db_time_ms,
+                db_queries=db_queries
+            )
+            metrics_history.ensure_started()
         except Exception:
             pass
         return response
 
+    @app.teardown_request
+    def _profile_teardown(exc):
+        discard_request_profile()
+
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Not found'}), 404
@@ -0,0 +1,124 @@
+"""
+Script benchmark đăng nhập đồng thời (mô phỏng lúc đầu học kỳ cả lớp cùng đăng nhập)
+So sánh p95 của /api/auth/login và của một endpoint nhẹ chạy song song khi:
+  - before: băm mật khẩu trực tiếp trên thread của request (PASSWORD_HASH_WORKERS=0)
+  - after:  băm mật khẩu trên PasswordHashPool có giới hạn
+
+Chạy với SQLite tạm để không đụng tới database thật:
+    python benchmark_login.py --users 50 --concurrency 32 --rounds 3
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import threading
+
+# luôn ghi đè (không setdefault): môi trường deploy đã export DATABASE_URL của database thật
+_db_dir = tempfile.mkdtemp(prefix='bench-login-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(_db_dir, 'uploads')
+
+from app import create_app
+from models import db, User
+from utils import password_hashing
+from utils.password_hashing import PasswordHashPool
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[int(pct * (len(values) - 1))]
+
+
+def run_load(app, usernames, concurrency, rounds):
+    """Mỗi thread đăng nhập lần lượt, thêm 1 thread gọi endpoint nhẹ để đo ảnh hưởng tới request khác"""
+    login_ms, other_ms, errors = [], [], []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login_worker(names):
+        client = app.test_client()
+        for _ in range(rounds):
+            for name in names:
+                start = time.perf_counter()
+                response = client.post('/api/auth/login', json={'username': name, 'password': 'bench123'})
+                elapsed = (time.perf_counter() - start) * 1000.0
+                with lock:
+                    login_ms.append(elapsed)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+
+    def other_worker():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            with lock:
+                other_ms.append((time.perf_counter() - start) * 1000.0)
+            time.sleep(0.005)
+
+    chunks = [usernames[i::concurrency] for i in range(concurrency)]
+    threads = [threading.Thread(target=login_worker, args=(chunk,)) for chunk in chunks if chunk]
+    background = threading.Thread(target=other_worker)
+    started = time.perf_counter()
+    background.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    background.join()
+    wall = time.perf_counter() - started
+
+    return {
+        'logins': len(login_ms),
+        'errors': len(errors),
+        'wall_s': round(wall, 2),
+        'login_p50_ms': round(percentile(login_ms, 0.50), 1),
+        'login_p95_ms': round(percentile(login_ms, 0.95), 1),
+        'other_p95_ms': round(percentile(other_ms, 0.95), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login p95 under concurrent load')
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=password_hashing.PASSWORD_HASH_WORKERS,
+                        help='số thread của pool ở lần chạy "after"')
+    args = parser.parse_args()
+
+    app = create_app()
+    usernames = [f'bench_user_{i}' for i in range(args.users)]
+    with app.app_context():
+        User.query.filter(User.username.in_(usernames)).delete(synchronize_session=False)
+        for name in usernames:
+            user = User(username=name, email=f'{name}@bench.local', role='student')
+            user.set_password('bench123')
+            db.session.add(user)
+        db.session.commit()
+
+    results = {}
+    try:
+        for label, workers in [('before (inline)', 0), (f'after (pool={args.workers})', args.workers)]:
+            password_hashing.password_hash_pool = PasswordHashPool(workers=workers, max_queue=10 ** 6)
+            results[label] = run_load(app, usernames, args.concurrency, args.rounds)
+            results[label]['max_queued'] = password_hashing.password_hash_pool.stats()['max_queued']
+    finally:
+        # không để lại tài khoản có mật khẩu đã biết
+        with app.app_context():
+            User.query.filter(User.username.in_(usernames)).delete(synchronize_session=False)
+            db.session.commit()
+
+    print(f"\nusers={args.users} concurrency={args.concurrency} rounds={args.rounds} cpu={os.cpu_count()}")
+    columns = ['logins', 'errors', 'wall_s', 'login_p50_ms', 'login_p95_ms', 'other_p95_ms', 'max_queued']
+    print(f"{'mode':<20}" + ''.join(f'{c:>14}' for c in columns))
+    for label, row in results.items():
+        print(f'{label:<20}' + ''.join(f'{row[c]:>14}' for c in columns))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -64,3 +64,10 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-string'
     JWT_ACCESS_TOKEN_EXPIRES = False
+    # Thêm header Server-Timing (thời gian SQL, số query, tổng thời gian) vào mỗi response
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'false').lower() == 'true'
+    # Token cho Prometheus scrape /api/monitor/metrics (Authorization: Bearer <token>); không set thì cần JWT admin
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Phát hiện N+1 query khi dev/test: off | warn | raise, và số lần 1 câu query được lặp trong 1 request
+    NPLUSONE_DETECTION = os.environ.get('NPLUSONE_DETECTION', 'off')
+    NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
@@ -0,0 +1,44 @@
+"""sort key indexes
+
+Index (cột, id) cho các cột được phép dùng trong ?sort= để phân trang keyset đọc theo index thay vì quét + sort
+cả bảng. Database mới đã có các index này từ db.create_all(), nên chỉ tạo index còn thiếu.
+
+Revision ID: 38199d638373
+Revises: 
+Create Date: 2026-10-18 10:18:24.746070
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '38199d638373'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_students_full_name_id', 'students', ['full_name', 'id']),
+    ('ix_teachers_full_name_id', 'teachers', ['full_name', 'id']),
+    ('ix_projects_title_id', 'projects', ['title', 'id']),
+    ('ix_projects_deadline_id', 'projects', ['deadline', 'id']),
+    ('ix_project_submissions_submitted_at_id', 'project_submissions', ['submitted_at', 'id']),
+    ('ix_teams_team_name_id', 'teams', ['team_name', 'id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
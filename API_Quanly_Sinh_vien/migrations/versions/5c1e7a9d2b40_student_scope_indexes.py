@@ -0,0 +1,41 @@
+"""student scope indexes
+
+Index cho danh sách chỉ thuộc về 1 sinh viên (team / project / submission của sinh viên đó): JOIN / EXISTS trên
+team_members đọc theo (student_id, status, team_id), EXISTS bài nộp cá nhân đọc theo (student_id, project_id).
+Database mới đã có các index này từ db.create_all(), nên chỉ tạo index còn thiếu.
+
+Revision ID: 5c1e7a9d2b40
+Revises: 38199d638373
+Create Date: 2026-10-18 11:02:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d2b40'
+down_revision = '38199d638373'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_team_members_student_status', 'team_members', ['student_id', 'status', 'team_id']),
+    ('ix_project_submissions_student_project', 'project_submissions', ['student_id', 'project_id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
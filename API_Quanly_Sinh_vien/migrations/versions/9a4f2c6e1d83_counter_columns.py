@@ -0,0 +1,72 @@
+"""counter columns
+
+Cột đếm teams.active_member_count, projects.team_count, projects.submission_count và
+projects.<status>_submission_count (xem utils/counters.py). Database mới đã có các cột này từ db.create_all(),
+nên chỉ thêm cột còn thiếu rồi tính giá trị ban đầu cho cột vừa thêm từ dữ liệu thật.
+
+Revision ID: 9a4f2c6e1d83
+Revises: 5c1e7a9d2b40
+Create Date: 2026-10-18 11:24:07.093516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f2c6e1d83'
+down_revision = '5c1e7a9d2b40'
+branch_labels = None
+depends_on = None
+
+SUBMISSION_STATUSES = ('draft', 'submitted', 'under_review', 'approved', 'rejected', 'revision_required')
+PROJECT_COLUMNS = ['team_count', 'submission_count', *(f'{status}_submission_count' for status in SUBMISSION_STATUSES)]
+
+# chỉ các cột migration đọc / ghi (không import models: migration phải chạy được với schema của thời điểm này)
+teams = sa.table('teams', sa.column('id'), sa.column('project_id'), sa.column('status'),
+                 sa.column('active_member_count'))
+team_members = sa.table('team_members', sa.column('id'), sa.column('team_id'), sa.column('status'))
+projects = sa.table('projects', sa.column('id'), *(sa.column(column) for column in PROJECT_COLUMNS))
+submissions = sa.table('project_submissions', sa.column('id'), sa.column('project_id'), sa.column('status'))
+
+
+def _count(table, *conditions):
+    return sa.select(sa.func.count(table.c.id)).where(*conditions).scalar_subquery()
+
+
+def _counts():
+    """{bảng: {cột counter: subquery đếm từ bảng con}}, giống _counter_columns() trong utils/counters.py"""
+    project_counts = {
+        'team_count': _count(teams, teams.c.project_id == projects.c.id, teams.c.status != 'disbanded'),
+        'submission_count': _count(submissions, submissions.c.project_id == projects.c.id),
+    }
+    for status in SUBMISSION_STATUSES:
+        project_counts[f'{status}_submission_count'] = _count(
+            submissions, submissions.c.project_id == projects.c.id, submissions.c.status == status)
+    return {
+        teams: {'active_member_count': _count(
+            team_members, team_members.c.team_id == teams.c.id, team_members.c.status == 'active')},
+        projects: project_counts,
+    }
+
+
+def _existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    for table, counts in _counts().items():
+        existing = _existing_columns(table.name)
+        added = [column for column in counts if column not in existing]
+        for column in added:
+            op.add_column(table.name, sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+        if added:
+            op.execute(table.update().values({column: counts[column] for column in added}))
+
+
+def downgrade():
+    for table, counts in _counts().items():
+        existing = _existing_columns(table.name)
+        for column in counts:
+            if column in existing:
+                op.drop_column(table.name, column)
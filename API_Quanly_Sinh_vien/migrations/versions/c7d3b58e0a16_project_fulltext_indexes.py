@@ -0,0 +1,45 @@
+"""project fulltext indexes
+
+Index FULLTEXT cho ?q= của GET /api/projects (xem utils/project_search.py), chỉ có trên MySQL: SQLite dùng
+inverted index trong bộ nhớ nên migration không làm gì. Database mới đã có các index này từ db.create_all(),
+nên chỉ tạo index còn thiếu.
+
+Revision ID: c7d3b58e0a16
+Revises: 9a4f2c6e1d83
+Create Date: 2026-10-18 11:47:52.260841
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d3b58e0a16'
+down_revision = '9a4f2c6e1d83'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ft_projects_search', 'projects', ['title', 'description', 'technology_stack']),
+    ('ft_projects_title', 'projects', ['title']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    for name, table, _ in INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
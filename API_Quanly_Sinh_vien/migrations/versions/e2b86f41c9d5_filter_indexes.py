@@ -0,0 +1,53 @@
+"""filter indexes
+
+Index cho các filter thường dùng của endpoint danh sách (khóa ngoại + status, học kỳ, chuyên ngành...), theo dạng
+WHERE ... ORDER BY id LIMIT của paginate(). Database mới đã có các index này từ db.create_all(), nên chỉ tạo
+index còn thiếu.
+
+Revision ID: e2b86f41c9d5
+Revises: c7d3b58e0a16
+Create Date: 2026-10-18 12:06:15.873402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b86f41c9d5'
+down_revision = 'c7d3b58e0a16'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_students_major_status', 'students', ['major', 'status']),
+    ('ix_students_status', 'students', ['status']),
+    ('ix_teachers_department_status', 'teachers', ['department', 'status']),
+    ('ix_projects_status', 'projects', ['status']),
+    ('ix_projects_term_status', 'projects', ['academic_year', 'semester', 'status']),
+    ('ix_projects_supervisor_status', 'projects', ['supervisor_id', 'status']),
+    ('ix_project_documents_project', 'project_documents', ['project_id']),
+    ('ix_teams_project_status', 'teams', ['project_id', 'status']),
+    ('ix_project_submissions_project_status', 'project_submissions', ['project_id', 'status']),
+    ('ix_project_submissions_team_status', 'project_submissions', ['team_id', 'status']),
+    ('ix_project_submissions_status_category', 'project_submissions', ['status', 'submission_category']),
+    ('ix_project_evaluations_submission_type', 'project_evaluations', ['submission_id', 'evaluator_type']),
+    ('ix_project_evaluations_project_type', 'project_evaluations', ['project_id', 'evaluator_type']),
+    ('ix_project_evaluations_teacher', 'project_evaluations', ['evaluator_teacher_id']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in INDEXES:
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
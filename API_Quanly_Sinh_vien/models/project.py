@@ -23,6 +23,31 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Cột đếm, được cập nhật cùng transaction khi ghi Team / ProjectSubmission (xem utils/counters.py)
+    team_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # team chưa giải tán
+    submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    draft_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    submitted_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    under_review_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rejected_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    revision_required_submission_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # index FULLTEXT cho tìm kiếm toàn văn (?q=), chỉ tạo trên MySQL; SQLite dùng index trong bộ nhớ
+    # (xem utils/project_search.py)
+    # index (status), (academic_year, semester, status), (supervisor_id, status): filter ?status=, theo học kỳ,
+    # danh sách project của 1 giảng viên; (title, id), (deadline, id): ?sort=title, ?sort=deadline
+    __table_args__ = (
+        db.Index('ix_projects_title_id', 'title', 'id'),
+        db.Index('ix_projects_deadline_id', 'deadline', 'id'),
+        db.Index('ix_projects_status', 'status'),
+        db.Index('ix_projects_term_status', 'academic_year', 'semester', 'status'),
+        db.Index('ix_projects_supervisor_status', 'supervisor_id', 'status'),
+        db.Index('ft_projects_search', 'title', 'description', 'technology_stack',
+                 mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        db.Index('ft_projects_title', 'title', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+    
     # Relationships
     teams = db.relationship('Team', backref='project', cascade='all, delete-orphan')
     submissions = db.relationship('ProjectSubmission', backref='project', cascade='all, delete-orphan')
@@ -47,9 +72,23 @@ class Project(db.Model):
             'semester': self.semester,
             'academic_year': self.academic_year,
             'deadline': self.deadline.isoformat() if self.deadline else None,
+            'team_count': self.team_count,
+            'submission_count': self.submission_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+    
+    @property
+    def submission_counts(self):
+        """Số submission theo từng status, vd: {'draft': 1, 'submitted': 3, ...}"""
+        return {
+            'draft': self.draft_submission_count,
+            'submitted': self.submitted_submission_count,
+            'under_review': self.under_review_submission_count,
+            'approved': self.approved_submission_count,
+            'rejected': self.rejected_submission_count,
+            'revision_required': self.revision_required_submission_count,
+        }
 
 # ProjectDocument là model cho bảng project_documents trong database dùng để lưu trữ các tài liệu liên quan đến dự án
 class ProjectDocument(db.Model):
@@ -66,6 +105,8 @@ class ProjectDocument(db.Model):
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (db.Index('ix_project_documents_project', 'project_id'),)
+    
     # to_dict được sửa dụng khi 
     def to_dict(self):
         return {
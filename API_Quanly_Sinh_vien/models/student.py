@@ -19,6 +19,13 @@ class Student(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # index cho filter ?major= (+ ?status=) và ?status= của danh sách sinh viên, (full_name, id) cho ?sort=full_name
+    __table_args__ = (
+        db.Index('ix_students_full_name_id', 'full_name', 'id'),
+        db.Index('ix_students_major_status', 'major', 'status'),
+        db.Index('ix_students_status', 'status'),
+    )
+    
     # Relationships
     team_memberships = db.relationship('TeamMember', backref='student', cascade='all, delete-orphan')
     project_submissions = db.relationship('ProjectSubmission', backref='student', cascade='all, delete-orphan')
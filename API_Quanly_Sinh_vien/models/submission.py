@@ -24,6 +24,18 @@ class ProjectSubmission(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # index (student_id, project_id): submission cá nhân của 1 student, EXISTS theo project trong danh sách projects
+    # index (project_id, status), (team_id, status): submission của 1 project / 1 team, lọc thêm theo ?status=
+    # index (status, submission_category): danh sách chỉ lọc theo ?status= (+ ?category=)
+    # index (submitted_at, id): ?sort=submitted_at
+    __table_args__ = (
+        db.Index('ix_project_submissions_submitted_at_id', 'submitted_at', 'id'),
+        db.Index('ix_project_submissions_student_project', 'student_id', 'project_id'),
+        db.Index('ix_project_submissions_project_status', 'project_id', 'status'),
+        db.Index('ix_project_submissions_team_status', 'team_id', 'status'),
+        db.Index('ix_project_submissions_status_category', 'status', 'submission_category'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -75,6 +87,13 @@ class ProjectEvaluation(db.Model):
     recommendation = db.Column(db.Enum('excellent', 'good', 'satisfactory', 'needs_improvement', 'poor'))
     evaluated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # index cho filter ?submission_id= / ?project_id= (+ ?evaluator_type=) và danh sách đánh giá của 1 giảng viên
+    __table_args__ = (
+        db.Index('ix_project_evaluations_submission_type', 'submission_id', 'evaluator_type'),
+        db.Index('ix_project_evaluations_project_type', 'project_id', 'evaluator_type'),
+        db.Index('ix_project_evaluations_teacher', 'evaluator_teacher_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
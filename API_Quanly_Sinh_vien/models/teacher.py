@@ -17,6 +17,12 @@ class Teacher(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # index cho filter ?department= (+ ?status=) của danh sách giảng viên, (full_name, id) cho ?sort=full_name
+    __table_args__ = (
+        db.Index('ix_teachers_full_name_id', 'full_name', 'id'),
+        db.Index('ix_teachers_department_status', 'department', 'status'),
+    )
+    
     # Relationships
     projects = db.relationship('Project', backref='supervisor', cascade='all, delete-orphan')
     evaluations = db.relationship('ProjectEvaluation', backref='evaluator_teacher', cascade='all, delete-orphan')
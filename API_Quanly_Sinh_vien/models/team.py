@@ -13,6 +13,15 @@ class Team(db.Model):
     completed_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cột đếm số TeamMember active, được cập nhật cùng transaction khi ghi TeamMember (xem utils/counters.py)
+    active_member_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # index (project_id, status): các team của 1 project (danh sách team, EXISTS theo project, đếm team_count)
+    # index (team_name, id): ?sort=team_name
+    __table_args__ = (
+        db.Index('ix_teams_team_name_id', 'team_name', 'id'),
+        db.Index('ix_teams_project_status', 'project_id', 'status'),
+    )
     
     # Relationships
     members = db.relationship('TeamMember', backref='team', cascade='all, delete-orphan')
@@ -27,6 +36,7 @@ class Team(db.Model):
             'status': self.status,
             'formed_at': self.formed_at.isoformat() if self.formed_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'member_count': self.active_member_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -43,7 +53,11 @@ class TeamMember(db.Model):
     status = db.Column(db.Enum('active', 'left'), default='active')
     
     # Unique constraint to prevent duplicate memberships
-    __table_args__ = (db.UniqueConstraint('team_id', 'student_id', name='unique_team_student'),)
+    # index (student_id, status, team_id): tìm các team active của 1 student (danh sách project/team/submission của student)
+    __table_args__ = (
+        db.UniqueConstraint('team_id', 'student_id', name='unique_team_student'),
+        db.Index('ix_team_members_student_status', 'student_id', 'status', 'team_id'),
+    )
     
     def to_dict(self):
         return {
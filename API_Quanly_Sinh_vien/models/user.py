@@ -1,6 +1,6 @@
 from datetime import datetime
 from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.password_hashing import hash_password, verify_password
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -19,10 +19,10 @@ class User(db.Model):
     teacher_profile = db.relationship('Teacher', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def to_dict(self):
         return {
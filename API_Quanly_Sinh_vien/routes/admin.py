@@ -1,8 +1,16 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import time
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required
 from models import db, User
 from utils.decorators import admin_required
+from utils.identity import bump_token_version, get_current_identity
 from utils.metrics import metrics_collector
+from utils import password_hashing
+from utils.system_sampler import system_sampler, SYSTEM_SAMPLE_HISTORY
+from utils.metrics_history import metrics_history
+from utils.profiler import profile_store
+from utils.stats_cache import stats_cache
+from sqlalchemy import func, select
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -40,7 +48,96 @@ def get_all_users():
 def get_metrics():
     """Admin: Lightweight runtime metrics for monitoring"""
     try:
-        return jsonify(metrics_collector.snapshot()), 200
+        # top: số route chậm nhất (theo p95) trả về trong slowest_routes_15m
+        top = min(max(request.args.get('top', 10, type=int), 1), 50)
+        metrics = metrics_collector.snapshot(top_n=top)
+        metrics['password_hashing'] = password_hashing.password_hash_pool.stats()
+        return jsonify(metrics), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/metrics/history', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics_history():
+    """Admin: Metrics history beyond the 15 minute window
+    Query: from, to (unix timestamp, default last 24h), resolution (auto|minute|hour|day)
+    """
+    try:
+        if not metrics_history.enabled:
+            return jsonify({'error': 'Metrics history is disabled'}), 503
+        end = request.args.get('to', int(time.time()), type=int)
+        start = request.args.get('from', end - 86400, type=int)
+        resolution = request.args.get('resolution', 'auto')
+        return jsonify(metrics_history.query(start, end, resolution)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profiles():
+    """Admin: Captured request profiles (send header X-Profile: 1 to profile a request), newest first"""
+    try:
+        return jsonify({
+            'profiles': profile_store.list(),
+            'sample_rate': profile_store.sample_rate,
+            'slow_ms': profile_store.slow_ms
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/profiles/<int:profile_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def download_profile(profile_id):
+    """Admin: Download a profile in collapsed-stack format (flamegraph.pl / speedscope)"""
+    try:
+        collapsed = profile_store.collapsed(profile_id)
+        if collapsed is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return Response(collapsed, mimetype='text/plain', headers={
+            'Content-Disposition': f'attachment; filename=profile-{profile_id}.collapsed'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/online', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_online_users():
+    """Admin: Users currently on site (from frontend heartbeats), most recently seen first"""
+    try:
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+        clients = metrics_collector.online_clients()
+
+        online = {}  # user_id -> entry, giữ thứ tự heartbeat mới nhất trước
+        anonymous_clients = 0
+        for last_seen, user_id in clients.values():
+            if user_id is None:
+                anonymous_clients += 1
+            elif user_id in online:
+                online[user_id]['clients'] += 1
+            else:
+                online[user_id] = {'user_id': user_id, 'clients': 1, 'last_seen': int(last_seen)}
+
+        listed = list(online.values())[:limit]
+        users = {}
+        if listed:
+            users = {u.id: u for u in User.query.filter(User.id.in_([e['user_id'] for e in listed])).all()}
+        for entry in listed:
+            user = users.get(entry['user_id'])
+            entry['username'] = user.username if user else None
+            entry['role'] = user.role if user else None
+
+        return jsonify({
+            'online_clients': len(clients),
+            'online_users': len(online),
+            'anonymous_clients': anonymous_clients,
+            'users': listed
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,12 +166,13 @@ def toggle_user_active(user_id):
             return jsonify({'error': 'User not found'}), 404
         
         # Cannot deactivate yourself
-        current_user_id = get_jwt_identity()
-        if int(current_user_id) == user_id:
+        current_user_id = get_current_identity()['user_id']  # @admin_required đã trả 404 nếu không có user
+        if current_user_id == user_id:
             return jsonify({'error': 'Cannot deactivate your own account'}), 400
         
         user.is_active = not user.is_active
         db.session.commit()
+        bump_token_version(user_id)
         
         return jsonify({
             'message': f'User {"activated" if user.is_active else "deactivated"} successfully',
@@ -101,12 +199,13 @@ def change_user_role(user_id):
             return jsonify({'error': 'Invalid role'}), 400
         
         # Cannot change your own role
-        current_user_id = get_jwt_identity()
-        if int(current_user_id) == user_id:
+        current_user_id = get_current_identity()['user_id']  # @admin_required đã trả 404 nếu không có user
+        if current_user_id == user_id:
             return jsonify({'error': 'Cannot change your own role'}), 400
         
         user.role = new_role
         db.session.commit()
+        bump_token_version(user_id)
         
         return jsonify({
             'message': 'User role changed successfully',
@@ -127,102 +226,70 @@ def delete_user(user_id):
             return jsonify({'error': 'User not found'}), 404
         
         # Cannot delete yourself
-        current_user_id = get_jwt_identity()
-        if int(current_user_id) == user_id:
+        current_user_id = get_current_identity()['user_id']  # @admin_required đã trả 404 nếu không có user
+        if current_user_id == user_id:
             return jsonify({'error': 'Cannot delete your own account'}), 400
         
         db.session.delete(user)
         db.session.commit()
+        bump_token_version(user_id)
         
         return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# các bảng mà thống kê admin đọc tới: commit vào 1 trong các bảng này thì tính lại
+ADMIN_STATISTICS_TABLES = ('users', 'students', 'teachers', 'projects', 'teams', 'project_submissions')
+
+def _admin_statistics():
+    from models import Student, Teacher, Project, Team, ProjectSubmission
+
+    # Số user theo (role, is_active) trong 1 query GROUP BY thay vì 6 query COUNT riêng
+    total_users = active_users = 0
+    by_role = {'admin': 0, 'teacher': 0, 'student': 0}
+    for role, is_active, count in db.session.query(User.role, User.is_active, func.count(User.id)).group_by(User.role, User.is_active):
+        total_users += count
+        if is_active:
+            active_users += count
+        by_role[role] = by_role.get(role, 0) + count
+
+    # Đếm các bảng còn lại bằng scalar subquery trong cùng 1 câu SELECT
+    total_students, total_teachers, total_projects, total_teams, total_submissions = db.session.query(
+        *(select(func.count()).select_from(model).scalar_subquery()
+          for model in (Student, Teacher, Project, Team, ProjectSubmission))
+    ).one()
+
+    return {
+        'users': {
+            'total': total_users,
+            'active': active_users,
+            'admins': by_role['admin'],
+            'teachers': by_role['teacher'],
+            'students': by_role['student']
+        },
+        'system': {
+            'total_students': total_students,
+            'total_teachers': total_teachers,
+            'total_projects': total_projects,
+            'total_teams': total_teams,
+            'total_submissions': total_submissions
+        }
+    }
+
 @admin_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_admin_statistics():
     """Admin: Get system-wide statistics"""
     try:
-        from models import Student, Teacher, Project, Team, ProjectSubmission
-        import psutil
-        import os
-        
-        # Use proper SQLAlchemy queries for efficiency
-        total_users = User.query.count()
-        
-        # Count active users - use explicit True comparison
-        active_users = User.query.filter(User.is_active == True).count()
-        inactive_users = User.query.filter(User.is_active == False).count()
-        
-        # Role distribution
-        admins = User.query.filter(User.role == 'admin').count()
-        teachers = User.query.filter(User.role == 'teacher').count()
-        students = User.query.filter(User.role == 'student').count()
-        
-        # Verify counts for debugging
-        print(f"[Admin Stats] Total users: {total_users}, Active: {active_users}, Inactive: {inactive_users}")
-        print(f"[Admin Stats] Admins: {admins}, Teachers: {teachers}, Students: {students}")
-        
-        # Verify active count matches
-        if active_users + inactive_users != total_users:
-            print(f"[Admin Stats] WARNING: Active ({active_users}) + Inactive ({inactive_users}) != Total ({total_users})")
-        
-        # Other stats
-        total_students = Student.query.count()
-        total_teachers = Teacher.query.count()
-        total_projects = Project.query.count()
-        total_teams = Team.query.count()
-        total_submissions = ProjectSubmission.query.count()
-        
-        # System metrics (CPU, Memory, Disk)
-        system_metrics = {}
-        try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_count = psutil.cpu_count()
-            
-            # Memory usage
-            memory = psutil.virtual_memory()
-            memory_total_gb = memory.total / (1024**3)
-            memory_used_gb = memory.used / (1024**3)
-            memory_percent = memory.percent
-            
-            # Disk usage
-            disk = psutil.disk_usage('/')
-            disk_total_gb = disk.total / (1024**3)
-            disk_used_gb = disk.used / (1024**3)
-            disk_percent = disk.percent
-            
-            # Process info
-            process = psutil.Process(os.getpid())
-            process_memory_mb = process.memory_info().rss / (1024**2)
-            
-            system_metrics = {
-                'cpu': {
-                    'percent': round(cpu_percent, 2),
-                    'cores': cpu_count
-                },
-                'memory': {
-                    'total_gb': round(memory_total_gb, 2),
-                    'used_gb': round(memory_used_gb, 2),
-                    'percent': round(memory_percent, 2),
-                    'available_gb': round(memory.available / (1024**3), 2)
-                },
-                'disk': {
-                    'total_gb': round(disk_total_gb, 2),
-                    'used_gb': round(disk_used_gb, 2),
-                    'percent': round(disk_percent, 2),
-                    'free_gb': round(disk.free / (1024**3), 2)
-                },
-                'process': {
-                    'memory_mb': round(process_memory_mb, 2)
-                }
-            }
-        except Exception as e:
-            print(f"[Admin Stats] Error getting system metrics: {str(e)}")
-            system_metrics = {'error': 'Unable to fetch system metrics'}
+        # Số liệu từ database được cache (utils/stats_cache.py), metrics hệ thống luôn là giá trị mới nhất
+        statistics = stats_cache.get('admin', ADMIN_STATISTICS_TABLES, _admin_statistics)
+
+        # System metrics (CPU, Memory, Disk) được thread nền đo sẵn, không chặn request
+        history_limit = min(max(request.args.get('history', 60, type=int), 0), SYSTEM_SAMPLE_HISTORY)
+        system_metrics = system_sampler.latest()
+        system_history = system_sampler.history(history_limit)
         
         # Get runtime metrics
         runtime_metrics = {}
@@ -232,22 +299,10 @@ def get_admin_statistics():
             print(f"[Admin Stats] Error getting runtime metrics: {str(e)}")
         
         return jsonify({
-            'users': {
-                'total': total_users,
-                'active': active_users,
-                'admins': admins,
-                'teachers': teachers,
-                'students': students
-            },
-            'system': {
-                'total_students': total_students,
-                'total_teachers': total_teachers,
-                'total_projects': total_projects,
-                'total_teams': total_teams,
-                'total_submissions': total_submissions
-            },
+            **statistics,
             'metrics': {
                 'system': system_metrics,
+                'system_history': system_history,
                 'runtime': runtime_metrics
             }
         }), 200
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required
 from models import db, User
+from utils.identity import get_current_user, create_identity_claims
+from utils.password_hashing import PasswordHashPoolBusy
 from werkzeug.security import generate_password_hash
+from sqlalchemy.orm import joinedload
 import re
 
 # Blueprint là một đối tượng Flask để quản lý các route trong một module riêng biệt, nó giúp tổ chức code một cách rõ ràng và dễ quản lý
@@ -45,6 +48,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except PasswordHashPoolBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -57,10 +63,17 @@ def login():
         if not data.get('username') or not data.get('password'):
             return jsonify({'error': 'Username and password are required'}), 400
         
-        user = User.query.filter_by(username=data['username']).first()
+        user = User.query.options(
+            joinedload(User.student_profile),
+            joinedload(User.teacher_profile)
+        ).filter_by(username=data['username']).first()
         
         if user and user.check_password(data['password']) and user.is_active:
-            access_token = create_access_token(identity=str(user.id))
+            # role, student_id, teacher_id nằm trong token để phân quyền không cần query database
+            access_token = create_access_token(
+                identity=str(user.id),
+                additional_claims=create_identity_claims(user)
+            )
             return jsonify({
                 'access_token': access_token,
                 'user': user.to_dict()
@@ -68,6 +81,8 @@ def login():
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
             
+    except PasswordHashPoolBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -75,8 +90,7 @@ def login():
 @jwt_required()
 def get_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -90,8 +104,7 @@ def get_profile():
 @jwt_required()
 def update_profile():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -121,8 +134,7 @@ def update_profile():
 @jwt_required()
 def change_password():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = get_current_user()
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -143,6 +155,9 @@ def change_password():
         
         return jsonify({'message': 'Password changed successfully'}), 200
         
+    except PasswordHashPoolBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1,31 +1,62 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from utils.metrics import record_heartbeat
+import hmac
+from flask import Blueprint, request, jsonify, current_app, Response
+from flask_jwt_extended import verify_jwt_in_request
+from utils.metrics import metrics_collector, render_prometheus
+from utils.heartbeat import heartbeat_store
+from utils.identity import get_current_identity, get_verified_user_id
 
 monitor_bp = Blueprint('monitor', __name__)
 
+# số client_id tối đa trong 1 heartbeat và độ dài tối đa của mỗi id
+HEARTBEAT_MAX_BATCH = 50
+CLIENT_ID_MAX_LENGTH = 64
+
 @monitor_bp.route('/heartbeat', methods=['POST'])
 def heartbeat():
     """Receive frontend heartbeats to track 'users currently on site'.
-    Accepts JSON: { "client_id": "uuid" }
+    Accepts JSON: { "client_id": "uuid" } or a batch { "client_ids": ["uuid", ...] }
     JWT token is optional; if present, associates the user id.
+    Heartbeats are not counted in request metrics.
     """
     try:
         data = request.get_json(silent=True) or {}
-        client_id = (data.get('client_id') or '').strip()
+        client_ids = data.get('client_ids')
+        if not isinstance(client_ids, list):
+            client_ids = [data.get('client_id')]
+        client_ids = [c.strip() for c in client_ids[:HEARTBEAT_MAX_BATCH] if isinstance(c, str)]
+        client_ids = [c for c in client_ids if c and len(c) <= CLIENT_ID_MAX_LENGTH]
         # Optional user id from JWT
-        user_id = None
         try:
             verify_jwt_in_request(optional=True)
-            ident = get_jwt_identity()
-            if ident is not None:
-                user_id = int(ident)
+            user_id = get_verified_user_id()
         except Exception:
             user_id = None
 
-        record_heartbeat(client_id, user_id)
-        return jsonify({ 'ok': True }), 200
+        if client_ids:
+            heartbeat_store.beat(client_ids, user_id)
+            metrics_collector.ensure_exporter()
+        return jsonify({ 'ok': True, 'accepted': len(client_ids) }), 200
     except Exception as e:
         return jsonify({ 'error': str(e) }), 500
 
 
+@monitor_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of the (cross-worker) runtime metrics.
+    Auth: `Authorization: Bearer <METRICS_TOKEN>` if METRICS_TOKEN is set, otherwise an admin JWT.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+    else:
+        verify_jwt_in_request()
+        identity = get_current_identity()
+        if not identity or identity['role'] != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+
+    try:
+        return Response(render_prometheus(metrics_collector.snapshot()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        return jsonify({ 'error': str(e) }), 500
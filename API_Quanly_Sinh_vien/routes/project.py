@@ -1,28 +1,42 @@
 from flask import Blueprint, request, jsonify, send_from_directory
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from models import db, Project, ProjectDocument, Teacher, User, Student, Team, TeamMember, ProjectSubmission
 from sqlalchemy import or_, and_
 from utils.decorators import admin_required, teacher_or_admin_required
+from utils.identity import get_current_identity
 from utils.file_upload import save_uploaded_file, get_file_path, delete_file
+from utils.pagination import paginate, offset_params, Page, MAX_PER_PAGE
+from utils.project_search import project_search, parse_terms, highlights
+from utils.fields import parse_fields, load_fields, serialize
+from utils.counters import SUBMISSION_STATUSES
+from utils.stats_cache import stats_cache
+from routes.team import TEAM_SORTS, ACTIVE_MEMBERS, team_with_members
 from datetime import datetime
 import os
 
 project_bp = Blueprint('project', __name__)
 
+# các cột được phép dùng cho ?sort= (thêm '-' phía trước để sort giảm dần), cột nào cũng có index (cột, id) hoặc unique
+PROJECT_SORTS = {
+    'id': Project.id,
+    'project_code': Project.project_code,
+    'title': Project.title,
+    'deadline': Project.deadline,
+}
+DOCUMENT_SORTS = {'id': ProjectDocument.id}
+
 @project_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_projects():
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
+        q = request.args.get('q', '').strip()  # tìm kiếm toàn văn, xếp theo độ liên quan
         status = request.args.get('status', '')
         difficulty = request.args.get('difficulty', '')
         supervisor_id = request.args.get('supervisor_id', type=int)
@@ -32,38 +46,33 @@ def get_projects():
         query = Project.query
         
         # Nếu là student, chỉ cho xem projects mà họ đã tham gia
-        if user.role == 'student':
+        if identity['role'] == 'student':
             # Tìm student profile
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
             
-            # Lấy danh sách project IDs mà student đã tham gia:
+            # Chỉ lấy projects mà student đã tham gia (EXISTS nằm ngay trong query phân trang):
             # 1. Qua teams (student là member của team trong project)
-            team_memberships = db.session.query(Team.project_id).join(
-                TeamMember, Team.id == TeamMember.team_id
+            in_team = db.session.query(TeamMember.id).join(
+                Team, Team.id == TeamMember.team_id
             ).filter(
                 and_(
-                    TeamMember.student_id == student.id,
+                    Team.project_id == Project.id,
+                    TeamMember.student_id == current_student_id,
                     TeamMember.status == 'active'
                 )
-            ).distinct().all()
-            project_ids_from_teams = [tm[0] for tm in team_memberships]
+            ).exists()
             
             # 2. Qua individual submissions (student có submission cho project)
-            individual_submissions = db.session.query(ProjectSubmission.project_id).filter(
-                ProjectSubmission.student_id == student.id
-            ).distinct().all()
-            project_ids_from_submissions = [sub[0] for sub in individual_submissions]
-            
-            # Gộp danh sách project IDs
-            project_ids = list(set(project_ids_from_teams + project_ids_from_submissions))
+            has_submission = db.session.query(ProjectSubmission.id).filter(
+                and_(
+                    ProjectSubmission.project_id == Project.id,
+                    ProjectSubmission.student_id == current_student_id
+                )
+            ).exists()
             
-            if project_ids:
-                query = query.filter(Project.id.in_(project_ids))
-            else:
-                # Nếu student chưa tham gia project nào, trả về danh sách rỗng
-                query = query.filter(Project.id == -1)  # Không có project nào
+            query = query.filter(or_(in_team, has_submission))
         
         # Teacher và Admin xem tất cả projects (không cần filter thêm)
         
@@ -91,17 +100,27 @@ def get_projects():
         if academic_year:
             query = query.filter(Project.academic_year == academic_year)
         
-        projects = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        fields = parse_fields(Project)
         
-        return jsonify({
-            'projects': [project.to_dict() for project in projects.items],
-            'total': projects.total,
-            'pages': projects.pages,
-            'current_page': page
-        }), 200
+        if q:
+            # kết quả xếp theo độ liên quan nên chỉ phân trang theo page (không dùng sort / cursor)
+            terms = parse_terms(q)
+            page_number, per_page, total_mode = offset_params()
+            query = load_fields(query, Project, fields, Project.title, Project.description, Project.technology_stack)
+            items, scores, total, has_more = project_search.search(query, terms, page_number, per_page,
+                                                                   with_total=total_mode is not None)
+            page = Page(items, None, per_page, total, page_number, total_mode and 'exact', has_more)
+            return jsonify(page.to_dict('projects', [
+                {**serialize(project, fields), 'score': scores[project.id], 'highlights': highlights(project, terms)}
+                for project in page.items
+            ])), 200
         
+        page = paginate(query, Project, PROJECT_SORTS, fields=fields)
+        
+        return jsonify(page.to_dict('projects', [serialize(project, fields) for project in page.items])), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -110,27 +129,30 @@ def get_projects():
 def get_project(project_id):
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
-        project = Project.query.get(project_id)
+        fields = parse_fields(Project, extra=('supervisor', 'submission_counts'))
+        required = [Project.supervisor_id]
+        if fields and 'submission_counts' in fields:
+            required += [getattr(Project, f'{status}_submission_count') for status in SUBMISSION_STATUSES]
+        project = load_fields(Project.query, Project, fields, *required).get(project_id)
         
         if not project:
             return jsonify({'error': 'Project not found'}), 404
         
         # Nếu là student, kiểm tra xem họ có tham gia project này không
-        if user.role == 'student':
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+        if identity['role'] == 'student':
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
             
             # Kiểm tra student có tham gia project qua team không
             team_member = db.session.query(TeamMember).join(Team).filter(
                 and_(
-                    TeamMember.student_id == student.id,
+                    TeamMember.student_id == current_student_id,
                     Team.project_id == project_id,
                     TeamMember.status == 'active'
                 )
@@ -140,7 +162,7 @@ def get_project(project_id):
             has_submission = ProjectSubmission.query.filter(
                 and_(
                     ProjectSubmission.project_id == project_id,
-                    ProjectSubmission.student_id == student.id
+                    ProjectSubmission.student_id == current_student_id
                 )
             ).first()
             
@@ -151,17 +173,20 @@ def get_project(project_id):
                 }), 403
         
         # Teacher và Admin có thể xem tất cả projects
-        project_data = project.to_dict()
+        project_data = serialize(project, fields)
         
         # Add supervisor info
-        if project.supervisor:
+        if (fields is None or 'supervisor' in fields) and project.supervisor:
             project_data['supervisor'] = project.supervisor.to_dict()
         
-        # Add team count
-        project_data['team_count'] = len([team for team in project.teams if team.status != 'disbanded'])
+        # Add submission count by status (team_count đã có trong to_dict, lấy từ cột đếm)
+        if fields is None or 'submission_counts' in fields:
+            project_data['submission_counts'] = project.submission_counts
         
         return jsonify({'project': project_data}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -297,10 +322,13 @@ def get_project_teams(project_id):
         if not project:
             return jsonify({'error': 'Project not found'}), 404
         
-        teams = [team.to_dict() for team in project.teams]
+        query = Team.query.filter(Team.project_id == project_id).options(ACTIVE_MEMBERS)
+        page = paginate(query, Team, TEAM_SORTS, default_per_page=MAX_PER_PAGE, allow_offset=False)
         
-        return jsonify({'teams': teams}), 200
+        return jsonify(page.to_dict('teams', [team_with_members(team) for team in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -313,10 +341,14 @@ def get_project_documents(project_id):
         if not project:
             return jsonify({'error': 'Project not found'}), 404
         
-        documents = [doc.to_dict() for doc in project.documents]
+        query = ProjectDocument.query.filter(ProjectDocument.project_id == project_id)
+        page = paginate(query, ProjectDocument, DOCUMENT_SORTS,
+                        default_per_page=MAX_PER_PAGE, allow_offset=False)
         
-        return jsonify({'documents': documents}), 200
+        return jsonify(page.to_dict('documents', [doc.to_dict() for doc in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -324,6 +356,12 @@ def get_project_documents(project_id):
 @jwt_required()
 def upload_project_document(project_id):
     try:
+        # Lấy thông tin user hiện tại
+        identity = get_current_identity()
+        
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+        
         project = Project.query.get(project_id)
         
         if not project:
@@ -352,7 +390,7 @@ def upload_project_document(project_id):
             file_type=file_info['file_type'] if file_info else data.get('file_type'),
             file_size=file_info['file_size'] if file_info else data.get('file_size'),
             document_type=data.get('document_type', 'other'),
-            uploaded_by=get_jwt_identity()
+            uploaded_by=identity['user_id']
         )
         
         db.session.add(document)
@@ -386,28 +424,31 @@ def download_project_document(filepath):
     except Exception as e:
         return jsonify({'error': str(e)}), 404
 
+def _project_statistics():
+    # 1 query GROUP BY (status, difficulty_level) cho cả tổng số, số theo trạng thái và phân bố độ khó
+    total_projects = 0
+    by_status = {}
+    difficulties = {}
+    for status, level, count in db.session.query(
+        Project.status, Project.difficulty_level, db.func.count(Project.id)
+    ).group_by(Project.status, Project.difficulty_level):
+        total_projects += count
+        by_status[status] = by_status.get(status, 0) + count
+        difficulties[level] = difficulties.get(level, 0) + count
+    
+    return {
+        'total_projects': total_projects,
+        'published_projects': by_status.get('published', 0),
+        'in_progress_projects': by_status.get('in_progress', 0),
+        'completed_projects': by_status.get('completed', 0),
+        'difficulty_distribution': [{'level': level, 'count': count} for level, count in difficulties.items()]
+    }
+
 @project_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_project_statistics():
     try:
-        total_projects = Project.query.count()
-        published_projects = Project.query.filter_by(status='published').count()
-        in_progress_projects = Project.query.filter_by(status='in_progress').count()
-        completed_projects = Project.query.filter_by(status='completed').count()
-        
-        # Get difficulty distribution
-        difficulties = db.session.query(
-            Project.difficulty_level, 
-            db.func.count(Project.id)
-        ).group_by(Project.difficulty_level).all()
-        
-        return jsonify({
-            'total_projects': total_projects,
-            'published_projects': published_projects,
-            'in_progress_projects': in_progress_projects,
-            'completed_projects': completed_projects,
-            'difficulty_distribution': [{'level': level, 'count': count} for level, count in difficulties]
-        }), 200
+        return jsonify(stats_cache.get('projects', ('projects',), _project_statistics)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,18 +1,30 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Student, User
+from flask_jwt_extended import jwt_required
+from models import db, Student, User, Team, TeamMember, Project
 from sqlalchemy import or_
 from utils.decorators import admin_required, teacher_or_admin_required
+from utils.identity import bump_token_version
+from utils.password_hashing import PasswordHashPoolBusy
+from utils.student_import import import_student_roster
+from utils.pagination import paginate
+from utils.fields import parse_fields, load_fields, serialize
+from utils.typeahead import student_typeahead, typeahead
+from utils.stats_cache import stats_cache
 import re
 
 student_bp = Blueprint('student', __name__)
 
+# các cột được phép dùng cho ?sort= (thêm '-' phía trước để sort giảm dần), cột nào cũng có index (cột, id) hoặc unique
+STUDENT_SORTS = {
+    'id': Student.id,
+    'student_code': Student.student_code,
+    'full_name': Student.full_name,
+}
+
 @student_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_students():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         major = request.args.get('major', '')
         status = request.args.get('status', '')
@@ -34,16 +46,31 @@ def get_students():
         if status:
             query = query.filter(Student.status == status)
         
-        students = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        fields = parse_fields(Student)
+        page = paginate(query, Student, STUDENT_SORTS, fields=fields)
         
-        return jsonify({
-            'students': [student.to_dict() for student in students.items],
-            'total': students.total,
-            'pages': students.pages,
-            'current_page': page
-        }), 200
+        return jsonify(page.to_dict('students', [serialize(student, fields) for student in page.items])), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@student_bp.route('/typeahead', methods=['GET'])
+@jwt_required()
+def typeahead_students():
+    """Gợi ý sinh viên khi gõ (không phân biệt dấu): ?q=nguyen an&limit=10"""
+    try:
+        students = typeahead(student_typeahead, request.args.get('q', ''), request.args.get('limit', type=int))
+        
+        return jsonify({'students': [{
+            'id': student.id,
+            'student_code': student.student_code,
+            'full_name': student.full_name,
+            'class_name': student.class_name,
+            'major': student.major,
+            'status': student.status
+        } for student in students]}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -52,13 +79,16 @@ def get_students():
 @jwt_required()
 def get_student(student_id):
     try:
-        student = Student.query.get(student_id)
+        fields = parse_fields(Student)
+        student = load_fields(Student.query, Student, fields).get(student_id)
         
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
-        return jsonify({'student': student.to_dict()}), 200
+        return jsonify({'student': serialize(student, fields)}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -147,6 +177,32 @@ def create_student():
             'user': user.to_dict() if user else None
         }), 201
         
+    except PasswordHashPoolBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@student_bp.route('/import', methods=['POST'])
+@jwt_required()
+@teacher_or_admin_required
+def import_students():
+    """Import danh sách sinh viên hàng loạt từ file CSV/XLSX (form field: file)"""
+    try:
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'error': 'A .csv or .xlsx file is required'}), 400
+        
+        report = import_student_roster(file)
+        
+        return jsonify({
+            'message': f"Imported {report['created']} of {report['total_rows']} students",
+            **report
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -204,8 +260,11 @@ def delete_student(student_id):
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
+        user_id = student.user_id
         db.session.delete(student)
         db.session.commit()
+        # token của user mang student_id của hồ sơ vừa xóa: thu hồi để user đăng nhập lại
+        bump_token_version(user_id)
         
         return jsonify({'message': 'Student deleted successfully'}), 200
         
@@ -222,12 +281,19 @@ def get_student_teams(student_id):
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
+        # 1 query JOIN thay vì lazy load membership -> team cho từng membership
+        rows = db.session.query(Team, TeamMember.role).join(
+            TeamMember, TeamMember.team_id == Team.id
+        ).filter(
+            TeamMember.student_id == student_id,
+            TeamMember.status == 'active'
+        ).order_by(TeamMember.id).all()
+        
         teams = []
-        for membership in student.team_memberships:
-            if membership.status == 'active':
-                team_data = membership.team.to_dict()
-                team_data['role'] = membership.role
-                teams.append(team_data)
+        for team, role in rows:
+            team_data = team.to_dict()
+            team_data['role'] = role
+            teams.append(team_data)
         
         return jsonify({'teams': teams}), 200
         
@@ -243,38 +309,51 @@ def get_student_projects(student_id):
         if not student:
             return jsonify({'error': 'Student not found'}), 404
         
+        # 1 query JOIN thay vì lazy load membership -> team -> project cho từng membership
+        rows = db.session.query(Project, TeamMember.role).join(
+            Team, Team.project_id == Project.id
+        ).join(
+            TeamMember, TeamMember.team_id == Team.id
+        ).filter(
+            TeamMember.student_id == student_id,
+            TeamMember.status == 'active'
+        ).order_by(TeamMember.id).all()
+        
         projects = []
-        for membership in student.team_memberships:
-            if membership.status == 'active':
-                project_data = membership.team.project.to_dict()
-                project_data['team_role'] = membership.role
-                projects.append(project_data)
+        for project, role in rows:
+            project_data = project.to_dict()
+            project_data['team_role'] = role
+            projects.append(project_data)
         
         return jsonify({'projects': projects}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _student_statistics():
+    # 1 query GROUP BY (major, status) cho cả tổng số, số theo trạng thái và phân bố chuyên ngành
+    total_students = 0
+    by_status = {}
+    majors = {}
+    for major, status, count in db.session.query(
+        Student.major, Student.status, db.func.count(Student.id)
+    ).group_by(Student.major, Student.status):
+        total_students += count
+        by_status[status] = by_status.get(status, 0) + count
+        majors[major] = majors.get(major, 0) + count
+    
+    return {
+        'total_students': total_students,
+        'active_students': by_status.get('active', 0),
+        'graduated_students': by_status.get('graduated', 0),
+        'majors_distribution': [{'major': major, 'count': count} for major, count in majors.items()]
+    }
+
 @student_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_student_statistics():
     try:
-        total_students = Student.query.count()
-        active_students = Student.query.filter_by(status='active').count()
-        graduated_students = Student.query.filter_by(status='graduated').count()
-        
-        # Get majors distribution
-        majors = db.session.query(
-            Student.major, 
-            db.func.count(Student.id)
-        ).group_by(Student.major).all()
-        
-        return jsonify({
-            'total_students': total_students,
-            'active_students': active_students,
-            'graduated_students': graduated_students,
-            'majors_distribution': [{'major': major, 'count': count} for major, count in majors]
-        }), 200
+        return jsonify(stats_cache.get('students', ('students',), _student_statistics)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
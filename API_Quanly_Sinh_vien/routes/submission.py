@@ -1,36 +1,46 @@
 from flask import Blueprint, request, jsonify, send_from_directory
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from models import db, ProjectSubmission, ProjectEvaluation, Project, Team, TeamMember, Student, Teacher, User
 from sqlalchemy import and_, or_
 from utils.file_upload import save_uploaded_file, get_file_path, delete_file
+from utils.identity import get_current_identity
+from utils.pagination import paginate
+from utils.fields import parse_fields, load_fields, serialize
 from datetime import datetime
 import os
 
 submission_bp = Blueprint('submission', __name__)
 
+# các cột được phép dùng cho ?sort= (thêm '-' phía trước để sort giảm dần), cột nào cũng có index (cột, id) hoặc unique
+SUBMISSION_SORTS = {
+    'id': ProjectSubmission.id,
+    'submitted_at': ProjectSubmission.submitted_at,
+}
+EVALUATION_SORTS = {'id': ProjectEvaluation.id}
+
 # ============= HELPER FUNCTIONS =============
 
-def check_submission_ownership(submission, user_id):
+def check_submission_ownership(submission):
     """
-    Kiểm tra xem user có quyền truy cập submission không
+    Kiểm tra xem user hiện tại có quyền truy cập submission không
     Returns: (is_owner: bool, error_message: str or None)
     """
-    user = User.query.get(user_id)
-    if not user:
+    identity = get_current_identity()
+    if not identity:
         return False, 'User not found'
     
     # Admin và Teacher có thể xem tất cả
-    if user.role in ['admin', 'teacher']:
+    if identity['role'] in ['admin', 'teacher']:
         return True, None
     
     # Student chỉ xem được submissions của chính họ
-    if user.role == 'student':
-        student = Student.query.filter_by(user_id=user_id).first()
-        if not student:
+    if identity['role'] == 'student':
+        current_student_id = identity['student_id']
+        if not current_student_id:
             return False, 'Student profile not found'
         
         # Kiểm tra individual submission
-        if submission.student_id == student.id:
+        if submission.student_id == current_student_id:
             return True, None
         
         # Kiểm tra team submission
@@ -38,7 +48,7 @@ def check_submission_ownership(submission, user_id):
             team_member = TeamMember.query.filter(
                 and_(
                     TeamMember.team_id == submission.team_id,
-                    TeamMember.student_id == student.id,
+                    TeamMember.student_id == current_student_id,
                     TeamMember.status == 'active'
                 )
             ).first()
@@ -56,14 +66,11 @@ def check_submission_ownership(submission, user_id):
 def get_submissions():
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         project_id = request.args.get('project_id', type=int)
         team_id = request.args.get('team_id', type=int)
         student_id = request.args.get('student_id', type=int)
@@ -73,34 +80,28 @@ def get_submissions():
         query = ProjectSubmission.query
         
         # Nếu là student, chỉ cho xem submissions của chính họ
-        if user.role == 'student':
+        if identity['role'] == 'student':
             # Tìm student profile
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
             
-            # Lấy danh sách team IDs mà student là member
-            team_memberships = db.session.query(TeamMember.team_id).filter(
+            # Lọc submissions (EXISTS nằm ngay trong query phân trang, không cần query lấy team IDs trước):
+            # 1. Individual submissions của chính student này
+            # 2. Team submissions của các team mà student là member
+            is_team_member = db.session.query(TeamMember.id).filter(
                 and_(
-                    TeamMember.student_id == student.id,
+                    TeamMember.team_id == ProjectSubmission.team_id,
+                    TeamMember.student_id == current_student_id,
                     TeamMember.status == 'active'
                 )
-            ).all()
-            team_ids = [tm[0] for tm in team_memberships]
-            
-            # Lọc submissions:
-            # 1. Individual submissions của chính student này
-            # 2. Team submissions của các team mà student là member
-            if team_ids:
-                query = query.filter(
-                    or_(
-                        ProjectSubmission.student_id == student.id,  # Individual submissions
-                        ProjectSubmission.team_id.in_(team_ids)  # Team submissions
-                    )
+            ).exists()
+            query = query.filter(
+                or_(
+                    ProjectSubmission.student_id == current_student_id,  # Individual submissions
+                    is_team_member  # Team submissions
                 )
-            else:
-                # Nếu student chưa có team nào, chỉ xem individual submissions
-                query = query.filter(ProjectSubmission.student_id == student.id)
+            )
         
         # Teacher và Admin xem tất cả (không cần filter thêm)
         # Nhưng vẫn có thể filter theo các tham số query
@@ -120,17 +121,13 @@ def get_submissions():
         if category:
             query = query.filter(ProjectSubmission.submission_category == category)
         
-        submissions = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        fields = parse_fields(ProjectSubmission)
+        page = paginate(query, ProjectSubmission, SUBMISSION_SORTS, fields=fields)
         
-        return jsonify({
-            'submissions': [submission.to_dict() for submission in submissions.items],
-            'total': submissions.total,
-            'pages': submissions.pages,
-            'current_page': page
-        }), 200
+        return jsonify(page.to_dict('submissions', [serialize(submission, fields) for submission in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -139,19 +136,20 @@ def get_submissions():
 def get_submission(submission_id):
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
-        submission = ProjectSubmission.query.get(submission_id)
+        fields = parse_fields(ProjectSubmission, extra=('project', 'team', 'student'))
+        submission = load_fields(ProjectSubmission.query, ProjectSubmission, fields, ProjectSubmission.project_id,
+                                 ProjectSubmission.team_id, ProjectSubmission.student_id).get(submission_id)
         
         if not submission:
             return jsonify({'error': 'Submission not found'}), 404
         
         # Kiểm tra quyền truy cập
-        is_owner, error_msg = check_submission_ownership(submission, user_id)
+        is_owner, error_msg = check_submission_ownership(submission)
         if not is_owner:
             return jsonify({
                 'error': 'Permission denied',
@@ -159,19 +157,22 @@ def get_submission(submission_id):
             }), 403
         
         # Teacher và Admin có thể xem tất cả
-        submission_data = submission.to_dict()
+        submission_data = serialize(submission, fields)
         
         # Add project info
-        submission_data['project'] = submission.project.to_dict()
+        if fields is None or 'project' in fields:
+            submission_data['project'] = submission.project.to_dict()
         
         # Add team or student info
-        if submission.team:
+        if (fields is None or 'team' in fields) and submission.team:
             submission_data['team'] = submission.team.to_dict()
-        if submission.student:
+        if (fields is None or 'student' in fields) and submission.student:
             submission_data['student'] = submission.student.to_dict()
         
         return jsonify({'submission': submission_data}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -179,6 +180,12 @@ def get_submission(submission_id):
 @jwt_required()
 def create_submission():
     try:
+        # Lấy thông tin user hiện tại
+        identity = get_current_identity()
+        
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+        
         # Lấy dữ liệu từ form hoặc JSON
         if request.is_json:
             data = request.get_json()
@@ -196,22 +203,20 @@ def create_submission():
         if not project:
             return jsonify({'error': 'Project not found'}), 404
         
-        user_id = int(get_jwt_identity())
-        
         # Determine team_id or student_id based on submission type
         team_id = None
         student_id = None
         
         if data['submission_type'] == 'team':
             # Find student first
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
             
             # Find team for this project and student
             team_member = db.session.query(TeamMember).join(Team).filter(
                 and_(
-                    TeamMember.student_id == student.id,
+                    TeamMember.student_id == current_student_id,
                     Team.project_id == data['project_id'],
                     TeamMember.status == 'active'
                 )
@@ -224,11 +229,11 @@ def create_submission():
             
         elif data['submission_type'] == 'individual':
             # Find student
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
             
-            student_id = student.id
+            student_id = current_student_id
         
         # Xử lý file upload nếu có
         file_info = None
@@ -289,10 +294,9 @@ def create_submission():
 def update_submission(submission_id):
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
         submission = ProjectSubmission.query.get(submission_id)
@@ -301,7 +305,7 @@ def update_submission(submission_id):
             return jsonify({'error': 'Submission not found'}), 404
         
         # Kiểm tra quyền truy cập
-        is_owner, error_msg = check_submission_ownership(submission, user_id)
+        is_owner, error_msg = check_submission_ownership(submission)
         if not is_owner:
             return jsonify({
                 'error': 'Permission denied',
@@ -382,10 +386,9 @@ def update_submission(submission_id):
 def delete_submission(submission_id):
     try:
         # Lấy thông tin user hiện tại
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = get_current_identity()
         
-        if not user:
+        if not identity:
             return jsonify({'error': 'User not found'}), 404
         
         submission = ProjectSubmission.query.get(submission_id)
@@ -394,7 +397,7 @@ def delete_submission(submission_id):
             return jsonify({'error': 'Submission not found'}), 404
         
         # Kiểm tra quyền truy cập
-        is_owner, error_msg = check_submission_ownership(submission, user_id)
+        is_owner, error_msg = check_submission_ownership(submission)
         if not is_owner:
             return jsonify({
                 'error': 'Permission denied',
@@ -469,8 +472,6 @@ def review_submission(submission_id):
 @jwt_required()
 def get_evaluations():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         project_id = request.args.get('project_id', type=int)
         submission_id = request.args.get('submission_id', type=int)
         evaluator_type = request.args.get('evaluator_type', '')
@@ -486,17 +487,13 @@ def get_evaluations():
         if evaluator_type:
             query = query.filter(ProjectEvaluation.evaluator_type == evaluator_type)
         
-        evaluations = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        fields = parse_fields(ProjectEvaluation)
+        page = paginate(query, ProjectEvaluation, EVALUATION_SORTS, fields=fields)
         
-        return jsonify({
-            'evaluations': [evaluation.to_dict() for evaluation in evaluations.items],
-            'total': evaluations.total,
-            'pages': evaluations.pages,
-            'current_page': page
-        }), 200
+        return jsonify(page.to_dict('evaluations', [serialize(evaluation, fields) for evaluation in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -504,21 +501,26 @@ def get_evaluations():
 @jwt_required()
 def get_evaluation(evaluation_id):
     try:
-        evaluation = ProjectEvaluation.query.get(evaluation_id)
+        fields = parse_fields(ProjectEvaluation, extra=('evaluator_teacher', 'evaluator_student'))
+        evaluation = load_fields(ProjectEvaluation.query, ProjectEvaluation, fields,
+                                 ProjectEvaluation.evaluator_teacher_id,
+                                 ProjectEvaluation.evaluator_student_id).get(evaluation_id)
         
         if not evaluation:
             return jsonify({'error': 'Evaluation not found'}), 404
         
-        evaluation_data = evaluation.to_dict()
+        evaluation_data = serialize(evaluation, fields)
         
         # Add evaluator info
-        if evaluation.evaluator_teacher:
+        if (fields is None or 'evaluator_teacher' in fields) and evaluation.evaluator_teacher:
             evaluation_data['evaluator_teacher'] = evaluation.evaluator_teacher.to_dict()
-        if evaluation.evaluator_student:
+        if (fields is None or 'evaluator_student' in fields) and evaluation.evaluator_student:
             evaluation_data['evaluator_student'] = evaluation.evaluator_student.to_dict()
         
         return jsonify({'evaluation': evaluation_data}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -527,6 +529,12 @@ def get_evaluation(evaluation_id):
 def create_evaluation():
     # Permission check inside function for teacher/admin
     try:
+        # Lấy thông tin user hiện tại
+        identity = get_current_identity()
+        
+        if not identity:
+            return jsonify({'error': 'User not found'}), 404
+        
         data = request.get_json()
         
         # Validation
@@ -535,23 +543,21 @@ def create_evaluation():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        user_id = int(get_jwt_identity())
-        
         # Determine evaluator
         evaluator_teacher_id = None
         evaluator_student_id = None
         
         if data['evaluator_type'] == 'teacher':
-            teacher = Teacher.query.filter_by(user_id=user_id).first()
-            if not teacher:
+            current_teacher_id = identity['teacher_id']
+            if not current_teacher_id:
                 return jsonify({'error': 'Teacher profile not found'}), 404
-            evaluator_teacher_id = teacher.id
+            evaluator_teacher_id = current_teacher_id
             
         elif data['evaluator_type'] == 'student':
-            student = Student.query.filter_by(user_id=user_id).first()
-            if not student:
+            current_student_id = identity['student_id']
+            if not current_student_id:
                 return jsonify({'error': 'Student profile not found'}), 404
-            evaluator_student_id = student.id
+            evaluator_student_id = current_student_id
         
         # Calculate scores
         scores = {
@@ -1,16 +1,28 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Teacher, User
+from flask_jwt_extended import jwt_required
+from models import db, Teacher, User, Project, ProjectEvaluation
 from sqlalchemy import or_
+from utils.identity import bump_token_version
+from utils.pagination import paginate, MAX_PER_PAGE
+from utils.fields import parse_fields, serialize
+from utils.typeahead import teacher_typeahead, typeahead
+from utils.stats_cache import stats_cache
+from routes.project import PROJECT_SORTS
+from routes.submission import EVALUATION_SORTS
 
 teacher_bp = Blueprint('teacher', __name__)
 
+# các cột được phép dùng cho ?sort= (thêm '-' phía trước để sort giảm dần), cột nào cũng có index (cột, id) hoặc unique
+TEACHER_SORTS = {
+    'id': Teacher.id,
+    'teacher_code': Teacher.teacher_code,
+    'full_name': Teacher.full_name,
+}
+
 @teacher_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_teachers():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         department = request.args.get('department', '')
         status = request.args.get('status', '')
@@ -32,16 +44,30 @@ def get_teachers():
         if status:
             query = query.filter(Teacher.status == status)
         
-        teachers = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        page = paginate(query, Teacher, TEACHER_SORTS)
         
-        return jsonify({
-            'teachers': [teacher.to_dict() for teacher in teachers.items],
-            'total': teachers.total,
-            'pages': teachers.pages,
-            'current_page': page
-        }), 200
+        return jsonify(page.to_dict('teachers', [teacher.to_dict() for teacher in page.items])), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@teacher_bp.route('/typeahead', methods=['GET'])
+@jwt_required()
+def typeahead_teachers():
+    """Gợi ý giảng viên khi gõ (không phân biệt dấu): ?q=tran&limit=10"""
+    try:
+        teachers = typeahead(teacher_typeahead, request.args.get('q', ''), request.args.get('limit', type=int))
+        
+        return jsonify({'teachers': [{
+            'id': teacher.id,
+            'teacher_code': teacher.teacher_code,
+            'full_name': teacher.full_name,
+            'department': teacher.department,
+            'title': teacher.title,
+            'specialization': teacher.specialization
+        } for teacher in teachers]}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -155,8 +181,11 @@ def delete_teacher(teacher_id):
         if not teacher:
             return jsonify({'error': 'Teacher not found'}), 404
         
+        user_id = teacher.user_id
         db.session.delete(teacher)
         db.session.commit()
+        # token của user mang teacher_id của hồ sơ vừa xóa: thu hồi để user đăng nhập lại
+        bump_token_version(user_id)
         
         return jsonify({'message': 'Teacher deleted successfully'}), 200
         
@@ -173,10 +202,14 @@ def get_teacher_projects(teacher_id):
         if not teacher:
             return jsonify({'error': 'Teacher not found'}), 404
         
-        projects = [project.to_dict() for project in teacher.projects]
+        fields = parse_fields(Project)
+        page = paginate(Project.query.filter(Project.supervisor_id == teacher_id), Project, PROJECT_SORTS,
+                        default_per_page=MAX_PER_PAGE, allow_offset=False, fields=fields)
         
-        return jsonify({'projects': projects}), 200
+        return jsonify(page.to_dict('projects', [serialize(project, fields) for project in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -189,33 +222,42 @@ def get_teacher_evaluations(teacher_id):
         if not teacher:
             return jsonify({'error': 'Teacher not found'}), 404
         
-        evaluations = [evaluation.to_dict() for evaluation in teacher.evaluations]
+        query = ProjectEvaluation.query.filter(ProjectEvaluation.evaluator_teacher_id == teacher_id)
+        fields = parse_fields(ProjectEvaluation)
+        page = paginate(query, ProjectEvaluation, EVALUATION_SORTS,
+                        default_per_page=MAX_PER_PAGE, allow_offset=False, fields=fields)
         
-        return jsonify({'evaluations': evaluations}), 200
+        return jsonify(page.to_dict('evaluations', [serialize(evaluation, fields) for evaluation in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _teacher_statistics():
+    # 1 query GROUP BY (department, status) cho cả tổng số, số theo trạng thái và phân bố khoa
+    total_teachers = 0
+    by_status = {}
+    departments = {}
+    for department, status, count in db.session.query(
+        Teacher.department, Teacher.status, db.func.count(Teacher.id)
+    ).group_by(Teacher.department, Teacher.status):
+        total_teachers += count
+        by_status[status] = by_status.get(status, 0) + count
+        departments[department] = departments.get(department, 0) + count
+    
+    return {
+        'total_teachers': total_teachers,
+        'active_teachers': by_status.get('active', 0),
+        'retired_teachers': by_status.get('retired', 0),
+        'departments_distribution': [{'department': dept, 'count': count} for dept, count in departments.items()]
+    }
+
 @teacher_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_teacher_statistics():
     try:
-        total_teachers = Teacher.query.count()
-        active_teachers = Teacher.query.filter_by(status='active').count()
-        retired_teachers = Teacher.query.filter_by(status='retired').count()
-        
-        # Get departments distribution
-        departments = db.session.query(
-            Teacher.department, 
-            db.func.count(Teacher.id)
-        ).group_by(Teacher.department).all()
-        
-        return jsonify({
-            'total_teachers': total_teachers,
-            'active_teachers': active_teachers,
-            'retired_teachers': retired_teachers,
-            'departments_distribution': [{'department': dept, 'count': count} for dept, count in departments]
-        }), 200
+        return jsonify(stats_cache.get('teachers', ('teachers',), _teacher_statistics)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
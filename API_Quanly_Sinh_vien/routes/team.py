@@ -1,17 +1,35 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from models import db, Team, TeamMember, Student, Project, User
 from sqlalchemy import and_
+from sqlalchemy.orm import selectinload, joinedload
 from utils.decorators import admin_required, teacher_or_admin_required
+from utils.pagination import paginate
 
 team_bp = Blueprint('team', __name__)
 
+# các cột được phép dùng cho ?sort= (thêm '-' phía trước để sort giảm dần), cột nào cũng có index (cột, id) hoặc unique
+TEAM_SORTS = {'id': Team.id, 'team_name': Team.team_name}
+# nạp thành viên active + student của mọi team trong trang bằng 2 câu SELECT ... IN (...) thay vì 1 query / team
+# và 1 query / thành viên; team.members được nạp theo cách này chỉ chứa các thành viên active
+ACTIVE_MEMBERS = selectinload(Team.members.and_(TeamMember.status == 'active')).selectinload(TeamMember.student)
+
+
+def team_with_members(team):
+    """team.to_dict() kèm danh sách thành viên active (team phải được query với options(ACTIVE_MEMBERS))"""
+    team_data = team.to_dict()
+    team_data['members'] = []
+    for member in team.members:
+        member_data = member.to_dict()
+        member_data['student'] = member.student.to_dict()
+        team_data['members'].append(member_data)
+    return team_data
+
+
 @team_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_teams():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         status = request.args.get('status', '')
         project_id = request.args.get('project_id', type=int)
@@ -27,30 +45,13 @@ def get_teams():
         if project_id:
             query = query.filter(Team.project_id == project_id)
         
-        teams = query.paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        page = paginate(query.options(ACTIVE_MEMBERS), Team, TEAM_SORTS)
         
         # Add member info to each team
-        teams_data = []
-        for team in teams.items:
-            team_data = team.to_dict()
-            team_data['members'] = []
-            for member in team.members:
-                if member.status == 'active':
-                    member_data = member.to_dict()
-                    member_data['student'] = member.student.to_dict()
-                    team_data['members'].append(member_data)
-            team_data['member_count'] = len(team_data['members'])
-            teams_data.append(team_data)
-        
-        return jsonify({
-            'teams': teams_data,
-            'total': teams.total,
-            'pages': teams.pages,
-            'current_page': page
-        }), 200
+        return jsonify(page.to_dict('teams', [team_with_members(team) for team in page.items])), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -58,21 +59,13 @@ def get_teams():
 @jwt_required()
 def get_team(team_id):
     try:
-        team = Team.query.get(team_id)
+        team = Team.query.options(ACTIVE_MEMBERS, joinedload(Team.project)).get(team_id)
         
         if not team:
             return jsonify({'error': 'Team not found'}), 404
         
-        team_data = team.to_dict()
-        team_data['members'] = []
-        for member in team.members:
-            if member.status == 'active':
-                member_data = member.to_dict()
-                member_data['student'] = member.student.to_dict()
-                team_data['members'].append(member_data)
-        
+        team_data = team_with_members(team)
         team_data['project'] = team.project.to_dict()
-        team_data['member_count'] = len(team_data['members'])
         
         return jsonify({'team': team_data}), 200
         
@@ -248,13 +241,8 @@ def add_team_member(team_id):
                 existing_member.joined_at = db.func.now()
                 existing_member.left_at = None
         else:
-            # Check if team has reached max size
-            active_members = TeamMember.query.filter_by(
-                team_id=team_id,
-                status='active'
-            ).count()
-            
-            if active_members >= team.project.max_team_size:
+            # Check if team has reached max size (cột đếm, không COUNT lại thành viên)
+            if team.active_member_count >= team.project.max_team_size:
                 return jsonify({'error': 'Team has reached maximum size'}), 400
             
             # Add new member
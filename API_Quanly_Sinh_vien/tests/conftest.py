@@ -0,0 +1,115 @@
+# conftest.py fixture dùng chung cho các test của API
+# - app chạy trên file SQLite tạm (hoặc TEST_DATABASE_URL, vd: 1 database MySQL riêng cho CI), không bao giờ
+#   dùng DATABASE_URL của môi trường deploy; database được dựng lại sau mỗi test
+# - NPLUSONE_DETECTION=raise: endpoint nào chạy lặp 1 câu query quá NPLUSONE_THRESHOLD lần sẽ trả 500
+# - query_budget: giới hạn số query của 1 lần gọi endpoint
+import os
+import tempfile
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix='api-tests-')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(_TMP_DIR, 'uploads')
+os.environ['METRICS_HISTORY_DB'] = ''
+os.environ['JWT_SECRET_KEY'] = 'test-jwt-secret-key-' + '0' * 32
+os.environ['NPLUSONE_DETECTION'] = 'raise'
+
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Student, Teacher
+from utils.identity import create_identity_claims
+from utils.nplusone import assert_max_queries
+from utils.count_cache import count_cache
+from utils.stats_cache import stats_cache
+from utils.typeahead import student_typeahead, teacher_typeahead
+
+PASSWORD = 'secret123'
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def _fresh_database(app):
+    yield
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+    count_cache.clear()
+    stats_cache.clear()
+    student_typeahead.invalidate()
+    teacher_typeahead.invalidate()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def _password_hash():
+    # băm 1 lần cho cả phiên test (mỗi lần băm mất vài trăm ms)
+    return generate_password_hash(PASSWORD)
+
+
+@pytest.fixture
+def make_user(app, _password_hash):
+    """
+    Tạo user (kèm hồ sơ Student / Teacher theo role), trả về (user_id, profile_id)
+
+        student_user_id, student_id = make_user('student')
+    """
+    counter = iter(range(1, 10 ** 6))
+
+    def make(role='student', **profile):
+        number = next(counter)
+        with app.app_context():
+            user = User(username=f'{role}{number}', email=f'{role}{number}@test.local', role=role,
+                        password_hash=_password_hash)
+            db.session.add(user)
+            db.session.flush()
+            profile_obj = None
+            if role == 'student':
+                profile_obj = Student(user_id=user.id, student_code=f'SV{number:04d}',
+                                      full_name=profile.pop('full_name', f'Student {number}'),
+                                      major=profile.pop('major', 'IT'), **profile)
+            elif role == 'teacher':
+                profile_obj = Teacher(user_id=user.id, teacher_code=f'GV{number:04d}',
+                                      full_name=profile.pop('full_name', f'Teacher {number}'),
+                                      department=profile.pop('department', 'IT'), **profile)
+            if profile_obj is not None:
+                db.session.add(profile_obj)
+            db.session.commit()
+            return user.id, profile_obj.id if profile_obj is not None else None
+
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    """Header Authorization cho user_id, token có cùng claims như khi đăng nhập qua /api/auth/login"""
+
+    def headers(user_id):
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            token = create_access_token(identity=str(user.id), additional_claims=create_identity_claims(user))
+        return {'Authorization': f'Bearer {token}'}
+
+    return headers
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Giới hạn số query của 1 lần gọi endpoint (QueryBudgetExceeded nếu vượt), xem utils/nplusone.assert_max_queries
+
+        with query_budget(4, max_repeats=1):
+            client.get('/api/teams/', headers=headers)
+    """
+    return assert_max_queries
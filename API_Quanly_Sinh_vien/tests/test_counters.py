@@ -0,0 +1,79 @@
+# cột đếm vẫn đúng khi sửa / xóa object đã expire (expire_on_commit): giá trị cũ không có trong history
+import pytest
+from models import db, Project, Team, TeamMember, ProjectSubmission
+from utils.counters import repair_counters
+
+
+@pytest.fixture
+def project_with_team(app, make_user):
+    """1 project có 1 team active 2 thành viên và 1 bài nộp submitted, trả về (project_id, team_id)"""
+    _, teacher_id = make_user('teacher')
+    student_ids = [make_user('student')[1] for _ in range(2)]
+    with app.app_context():
+        project = Project(project_code='P1', title='Project', supervisor_id=teacher_id)
+        db.session.add(project)
+        db.session.flush()
+        team = Team(team_name='Team', project_id=project.id, leader_id=student_ids[0], status='active')
+        db.session.add(team)
+        db.session.flush()
+        db.session.add_all(TeamMember(team_id=team.id, student_id=student_id, status='active')
+                           for student_id in student_ids)
+        db.session.add(ProjectSubmission(project_id=project.id, team_id=team.id, submission_type='team',
+                                         title='Report', status='submitted'))
+        db.session.commit()
+        return project.id, team.id
+
+
+def _counts(project_id, team_id):
+    db.session.expire_all()
+    project, team = db.session.get(Project, project_id), db.session.get(Team, team_id)
+    return team.active_member_count, project.team_count, project.submission_count, \
+        project.submitted_submission_count, project.approved_submission_count
+
+
+def _assert_repair_is_noop():
+    assert repair_counters() == {'teams': 0, 'projects': 0}
+
+
+@pytest.mark.parametrize('before, after, team_count', [('active', 'disbanded', 0), ('disbanded', 'active', 1)])
+def test_status_change_on_expired_team(app, project_with_team, before, after, team_count):
+    project_id, team_id = project_with_team
+    with app.app_context():
+        team = db.session.get(Team, team_id)
+        team.status = before
+        db.session.commit()  # expire_on_commit: mọi thuộc tính của team đã expire
+        assert 'status' in db.inspect(team).unloaded
+
+        team.status = after
+        db.session.commit()
+
+        assert _counts(project_id, team_id) == (2, team_count, 1, 1, 0)
+        _assert_repair_is_noop()
+
+
+def test_status_change_on_expired_member_and_submission(app, project_with_team):
+    project_id, team_id = project_with_team
+    with app.app_context():
+        member = TeamMember.query.filter_by(team_id=team_id).first()
+        submission = ProjectSubmission.query.filter_by(project_id=project_id).one()
+        db.session.commit()
+
+        member.status = 'left'
+        submission.status = 'approved'
+        db.session.commit()
+
+        assert _counts(project_id, team_id) == (1, 1, 1, 0, 1)
+        _assert_repair_is_noop()
+
+
+def test_delete_expired_submission(app, project_with_team):
+    project_id, team_id = project_with_team
+    with app.app_context():
+        submission = ProjectSubmission.query.filter_by(project_id=project_id).one()
+        db.session.commit()
+
+        db.session.delete(submission)
+        db.session.commit()
+
+        assert _counts(project_id, team_id) == (2, 1, 0, 0, 0)
+        _assert_repair_is_noop()
@@ -0,0 +1,65 @@
+# token còn hợp lệ nhưng user không còn trong database: route trả về 404 / 403, không phải 500
+import pytest
+from models import db, User, Student, Project
+
+
+@pytest.fixture
+def orphan_headers(app, make_user, auth_headers):
+    """Header của 1 student chưa có hồ sơ lúc đăng nhập (claims không có student_id), user đã bị xóa sau đó"""
+    user_id, student_id = make_user('student')
+    with app.app_context():
+        db.session.delete(db.session.get(Student, student_id))
+        db.session.commit()
+    headers = auth_headers(user_id)
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+    return headers
+
+
+@pytest.mark.parametrize('url, data', [
+    ('/api/submissions/submissions', {'project_id': 1, 'submission_type': 'individual', 'title': 'Report'}),
+    ('/api/submissions/evaluations', {'project_id': 1, 'submission_id': 1, 'evaluator_type': 'student'}),
+])
+def test_write_routes_return_404_for_deleted_user(client, orphan_headers, url, data):
+    response = client.post(url, json=data, headers=orphan_headers)
+
+    assert response.status_code == 404
+    assert response.json == {'error': 'User not found'}
+
+
+def test_metrics_returns_403_for_deleted_user(app, client, orphan_headers, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', None)
+
+    response = client.get('/api/monitor/metrics', headers=orphan_headers)
+
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize('method, url', [
+    ('put', '/api/admin/users/{user_id}/toggle-active'),
+    ('put', '/api/admin/users/{user_id}/change-role'),
+    ('delete', '/api/admin/users/{user_id}'),
+])
+def test_admin_cannot_change_own_account(client, make_user, auth_headers, method, url):
+    admin_id, _ = make_user('admin')
+
+    response = getattr(client, method)(url.format(user_id=admin_id), json={'role': 'student'},
+                                       headers=auth_headers(admin_id))
+
+    assert response.status_code == 400
+
+
+def test_uploaded_document_records_current_user(app, client, make_user, auth_headers):
+    teacher_user_id, teacher_id = make_user('teacher')
+    with app.app_context():
+        project = Project(project_code='P1', title='Project', supervisor_id=teacher_id)
+        db.session.add(project)
+        db.session.commit()
+        project_id = project.id
+
+    response = client.post(f'/api/projects/{project_id}/documents', json={'title': 'Spec'},
+                           headers=auth_headers(teacher_user_id))
+
+    assert response.status_code == 201, response.json
+    assert response.json['document']['uploaded_by'] == teacher_user_id
@@ -0,0 +1,62 @@
+# ?q= khi không có FULLTEXT (SQLite): id khớp từ inverted index được kiểm tra filter theo từng nhóm SEARCH_CHUNK id
+import re
+import pytest
+from models import db, Project
+from utils import project_search as search_module
+from utils.nplusone import count_queries
+
+IN_LIST = re.compile(r'projects\.id IN \(([?, ]*)\)')
+
+
+@pytest.fixture
+def seed_projects(app, make_user):
+    """9 project có 'flask' trong title, project có id chẵn ở trạng thái published"""
+    _, teacher_id = make_user('teacher')
+    with app.app_context():
+        for number in range(1, 10):
+            db.session.add(Project(project_code=f'P{number}', title=f'Flask app {number}', supervisor_id=teacher_id,
+                                   status='published' if number % 2 == 0 else 'draft'))
+        db.session.commit()
+
+
+def _search(client, headers, **params):
+    response = client.get('/api/projects/', query_string={'q': 'flask', **params}, headers=headers)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def _in_list_sizes(statements):
+    """Số id bind trong projects.id IN (...) của từng câu query"""
+    return [match.count('?') for statement in statements for match in IN_LIST.findall(statement)]
+
+
+def test_search_filters_matches_in_bounded_chunks(client, make_user, auth_headers,
+                                                  seed_projects, monkeypatch):
+    monkeypatch.setattr(search_module, 'SEARCH_CHUNK', 2)
+    admin_id, _ = make_user('admin')
+    headers = auth_headers(admin_id)
+
+    with count_queries() as statements:
+        first = _search(client, headers, status='published', per_page=3)
+    second = _search(client, headers, status='published', per_page=3, page=2)
+
+    assert first['total'] == second['total'] == 4
+    ids = [project['id'] for project in first['projects'] + second['projects']]
+    assert ids == [2, 4, 6, 8]
+    assert all(project['status'] == 'published' for project in first['projects'] + second['projects'])
+    assert max(_in_list_sizes(statements)) <= 3  # nhóm 2 id hoặc trang 3 id, không bind cả 9 id
+
+
+def test_search_without_total_stops_after_the_page(client, make_user, auth_headers,
+                                                   seed_projects, monkeypatch):
+    monkeypatch.setattr(search_module, 'SEARCH_CHUNK', 2)
+    admin_id, _ = make_user('admin')
+
+    with count_queries() as statements:
+        page = _search(client, auth_headers(admin_id), status='published', per_page=1, include_total=0)
+
+    assert [project['id'] for project in page['projects']] == [2]
+    assert page['has_more'] is True
+    assert 'total' not in page
+    # 2 nhóm (id 1-2, 3-4) đủ để biết còn trang sau, cộng 1 query nạp trang
+    assert len(_in_list_sizes(statements)) == 3
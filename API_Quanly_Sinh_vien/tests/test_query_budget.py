@@ -0,0 +1,40 @@
+import pytest
+from models import db, Student
+from utils.nplusone import QueryBudgetExceeded, fingerprint
+
+
+def test_fingerprint_ignores_whitespace_and_in_list_length():
+    assert fingerprint('SELECT *\n  FROM students WHERE id IN (?, ?, ?)') == \
+        fingerprint('SELECT * FROM students WHERE id IN (?)')
+
+
+def test_query_budget_counts_endpoint_queries(client, make_user, auth_headers, query_budget):
+    admin_id, _ = make_user('admin')
+    make_user('student')
+    headers = auth_headers(admin_id)
+
+    with query_budget(3, max_repeats=1) as statements:
+        response = client.get('/api/students/', headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.json['students']) == 1
+    assert statements
+
+
+def test_query_budget_fails_when_exceeded(client, make_user, auth_headers, query_budget):
+    admin_id, _ = make_user('admin')
+    headers = auth_headers(admin_id)
+
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(0):
+            client.get('/api/students/', headers=headers)
+
+
+def test_query_budget_fails_on_repeated_query(app, make_user, query_budget):
+    student_ids = [make_user('student')[1] for _ in range(3)]
+
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='ran 3 times'):
+            with query_budget(10, max_repeats=2):
+                for student_id in student_ids:
+                    db.session.get(Student, student_id)
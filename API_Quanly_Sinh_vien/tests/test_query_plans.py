@@ -0,0 +1,133 @@
+# các câu SELECT mà endpoint danh sách có filter thực sự chạy không được quét toàn bộ bảng:
+# gọi chính route, bắt câu SQL + tham số đã gửi tới database, rồi chạy EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (MySQL)
+# với đúng câu đó. Chạy trên MySQL: TEST_DATABASE_URL=mysql+pymysql://... python -m pytest -q tests/test_query_plans.py
+from contextlib import contextmanager
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db, Project, ProjectDocument, Team, TeamMember, ProjectSubmission, ProjectEvaluation
+
+PROJECTS = 40
+
+# (role gọi endpoint, url, các bảng được phép quét toàn bộ)
+# danh sách student xem (EXISTS) phải duyệt projects / submissions theo id, chỉ subquery cần dùng index
+ENDPOINTS = {
+    'students?major&status': ('admin', '/api/students/?major=IT&status=active', ()),
+    'students?status': ('admin', '/api/students/?status=active', ()),
+    'teachers?department': ('admin', '/api/teachers/?department=IT', ()),
+    'projects?status': ('admin', '/api/projects/?status=published', ()),
+    'projects?academic_year&semester': ('admin', '/api/projects/?academic_year=2024-2025&semester=HK1', ()),
+    'projects (student)': ('student', '/api/projects/', ('projects',)),
+    'teachers/<id>/projects': ('admin', '/api/teachers/{teacher_id}/projects', ()),
+    'projects/<id>/documents': ('admin', '/api/projects/{project_id}/documents', ()),
+    'projects/<id>/teams': ('admin', '/api/projects/{project_id}/teams', ()),
+    'teams?project_id&status': ('admin', '/api/teams/?project_id={project_id}&status=active', ()),
+    'students/<id>/teams': ('admin', '/api/students/{student_id}/teams', ()),
+    'students/<id>/projects': ('admin', '/api/students/{student_id}/projects', ()),
+    'submissions?project_id&status': (
+        'admin', '/api/submissions/submissions?project_id={project_id}&status=submitted', ()),
+    'submissions?team_id': ('admin', '/api/submissions/submissions?team_id={team_id}', ()),
+    'submissions?student_id': ('admin', '/api/submissions/submissions?student_id={student_id}', ()),
+    'submissions?status&category': ('admin', '/api/submissions/submissions?status=submitted&category=final', ()),
+    'submissions (student)': ('student', '/api/submissions/submissions', ('project_submissions',)),
+    'evaluations?submission_id': ('admin', '/api/submissions/evaluations?submission_id={submission_id}', ()),
+    'evaluations?project_id&evaluator_type': (
+        'admin', '/api/submissions/evaluations?project_id={project_id}&evaluator_type=teacher', ()),
+    'teachers/<id>/evaluations': ('admin', '/api/teachers/{teacher_id}/evaluations', ()),
+}
+
+
+@contextmanager
+def captured_selects():
+    """Các (câu SELECT, tham số) chạy trong khối with"""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', listener)
+
+
+def full_scans(statement, parameters):
+    """Các bảng bị quét toàn bộ trong plan của câu SQL (bảng tạm / subquery trong FROM không tính)"""
+    tables = db.metadata.tables
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            # 'SCAN students' / 'SCAN students USING INDEX ...' / 'SEARCH students USING INDEX ...'
+            details = [row.detail.split() for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement,
+                                                                          parameters)]
+            return [words[1] for words in details if words[0] == 'SCAN' and words[1] in tables and
+                    'INDEX' not in words]
+        rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).mappings()
+        return [row['table'] for row in rows if row['type'] == 'ALL' and row['table'] in tables]
+
+
+@pytest.fixture
+def seed(app, make_user):
+    """PROJECTS project, mỗi project 1 team 3 người, 2 bài nộp (nhóm, cá nhân), 1 đánh giá, 1 tài liệu"""
+    teacher_user_id, teacher_id = make_user('teacher')
+    student_user_id, student_id = make_user('student')
+    others = [make_user('student', major='CS' if number % 2 else 'IT')[1] for number in range(10)]
+    with app.app_context():
+        for number in range(PROJECTS):
+            project = Project(project_code=f'P{number:03d}', title=f'Project {number}', supervisor_id=teacher_id,
+                              status='published' if number % 4 == 0 else 'draft',
+                              academic_year='2024-2025' if number % 2 else '2023-2024',
+                              semester='HK1' if number % 3 else 'HK2')
+            db.session.add(project)
+            db.session.flush()
+            members = [student_id if number % 8 == 0 else others[number % 10], others[(number + 1) % 10],
+                       others[(number + 2) % 10]]
+            team = Team(team_name=f'Team {number}', project_id=project.id, leader_id=members[0],
+                        status='active' if number % 2 else 'disbanded')
+            db.session.add(team)
+            db.session.flush()
+            db.session.add_all(TeamMember(team_id=team.id, student_id=member_id, status='active')
+                               for member_id in members)
+            team_submission = ProjectSubmission(project_id=project.id, team_id=team.id, submission_type='team',
+                                                title=f'Report {number}', submission_category='final',
+                                                status='submitted' if number % 3 else 'approved',
+                                                submitted_at=datetime.utcnow())
+            db.session.add_all([
+                team_submission,
+                ProjectSubmission(project_id=project.id, student_id=members[1], submission_type='individual',
+                                  title=f'Proposal {number}', submission_category='proposal', status='draft'),
+                ProjectDocument(project_id=project.id, title=f'Spec {number}', uploaded_by=teacher_user_id),
+            ])
+            db.session.flush()
+            db.session.add(ProjectEvaluation(project_id=project.id, submission_id=team_submission.id,
+                                             evaluator_type='teacher', evaluator_teacher_id=teacher_id))
+        db.session.commit()
+        first = Project.query.order_by(Project.id).first()
+        return {
+            'student_user_id': student_user_id,
+            'student_id': student_id,
+            'teacher_id': teacher_id,
+            'project_id': first.id,
+            'team_id': Team.query.filter(Team.project_id == first.id).one().id,
+            'submission_id': ProjectSubmission.query.filter(ProjectSubmission.project_id == first.id,
+                                                            ProjectSubmission.team_id.isnot(None)).one().id,
+        }
+
+
+@pytest.mark.parametrize('name', list(ENDPOINTS))
+def test_list_endpoint_queries_use_indexes(app, client, make_user, auth_headers, seed, name):
+    role, url, allowed = ENDPOINTS[name]
+    user_id = seed['student_user_id'] if role == 'student' else make_user('admin')[0]
+
+    with captured_selects() as statements:
+        response = client.get(url.format(**seed), headers=auth_headers(user_id))
+
+    assert response.status_code == 200, response.json
+    assert statements
+    with app.app_context():
+        problems = {statement: scanned for statement, parameters in statements
+                    if (scanned := [table for table in full_scans(statement, parameters) if table not in allowed])}
+    assert not problems, f'{name}: full table scan\n' + '\n\n'.join(
+        f'{", ".join(tables)}:\n{statement}' for statement, tables in problems.items())
@@ -0,0 +1,62 @@
+# số query của các endpoint chỉ trả về dữ liệu của 1 sinh viên không phụ thuộc số team / project / submission
+# của sinh viên đó (JOIN / EXISTS nằm ngay trong query chính, xem routes/student.py, project.py, submission.py)
+import pytest
+from datetime import datetime
+from models import db, Project, Team, TeamMember, ProjectSubmission
+
+# auth không query (claims trong token); các số dưới đây là số query của cả request
+EXPECTED_QUERIES = {
+    '/api/students/{student_id}/teams': 2,  # student + JOIN teams
+    '/api/students/{student_id}/projects': 2,  # student + JOIN projects
+    '/api/projects/': 2,  # COUNT + trang (EXISTS team / submission)
+    '/api/submissions/submissions': 2,  # COUNT + trang (EXISTS team member)
+}
+
+
+@pytest.fixture
+def seed_student(app, make_user):
+    """1 sinh viên tham gia `projects` project, mỗi project: 1 team 3 người, 1 bài nộp nhóm và 1 bài nộp cá nhân"""
+
+    def seed(projects):
+        _, teacher_id = make_user('teacher')
+        user_id, student_id = make_user('student')
+        others = [make_user('student')[1] for _ in range(2)]
+        with app.app_context():
+            for number in range(projects):
+                project = Project(project_code=f'P{number}', title=f'Project {number}', supervisor_id=teacher_id,
+                                  status='published')
+                db.session.add(project)
+                db.session.flush()
+                team = Team(team_name=f'Team {number}', project_id=project.id, leader_id=student_id, status='active')
+                db.session.add(team)
+                db.session.flush()
+                for position, member_id in enumerate([student_id, *others]):
+                    db.session.add(TeamMember(team_id=team.id, student_id=member_id,
+                                              role='leader' if position == 0 else 'member', status='active'))
+                db.session.add_all([
+                    ProjectSubmission(project_id=project.id, team_id=team.id, submission_type='team',
+                                      title=f'Team report {number}', status='submitted',
+                                      submitted_at=datetime.utcnow()),
+                    ProjectSubmission(project_id=project.id, student_id=student_id, submission_type='individual',
+                                      title=f'Report {number}', status='submitted', submitted_at=datetime.utcnow()),
+                ])
+            db.session.commit()
+        return user_id, student_id
+
+    return seed
+
+
+@pytest.mark.parametrize('projects', [1, 5])
+@pytest.mark.parametrize('url', list(EXPECTED_QUERIES))
+def test_student_scope_query_count_does_not_grow(client, auth_headers, query_budget, seed_student, url, projects):
+    user_id, student_id = seed_student(projects)
+    headers = auth_headers(user_id)
+    expected = EXPECTED_QUERIES[url]
+
+    with query_budget(expected, max_repeats=1) as statements:
+        response = client.get(url.format(student_id=student_id), headers=headers)
+
+    assert response.status_code == 200, response.json
+    assert len(statements) == expected
+    key = 'submissions' if 'submissions' in response.json else 'projects' if 'projects' in response.json else 'teams'
+    assert len(response.json[key]) == (2 * projects if key == 'submissions' else projects)
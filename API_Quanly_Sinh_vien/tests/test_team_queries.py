@@ -0,0 +1,60 @@
+# số query của các endpoint trả về team kèm thành viên không phụ thuộc số thành viên / số team
+# (thành viên và student được nạp bằng selectinload, xem routes/team.py ACTIVE_MEMBERS)
+import pytest
+from models import db, Project, Team, TeamMember
+
+# auth không query (claims trong token), còn lại: team(s) [+ COUNT], members IN (...), students IN (...)
+EXPECTED_QUERIES = {
+    '/api/teams/': 4,
+    '/api/teams/{team_id}': 3,
+    '/api/projects/{project_id}/teams': 4,
+}
+
+
+@pytest.fixture
+def seed_teams(app, make_user):
+    """Tạo 1 project có `teams` team, mỗi team `size` thành viên active và 1 thành viên đã rời nhóm"""
+
+    def seed(size, teams=3):
+        _, teacher_id = make_user('teacher')
+        student_ids = [make_user('student')[1] for _ in range(teams * (size + 1))]
+        with app.app_context():
+            project = Project(project_code='P1', title='Project', supervisor_id=teacher_id, max_team_size=size + 1)
+            db.session.add(project)
+            db.session.flush()
+            team_ids = []
+            for number in range(teams):
+                members = student_ids[number * (size + 1):(number + 1) * (size + 1)]
+                team = Team(team_name=f'Team {number}', project_id=project.id, leader_id=members[0], status='active')
+                db.session.add(team)
+                db.session.flush()
+                for position, student_id in enumerate(members):
+                    db.session.add(TeamMember(team_id=team.id, student_id=student_id,
+                                              role='leader' if position == 0 else 'member',
+                                              status='left' if position == size else 'active'))
+                team_ids.append(team.id)
+            db.session.commit()
+            return project.id, team_ids
+
+    return seed
+
+
+@pytest.mark.parametrize('size', [1, 6])
+@pytest.mark.parametrize('url', list(EXPECTED_QUERIES))
+def test_team_endpoints_query_count_does_not_grow_with_members(client, make_user, auth_headers, query_budget,
+                                                                seed_teams, url, size):
+    admin_id, _ = make_user('admin')
+    headers = auth_headers(admin_id)
+    project_id, team_ids = seed_teams(size)
+    expected = EXPECTED_QUERIES[url]
+
+    with query_budget(expected, max_repeats=1) as statements:
+        response = client.get(url.format(team_id=team_ids[0], project_id=project_id), headers=headers)
+
+    assert response.status_code == 200, response.json
+    assert len(statements) == expected
+    teams = response.json['teams'] if 'teams' in response.json else [response.json['team']]
+    for team in teams:
+        assert len(team['members']) == size
+        assert team['member_count'] == size
+        assert all(member['student'] for member in team['members'])
@@ -0,0 +1,49 @@
+import time
+import threading
+
+
+class TTLCache:
+    """Cache in-memory nhỏ, mỗi key tự hết hạn sau ttl_seconds.
+
+    Thread-safe, dùng chung cho các worker thread trong cùng process.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data = {}  # key -> (expires_at, value)
+
+    def _purge_expired(self, now: float):
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            del self._data[key]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if item[0] <= now:
+                del self._data[key]
+                return default
+            return item[1]
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            self._data[key] = (now + self.ttl_seconds, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._data)
@@ -0,0 +1,117 @@
+# count_cache.py cache ngắn hạn cho COUNT(*) của các danh sách phân trang (?include_total=approx)
+# key = câu SQL đếm đã compile + tham số (tức là bộ filter đã chuẩn hóa), mỗi entry sống COUNT_CACHE_TTL_SEC giây
+# và bị bỏ ngay khi 1 bảng mà câu đếm đọc tới có thay đổi được commit trong process này
+# (worker khác commit thì entry vẫn có thể lệch tối đa TTL giây, nên gọi là "approx")
+import os
+import time
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+COUNT_CACHE_TTL_SEC = float(os.environ.get('COUNT_CACHE_TTL_SEC', 30))
+COUNT_CACHE_MAX_ENTRIES = int(os.environ.get('COUNT_CACHE_MAX_ENTRIES', 1024))
+
+
+class TableVersions:
+    """Số phiên bản của từng bảng, tăng lên mỗi khi 1 transaction có ghi vào bảng đó được commit."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+table_versions = TableVersions()
+
+
+def _after_flush(session, flush_context):
+    # ghi nhớ các bảng bị ghi, chỉ tăng version khi commit (rollback thì bỏ)
+    changed = session.info.setdefault('_changed_tables', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            changed.add(table)
+
+
+def _after_commit(session):
+    changed = session.info.pop('_changed_tables', None)
+    if changed:
+        table_versions.bump(changed)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('_changed_tables', None)
+
+
+def _after_bulk(orm_execute_state):
+    # insert(Model) executemany (import danh sách), Query.update() / Query.delete() không đi qua flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.bind_mapper, 'local_table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('_changed_tables', set()).add(table.name)
+
+
+def install_table_change_tracking():
+    """Đăng ký event cho mọi Session để biết bảng nào vừa thay đổi (gọi 1 lần khi tạo app)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_soft_rollback', _after_rollback)
+        event.listen(Session, 'do_orm_execute', _after_bulk)
+
+
+class CountCache:
+    """LRU + TTL cache cho kết quả COUNT(*) theo câu query đã chuẩn hóa."""
+
+    def __init__(self, ttl: float = COUNT_CACHE_TTL_SEC, max_entries: int = COUNT_CACHE_MAX_ENTRIES,
+                 versions: TableVersions = table_versions):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, table versions, count)
+
+    @staticmethod
+    def _key(query):
+        statement = query.statement
+        compiled = statement.compile(dialect=query.session.get_bind().dialect)
+        params = tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+        tables = tuple(sorted({table.name for table in find_tables(statement, include_joins=True)
+                               if getattr(table, 'name', None)}))
+        return (str(compiled), params), tables
+
+    def count(self, query):
+        """COUNT(*) của query (không có ORDER BY), lấy từ cache nếu còn hạn và các bảng chưa đổi"""
+        key, tables = self._key(query)
+        versions = self.versions.get(tables)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[1] == versions:
+                self._entries.move_to_end(key)
+                return entry[2]
+        total = query.count()
+        with self._lock:
+            self._entries[key] = (now + self.ttl, versions, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance used by app
+count_cache = CountCache()
@@ -0,0 +1,182 @@
+# counters.py các cột đếm (denormalized counter) để các endpoint đọc không phải COUNT / nạp cả danh sách:
+#   teams.active_member_count                        số TeamMember có status 'active'
+#   projects.team_count                              số Team chưa giải tán (status != 'disbanded')
+#   projects.submission_count, <status>_submission_count   số ProjectSubmission (tổng và theo status)
+# Sau mỗi flush, các TeamMember / Team / ProjectSubmission được thêm, sửa (status, khóa ngoại) hoặc xóa
+# được quy thành các lệnh UPDATE ... SET col = col + delta chạy trong cùng transaction: rollback thì counter
+# cũng rollback, 2 request ghi cùng lúc không làm mất cập nhật của nhau.
+# Cột được thêm vào database cũ và tính giá trị ban đầu bằng migration (`flask db upgrade`).
+# Query.update() / Query.delete() hàng loạt và SQL chạy trực tiếp không đi qua flush: chạy
+# `flask --app app:create_app repair-counters` để tính lại toàn bộ.
+from collections import defaultdict
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from models import db, Project, ProjectSubmission, Team, TeamMember
+
+SUBMISSION_STATUSES = ('draft', 'submitted', 'under_review', 'approved', 'rejected', 'revision_required')
+
+
+def _member_counters(team_id, status):
+    return [(Team, team_id, 'active_member_count')] if status == 'active' else []
+
+
+def _team_counters(project_id, status):
+    return [(Project, project_id, 'team_count')] if status != 'disbanded' else []
+
+
+def _submission_counters(project_id, status):
+    counters = [(Project, project_id, 'submission_count')]
+    if status in SUBMISSION_STATUSES:
+        counters.append((Project, project_id, f'{status}_submission_count'))
+    return counters
+
+
+# model -> (khóa ngoại tới dòng chứa counter, hàm trả về các counter mà 1 dòng đóng góp)
+_TRACKED = {
+    TeamMember: ('team_id', _member_counters),
+    Team: ('project_id', _team_counters),
+    ProjectSubmission: ('project_id', _submission_counters),
+}
+
+
+def _tracked_keys(obj):
+    return _TRACKED[type(obj)][0], 'status'
+
+
+def _value(obj, key, new, loaded):
+    """
+    Giá trị của thuộc tính trước (new=False) hoặc sau (new=True) flush
+
+    Thuộc tính đã expire (vd: sau commit với expire_on_commit) không có giá trị cũ trong history:
+    dùng giá trị _before_flush đã đọc từ database (loaded)
+    """
+    history = inspect(obj).attrs[key].history
+    values = (history.added if new else history.deleted) or history.unchanged
+    if values:
+        return values[0]
+    if key in loaded:
+        return loaded[key]
+    if new:
+        default = obj.__table__.columns[key].default
+        return default.arg if default is not None and default.is_scalar else None
+    return None
+
+
+def _contributions(obj, new, loaded):
+    fk, counters = _TRACKED[type(obj)]
+    target_id = _value(obj, fk, new, loaded)
+    if target_id is None:
+        return []
+    return counters(target_id, _value(obj, 'status', new, loaded))
+
+
+def _before_flush(session, flush_context, instances):
+    # dòng sắp bị sửa / xóa mà giá trị cũ của khóa ngoại hoặc status chưa nằm trong history (thuộc tính đã expire):
+    # đọc từ database trước khi flush ghi đè, để after_flush không bỏ qua delta của dòng đó
+    loaded = {}
+    conn = None
+    for obj in (*session.dirty, *session.deleted):
+        if type(obj) not in _TRACKED:
+            continue
+        attrs = inspect(obj).attrs
+        if obj not in session.deleted and not any(attrs[key].history.added for key in _tracked_keys(obj)):
+            continue  # khóa ngoại và status không đổi: không có delta
+        missing = [key for key in _tracked_keys(obj)
+                   if not (attrs[key].history.deleted or attrs[key].history.unchanged)]
+        if not missing:
+            continue
+        table = obj.__table__
+        conn = conn or session.connection()
+        row = conn.execute(select(*(table.c[key] for key in missing)).where(table.c.id == obj.id)).first()
+        if row is not None:
+            loaded[obj] = dict(zip(missing, row))
+    session.info['_counter_loaded'] = loaded
+
+
+def _after_flush(session, flush_context):
+    loaded = session.info.pop('_counter_loaded', {})
+    deltas = defaultdict(int)  # (model, id, cột) -> delta
+    for objects, old, new in ((session.new, False, True), (session.dirty, True, True), (session.deleted, True, False)):
+        for obj in objects:
+            if type(obj) not in _TRACKED:
+                continue
+            if old:
+                for key in _contributions(obj, False, loaded.get(obj, {})):
+                    deltas[key] -= 1
+            if new:
+                for key in _contributions(obj, True, loaded.get(obj, {})):
+                    deltas[key] += 1
+
+    updates = defaultdict(dict)  # (model, id) -> {cột: delta}
+    for (model, target_id, column), delta in deltas.items():
+        if delta:
+            updates[model, target_id][column] = delta
+    if not updates:
+        return
+    conn = session.connection()
+    for (model, target_id), columns in updates.items():
+        table = model.__table__
+        conn.execute(table.update().where(table.c.id == target_id).values(
+            {column: table.c[column] + delta for column, delta in columns.items()}
+        ))
+    session.info.setdefault('_stale_counters', {}).update(updates)
+
+
+def _after_flush_postexec(session, flush_context):
+    # object đang nằm trong session còn giữ giá trị cũ của counter, đọc lại từ DB ở lần truy cập sau
+    stale = session.info.pop('_stale_counters', None)
+    if not stale:
+        return
+    for (model, target_id), columns in stale.items():
+        obj = session.identity_map.get(identity_key(model, target_id))
+        if obj is not None:
+            session.expire(obj, list(columns))
+
+
+def _counter_columns():
+    """{model: {cột counter: subquery đếm lại từ bảng con}}"""
+    member_count = select(func.count(TeamMember.id)).where(
+        TeamMember.team_id == Team.id, TeamMember.status == 'active').scalar_subquery()
+    team_count = select(func.count(Team.id)).where(
+        Team.project_id == Project.id, Team.status != 'disbanded').scalar_subquery()
+    project_columns = {
+        'team_count': team_count,
+        'submission_count': select(func.count(ProjectSubmission.id)).where(
+            ProjectSubmission.project_id == Project.id).scalar_subquery(),
+    }
+    for status in SUBMISSION_STATUSES:
+        project_columns[f'{status}_submission_count'] = select(func.count(ProjectSubmission.id)).where(
+            ProjectSubmission.project_id == Project.id, ProjectSubmission.status == status).scalar_subquery()
+    return {Team: {'active_member_count': member_count}, Project: project_columns}
+
+
+def repair_counters():
+    """
+    Tính lại mọi cột counter từ dữ liệu thật (1 câu UPDATE có subquery cho mỗi bảng, chỉ sửa dòng bị lệch)
+
+    Returns:
+        {'teams': số dòng được sửa, 'projects': số dòng được sửa}
+    """
+    result = {}
+    for model, columns in _counter_columns().items():
+        table = model.__table__
+        outdated = or_(*(table.c[column] != count for column, count in columns.items()))
+        fixed = db.session.execute(table.update().where(outdated).values(columns))
+        result[table.name] = fixed.rowcount
+    db.session.commit()
+    return result
+
+
+def install_counters(app):
+    """Đăng ký event cập nhật counter cho mọi Session và lệnh `flask repair-counters` (gọi 1 lần khi tạo app)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_flush_postexec', _after_flush_postexec)
+
+    @app.cli.command('repair-counters')
+    def repair_counters_command():
+        """Tính lại các cột đếm (teams.active_member_count, projects.team_count, projects.*submission_count)."""
+        result = repair_counters()
+        print(f"Repaired counters: {result['teams']} teams, {result['projects']} projects")
@@ -1,7 +1,6 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from models import User
+from utils.identity import get_current_identity
 
 # phương thức role_required là một decorator để kiểm tra xem user có role là admin hoặc teacher hay không còn student thì không được phép truy cập
 def role_required(*allowed_roles):
@@ -13,17 +12,16 @@ def role_required(*allowed_roles):
         @wraps(fn)  # wraps là một hàm trong functools module để lưu lại thông tin của hàm gốc
         def wrapper(*args, **kwargs): #phương thức wrapper là một hàm để lưu lại thông tin của hàm gốc nghĩa là khi gọi hàm wrapper thì sẽ gọi hàm gốc, hàm gốc ở đây là hàm fn(fn là hàm được truyền vào decorator)
             try:
-                user_id = get_jwt_identity()
-                user = User.query.get(int(user_id))
+                identity = get_current_identity()
                 
-                if not user:
+                if not identity:
                     return jsonify({'error': 'User not found'}), 404
                 
-                if user.role not in allowed_roles:
+                if identity['role'] not in allowed_roles:
                     return jsonify({
                         'error': 'Permission denied',
                         'message': f'This action requires one of these roles: {", ".join(allowed_roles)}',
-                        'your_role': user.role
+                        'your_role': identity['role']
                     }), 403
                 
                 return fn(*args, **kwargs)
@@ -40,13 +38,12 @@ def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(int(user_id))
+            identity = get_current_identity()
             
-            if not user:
+            if not identity:
                 return jsonify({'error': 'User not found'}), 404
             
-            if user.role != 'admin':
+            if identity['role'] != 'admin':
                 return jsonify({
                     'error': 'Admin access required',
                     'message': 'Only administrators can perform this action'
@@ -65,13 +62,12 @@ def teacher_or_admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            user_id = get_jwt_identity()
-            user = User.query.get(int(user_id))
+            identity = get_current_identity()
             
-            if not user:
+            if not identity:
                 return jsonify({'error': 'User not found'}), 404
             
-            if user.role not in ['admin', 'teacher']:
+            if identity['role'] not in ['admin', 'teacher']:
                 return jsonify({
                     'error': 'Permission denied',
                     'message': 'This action requires teacher or admin role'
@@ -92,20 +88,19 @@ def own_resource_or_admin(resource_user_id_getter):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             try:
-                user_id = get_jwt_identity()
-                user = User.query.get(int(user_id))
+                identity = get_current_identity()
                 
-                if not user:
+                if not identity:
                     return jsonify({'error': 'User not found'}), 404
                 
                 # Admin can access everything
-                if user.role == 'admin':
+                if identity['role'] == 'admin':
                     return fn(*args, **kwargs)
                 
                 # Check if user owns the resource
                 resource_user_id = resource_user_id_getter(*args, **kwargs)
                 
-                if resource_user_id != user.id:
+                if resource_user_id != identity['user_id']:
                     return jsonify({
                         'error': 'Permission denied',
                         'message': 'You can only access your own resources'
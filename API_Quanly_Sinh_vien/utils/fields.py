@@ -0,0 +1,54 @@
+# fields.py sparse fieldsets: ?fields=id,title,status chỉ trả về (và chỉ SELECT) các cột được yêu cầu
+# các cột không dùng (vd: Project.description, requirements, objectives kiểu Text) được defer bằng load_only
+# nên không bị đọc từ MySQL và không bị nạp vào object, response danh sách nhỏ hơn nhiều
+from datetime import date, datetime
+from flask import request
+from sqlalchemy.orm import load_only
+
+
+def parse_fields(model, extra=()):
+    """
+    Danh sách field từ ?fields=a,b,c (luôn có id), None nếu không có tham số (trả về đủ như to_dict())
+
+    Args:
+        extra: các field không phải cột mà route tự thêm vào response (vd: 'supervisor', 'team_count')
+
+    Raises:
+        ValueError: field không tồn tại (route trả về 400)
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    columns = model.__table__.columns.keys()
+    fields = ['id']
+    for name in raw.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in columns and name not in extra:
+            raise ValueError(f"Invalid field '{name}', allowed: {', '.join([*columns, *extra])}")
+        fields.append(name)
+    return fields
+
+
+def load_fields(query, model, fields, *required):
+    """Chỉ SELECT các cột trong fields + các cột route cần dùng (khóa ngoại để kiểm tra quyền, nạp relationship...)"""
+    if fields is None:
+        return query
+    columns = model.__table__.columns
+    attributes = [getattr(model, name) for name in fields if name in columns]
+    attributes += [column for column in required if column.key not in fields]
+    return query.options(load_only(*attributes))
+
+
+def serialize(obj, fields):
+    """obj.to_dict() hoặc chỉ các cột trong fields (cùng định dạng với to_dict, ngày giờ dạng ISO)"""
+    if fields is None:
+        return obj.to_dict()
+    columns = obj.__table__.columns
+    data = {}
+    for name in fields:
+        if name in columns:
+            value = getattr(obj, name)
+            data[name] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return data
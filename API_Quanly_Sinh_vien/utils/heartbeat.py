@@ -0,0 +1,80 @@
+# heartbeat.py lưu các client (tab trình duyệt) đang mở trang, dựa trên heartbeat frontend gửi định kỳ
+# tách riêng khỏi metrics_collector: heartbeat đến rất thường xuyên nên không dùng chung lock với
+# metrics request, và không cần quét/tạo lại cả dict để bỏ các client đã offline
+import time
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+ONLINE_WINDOW_SEC = 20  # threshold to consider a user "online"
+
+
+class HeartbeatStore:
+    """Các client đang online, sắp theo thời điểm heartbeat gần nhất (cũ nhất ở đầu).
+
+    Mỗi heartbeat đưa client về cuối OrderedDict (move_to_end, O(1)) nên thứ tự luôn theo thời gian:
+    client hết hạn được bỏ từ đầu danh sách cho tới client đầu tiên còn online, mỗi client chỉ bị xóa
+    đúng 1 lần. Vì vậy store chỉ chứa client đang online và số user online được đếm sẵn.
+    """
+
+    def __init__(self, online_window: float = ONLINE_WINDOW_SEC):
+        self.online_window = online_window
+        self._lock = threading.Lock()
+        self._beats = OrderedDict()  # client_id -> (last_seen_ts, user_id)
+        self._user_clients = {}  # user_id -> số client đang online của user
+        self._received = 0
+
+    def _add_user(self, user_id):
+        if user_id is not None:
+            self._user_clients[user_id] = self._user_clients.get(user_id, 0) + 1
+
+    def _remove_user(self, user_id):
+        if user_id is not None:
+            remaining = self._user_clients[user_id] - 1
+            if remaining:
+                self._user_clients[user_id] = remaining
+            else:
+                del self._user_clients[user_id]
+
+    def _expire(self, now: float):
+        cutoff = now - self.online_window
+        while self._beats:
+            client_id, (ts, user_id) = next(iter(self._beats.items()))
+            if ts >= cutoff:
+                break
+            del self._beats[client_id]
+            self._remove_user(user_id)
+
+    def beat(self, client_ids, user_id: int | None):
+        """Ghi nhận heartbeat của một hoặc nhiều client (cùng 1 user)"""
+        now = time.time()
+        with self._lock:
+            for client_id in client_ids:
+                previous = self._beats.pop(client_id, None)
+                if previous is not None:
+                    self._remove_user(previous[1])
+                self._beats[client_id] = (now, user_id)
+                self._add_user(user_id)
+                self._received += 1
+            self._expire(now)
+
+    def counts(self):
+        """(số client online, số user đăng nhập online)"""
+        with self._lock:
+            self._expire(time.time())
+            return len(self._beats), len(self._user_clients)
+
+    def online(self, limit: int | None = None):
+        """Danh sách (client_id, last_seen_ts, user_id) đang online, mới nhất trước"""
+        with self._lock:
+            self._expire(time.time())
+            return [(client_id, ts, user_id)
+                    for client_id, (ts, user_id) in islice(reversed(self._beats.items()), limit)]
+
+    def stats(self):
+        with self._lock:
+            return {'online_clients': len(self._beats), 'received': self._received}
+
+
+# Singleton instance used by app
+heartbeat_store = HeartbeatStore()
@@ -0,0 +1,99 @@
+import math
+
+
+class LatencyHistogram:
+    """Mergeable log-bucketed histogram for latency quantiles.
+
+    Values are counted in buckets whose width grows geometrically (factor gamma), so every
+    quantile is reported within `relative_accuracy` of the true value while memory depends only
+    on the range of values seen, not on how many were recorded. Two histograms with the same
+    accuracy merge by adding bucket counts, which makes them safe to combine across time
+    buckets, routes and worker processes.
+    """
+
+    __slots__ = ('relative_accuracy', '_gamma', '_log_gamma', 'counts', 'zero_count',
+                 'count', 'sum', 'max')
+
+    # values at or below this (ms) are counted as zero, there is nothing to gain below 1 µs
+    MIN_VALUE = 0.001
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.counts = {}  # bucket index -> count (sparse, only buckets that were hit)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if value <= self.MIN_VALUE:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.counts[index] = self.counts.get(index, 0) + 1
+
+    def merge(self, other: 'LatencyHistogram'):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge histograms with different accuracy')
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.max > self.max:
+            self.max = other.max
+        return self
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                # midpoint of the bucket (gamma^(i-1), gamma^i], within relative_accuracy of any value in it
+                return min(2 * self._gamma ** index / (self._gamma + 1), self.max)
+        return self.max
+
+    def summary(self, prefix: str = '', suffix: str = '_ms'):
+        """Dict of avg/p50/p90/p95/p99/max, e.g. summary(suffix='_response_ms')"""
+        def key(name):
+            return f'{prefix}{name}{suffix}'
+        return {
+            key('avg'): self.sum / self.count if self.count else 0,
+            key('p50'): self.quantile(0.50),
+            key('p90'): self.quantile(0.90),
+            key('p95'): self.quantile(0.95),
+            key('p99'): self.quantile(0.99),
+            key('max'): self.max,
+        }
+
+    def to_dict(self):
+        """Serializable form, used to ship histograms between processes"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'counts': {str(index): count for index, count in self.counts.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data.get('relative_accuracy', 0.01))
+        histogram.counts = {int(index): count for index, count in data.get('counts', {}).items()}
+        histogram.zero_count = data.get('zero_count', 0)
+        histogram.count = data.get('count', 0)
+        histogram.sum = data.get('sum', 0.0)
+        histogram.max = data.get('max', 0.0)
+        return histogram
@@ -0,0 +1,153 @@
+# identity.py giữ thông tin user đang đăng nhập cho từng request trên flask.g
+# mục đích: mỗi request chỉ query user (kèm student/teacher profile) đúng 1 lần,
+# decorator, route và helper đều đọc lại từ đây thay vì tự gọi User.query.get(...)
+#
+# Access token mang sẵn các claim role, student_id, teacher_id nên phần lớn request
+# phân quyền được mà không cần query database. Khi admin đổi role, khóa hoặc xóa user,
+# version token của user đó được tăng trong TTL cache để token cũ bị từ chối
+import os
+import time
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy.orm import joinedload
+from models import User
+from utils.cache import TTLCache
+
+# Claims trong token chỉ được tin tưởng trong khoảng thời gian này kể từ lúc phát hành (iat).
+# Token cũ hơn sẽ được xác thực lại từ database, nhờ đó việc TTL cache hết hạn
+# không làm token đã bị thu hồi có hiệu lực trở lại
+TOKEN_VERSION_TTL_SEC = int(os.environ.get('TOKEN_VERSION_TTL_SEC', 24 * 3600))
+
+# user_id -> version hiện tại (time.time_ns() lúc bị thu hồi gần nhất)
+_token_versions = TTLCache(TOKEN_VERSION_TTL_SEC)
+
+
+def _load_user(user_id):
+    """Query user kèm student_profile và teacher_profile trong 1 query (LEFT JOIN), cache trên flask.g"""
+    if '_current_user' not in g:
+        g._current_user = User.query.options(
+            joinedload(User.student_profile),
+            joinedload(User.teacher_profile)
+        ).filter(User.id == user_id).first()
+    return g._current_user
+
+
+def _claims_are_fresh(jwt_payload):
+    """Token có đủ claims và còn nằm trong cửa sổ mà TTL cache theo dõi được hay không"""
+    if 'role' not in jwt_payload:
+        return False
+    return time.time() - jwt_payload.get('iat', 0) <= TOKEN_VERSION_TTL_SEC
+
+
+def _identity_from_user(user):
+    return {
+        'user_id': user.id,
+        'role': user.role,
+        'student_id': user.student_profile.id if user.student_profile else None,
+        'teacher_id': user.teacher_profile.id if user.teacher_profile else None,
+    }
+
+
+def create_identity_claims(user):
+    """
+    Tạo additional_claims cho create_access_token
+
+    Returns:
+        dict: {'role', 'student_id', 'teacher_id', 'ver'}
+    """
+    claims = _identity_from_user(user)
+    del claims['user_id']
+    claims['ver'] = _token_versions.get(user.id, 0)
+    return claims
+
+
+def bump_token_version(user_id):
+    """Thu hồi mọi token đã phát hành cho user (gọi sau khi đổi role, khóa hoặc xóa user)"""
+    _token_versions.set(int(user_id), time.time_ns())
+
+
+def is_token_revoked(jwt_payload):
+    """
+    Callback cho JWTManager.token_in_blocklist_loader
+
+    Token còn mới: so sánh version trong token với TTL cache, không query database.
+    Token cũ hoặc không có claims: kiểm tra lại user trong database.
+    """
+    user_id = int(jwt_payload['sub'])
+    if _claims_are_fresh(jwt_payload):
+        return jwt_payload.get('ver', 0) < _token_versions.get(user_id, 0)
+    user = _load_user(user_id)
+    return user is None or not user.is_active
+
+
+def get_current_identity():
+    """
+    Lấy thông tin phân quyền của user hiện tại, ưu tiên đọc từ claims trong JWT
+
+    Returns:
+        dict: {'user_id', 'role', 'student_id', 'teacher_id'} hoặc None nếu không tìm thấy user
+    """
+    if '_current_identity' not in g:
+        identity = get_jwt_identity()
+        current = None
+        if identity is not None:
+            claims = get_jwt()
+            # profile được tạo sau khi đăng nhập thì claims chưa có id, đọc lại từ database
+            missing_profile = (
+                (claims.get('role') == 'student' and not claims.get('student_id')) or
+                (claims.get('role') == 'teacher' and not claims.get('teacher_id'))
+            )
+            if _claims_are_fresh(claims) and not missing_profile:
+                current = {
+                    'user_id': int(identity),
+                    'role': claims['role'],
+                    'student_id': claims.get('student_id'),
+                    'teacher_id': claims.get('teacher_id'),
+                }
+            else:
+                user = _load_user(int(identity))
+                current = _identity_from_user(user) if user else None
+        g._current_identity = current
+    return g._current_identity
+
+
+def get_verified_user_id():
+    """
+    user_id của JWT đã được xác thực trong request này (bởi @jwt_required() hoặc verify_jwt_in_request)
+
+    Chỉ đọc lại payload flask_jwt_extended đã lưu trên flask.g, không decode/kiểm tra chữ ký lần nữa.
+    Trả về None nếu request không có token hoặc chưa từng xác thực token.
+    """
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        return None
+    return int(identity) if identity is not None else None
+
+
+def get_current_user():
+    """
+    Lấy user hiện tại từ JWT, kèm student_profile và teacher_profile trong 1 query (LEFT JOIN)
+
+    Kết quả được cache trên flask.g nên các lần gọi sau trong cùng request không query lại.
+    Phải được gọi sau @jwt_required()
+
+    Returns:
+        User hoặc None nếu token không gắn với user nào
+    """
+    identity = get_jwt_identity()
+    if identity is None:
+        return None
+    return _load_user(int(identity))
+
+
+def get_current_student():
+    """Lấy Student profile của user hiện tại (None nếu không phải sinh viên)"""
+    user = get_current_user()
+    return user.student_profile if user else None
+
+
+def get_current_teacher():
+    """Lấy Teacher profile của user hiện tại (None nếu không phải giảng viên)"""
+    user = get_current_user()
+    return user.teacher_profile if user else None
@@ -1,104 +1,570 @@
+import os
+import json
 import time
+import atexit
 # threading là một module của Python để tạo thread, thread là một luồng nhỏ trong chương trình, nó có thể chạy đồng thời với main thread
 import threading
 # collections là một module của Python để tạo các collection data type như deque, defaultdict, ...
 # nhằm giúp tăng tốc độ xử lý và tối ưu hóa code
-# deque là một collection data type như list nhưng có thể thêm và xóa phần tử ở cả 2 đầu còn defaultdict là một collection data type như dict nhưng có thể thêm và xóa phần tử ở cả 2 đầu
-from collections import deque, defaultdict
+# defaultdict là một collection data type như dict nhưng tự tạo giá trị mặc định khi truy cập key chưa có
+from collections import defaultdict, deque
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.histogram import LatencyHistogram
+from utils.heartbeat import heartbeat_store, ONLINE_WINDOW_SEC
 
+# endpoint không tính vào metrics request: heartbeat được gửi vài giây một lần từ mọi tab đang mở,
+# nếu tính vào sẽ làm lệch số request và latency của các API thật
+EXCLUDED_ENDPOINTS = frozenset({'monitor.heartbeat'})
 
-ONLINE_WINDOW_SEC = 20  # threshold to consider a user "online"
+# Thư mục dùng chung giữa các gunicorn worker (vd: /tmp/app-metrics). Khi được set, mỗi worker định kỳ
+# ghi trạng thái metrics của mình ra 1 file riêng và snapshot() gộp file của tất cả worker lại
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_EXPORT_INTERVAL_SEC = float(os.environ.get('METRICS_EXPORT_INTERVAL_SEC', 5))
+
+# record_request chỉ thêm vào buffer riêng của thread; buffer được đổ vào các bucket (lấy lock chung)
+# khi đủ số request này hoặc sau khoảng thời gian này, snapshot() luôn đổ hết buffer trước khi đọc
+METRICS_FLUSH_BATCH = 32
+METRICS_FLUSH_INTERVAL_SEC = 1.0
+
+
+class _Bucket:
+    """Aggregated requests for one time slot (bucket_seconds wide)."""
+
+    __slots__ = ('slot', 'requests', 'errors', 'latency', 'db_latency', 'db_queries', 'by_status', 'user_ids', 'routes')
+
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, slot: int):
+        self.slot = slot
+        self.requests = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.db_latency = LatencyHistogram()  # SQL time per request
+        self.db_queries = 0
+        self.by_status = defaultdict(int)
+        self.user_ids = set()
+        self.routes = {}  # (method, rule) -> _RouteStats
+
+    def to_dict(self):
+        return {
+            'slot': self.slot,
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency': self.latency.to_dict(),
+            'db_latency': self.db_latency.to_dict(),
+            'db_queries': self.db_queries,
+            'by_status': {str(status): count for status, count in self.by_status.items()},
+            'user_ids': list(self.user_ids),
+            'routes': [[method, rule, stats.to_dict()] for (method, rule), stats in self.routes.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        bucket = cls()
+        bucket.slot = data['slot']
+        bucket.requests = data['requests']
+        bucket.errors = data['errors']
+        bucket.latency = LatencyHistogram.from_dict(data['latency'])
+        bucket.db_latency = LatencyHistogram.from_dict(data['db_latency'])
+        bucket.db_queries = data['db_queries']
+        bucket.by_status.update({int(status): count for status, count in data['by_status'].items()})
+        bucket.user_ids = set(data['user_ids'])
+        bucket.routes = {(method, rule): _RouteStats.from_dict(stats) for method, rule, stats in data['routes']}
+        return bucket
+
+
+class _RouteStats:
+    """Requests of one route template (e.g. GET /api/teams/<int:team_id>) inside a bucket."""
+
+    __slots__ = ('requests', 'errors', 'client_errors', 'latency', 'db_latency', 'db_queries', 'max_db_queries')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.client_errors = 0
+        self.latency = LatencyHistogram()
+        self.db_latency = LatencyHistogram()
+        self.db_queries = 0
+        self.max_db_queries = 0
+
+    def merge(self, other: '_RouteStats'):
+        self.requests += other.requests
+        self.errors += other.errors
+        self.client_errors += other.client_errors
+        self.latency.merge(other.latency)
+        self.db_latency.merge(other.db_latency)
+        self.db_queries += other.db_queries
+        self.max_db_queries = max(self.max_db_queries, other.max_db_queries)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'client_errors': self.client_errors,
+            'latency': self.latency.to_dict(),
+            'db_latency': self.db_latency.to_dict(),
+            'db_queries': self.db_queries,
+            'max_db_queries': self.max_db_queries,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.requests = data['requests']
+        stats.errors = data['errors']
+        stats.client_errors = data['client_errors']
+        stats.latency = LatencyHistogram.from_dict(data['latency'])
+        stats.db_latency = LatencyHistogram.from_dict(data['db_latency'])
+        stats.db_queries = data['db_queries']
+        stats.max_db_queries = data['max_db_queries']
+        return stats
+
+
+class _ThreadBuffer:
+    """Requests recorded by one thread that are not yet merged into the buckets."""
+
+    __slots__ = ('thread', 'events', 'last_flush')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.events = deque()  # append/popleft an toàn giữa thread ghi và thread đổ buffer
+        self.last_flush = time.monotonic()
+
+
+# requests that matched no url rule (404s, scanners) share one key so random paths cannot
+# blow up the number of tracked routes
+UNMATCHED_ROUTE = '<unmatched>'
 
 
 class MetricsCollector:
     """In-memory metrics for lightweight monitoring.
 
-    Tracks per-request timings, status codes, and active users over rolling windows.
+    Requests are aggregated into a fixed ring of time buckets (counts, status histogram,
+    mergeable latency histogram, user ids), so record_request is O(1), snapshot is
+    O(number of buckets) and memory does not grow with the request rate.
+
+    With `export_dir` set (multi-worker gunicorn), a background thread of every worker
+    process writes that worker's live buckets and heartbeats to its own file in the
+    directory, and snapshot() merges the files of all workers with its in-memory state.
+    Histograms and counters merge exactly, so the dashboard no longer depends on which
+    worker answered; peers' data is at most `export_interval` seconds old.
     """
 
-    def __init__(self, window_seconds: int = 900):  # 15 minutes window
+    def __init__(self, window_seconds: int = 900, bucket_seconds: int = 1,  # 15 minutes window
+                 export_dir: str | None = None, export_interval: float = METRICS_EXPORT_INTERVAL_SEC):
         self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.export_dir = export_dir
+        self.export_interval = export_interval
         self._lock = threading.Lock()
-        self._requests = deque()  # (ts, status, duration_ms, user_id)
-        self._heartbeats = {}  # session_id -> (last_seen_ts, user_id)
+        self._buckets = [_Bucket() for _ in range(max(1, window_seconds // bucket_seconds))]
+        self._route_blueprints = {}  # (method, rule) -> blueprint name
+        self._local = threading.local()
+        self._thread_buffers = []  # _ThreadBuffer của mọi thread đã ghi metrics
+        self._exporter_pid = None  # pid của process đã chạy thread export (gunicorn fork worker sau khi import)
+        self._export_path = None
 
-    def _purge_old(self, now: float):
-        cutoff = now - self.window_seconds
-        while self._requests and self._requests[0][0] < cutoff:
-            self._requests.popleft()
+    def record_request(self, status_code: int, duration_ms: float, user_id: int | None,
+                       method: str | None = None, route: str | None = None, blueprint: str | None = None,
+                       db_time_ms: float = 0.0, db_queries: int = 0):
+        """Record one finished request.
 
-    def record_request(self, status_code: int, duration_ms: float, user_id: int | None):
-        now = time.time()
+        `route` must be the url rule template (request.url_rule.rule), never the raw path,
+        so the number of tracked routes stays bounded by the routes the app defines.
+        The request goes into a per-thread buffer; the global lock is only taken once per
+        METRICS_FLUSH_BATCH requests (or METRICS_FLUSH_INTERVAL_SEC) to merge the batch.
+        """
+        self.ensure_exporter()
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._register_thread_buffer()
+        buffer.events.append((time.time(), int(status_code), float(duration_ms), user_id,
+                              method, route, blueprint, db_time_ms, db_queries))
+        if (len(buffer.events) >= METRICS_FLUSH_BATCH or
+                time.monotonic() - buffer.last_flush >= METRICS_FLUSH_INTERVAL_SEC):
+            with self._lock:
+                self._drain(buffer)
+
+    def _register_thread_buffer(self):
+        buffer = self._local.buffer = _ThreadBuffer()
         with self._lock:
-            self._requests.append((now, int(status_code), float(duration_ms), user_id))
-            self._purge_old(now)
+            # dev server tạo 1 thread cho mỗi request: đổ buffer của thread đã kết thúc và bỏ khỏi danh sách
+            self._drain_all()
+            self._thread_buffers.append(buffer)
+        return buffer
+
+    def _drain(self, buffer: _ThreadBuffer):
+        """Đổ buffer của 1 thread vào các bucket (gọi khi đang giữ self._lock)"""
+        events = buffer.events
+        while events:
+            self._apply(*events.popleft())
+        buffer.last_flush = time.monotonic()
+
+    def _drain_all(self):
+        """Đổ buffer của mọi thread (gọi khi đang giữ self._lock)"""
+        alive = []
+        for buffer in self._thread_buffers:
+            self._drain(buffer)
+            if buffer.thread.is_alive():
+                alive.append(buffer)
+        self._thread_buffers = alive
+
+    def _apply(self, ts, status_code, duration_ms, user_id, method, route, blueprint, db_time_ms, db_queries):
+        slot = int(ts // self.bucket_seconds)
+        bucket = self._buckets[slot % len(self._buckets)]
+        if bucket.slot != slot:
+            if bucket.slot > slot:
+                return  # bucket đã được dùng cho vòng sau, request này đã ra khỏi window
+            bucket.reset(slot)
+        bucket.requests += 1
+        if status_code >= 500:
+            bucket.errors += 1
+        bucket.latency.record(duration_ms)
+        bucket.db_latency.record(db_time_ms)
+        bucket.db_queries += db_queries
+        bucket.by_status[status_code] += 1
+        if user_id is not None:
+            bucket.user_ids.add(user_id)
+        route_key = (method or '-', route or UNMATCHED_ROUTE)
+        stats = bucket.routes.get(route_key)
+        if stats is None:
+            stats = bucket.routes[route_key] = _RouteStats()
+            if route_key not in self._route_blueprints:
+                self._route_blueprints[route_key] = blueprint
+        stats.requests += 1
+        if status_code >= 500:
+            stats.errors += 1
+        elif status_code >= 400:
+            stats.client_errors += 1
+        stats.latency.record(duration_ms)
+        stats.db_latency.record(db_time_ms)
+        stats.db_queries += db_queries
+        if db_queries > stats.max_db_queries:
+            stats.max_db_queries = db_queries
 
-    def snapshot(self):
+    def snapshot(self, top_n: int = 10):
         now = time.time()
+        current_slot = int(now // self.bucket_seconds)
+        oldest_slot = current_slot - len(self._buckets) + 1
+
+        def empty():
+            return {'requests': 0, 'errors': 0, 'latency': LatencyHistogram(), 'db_latency': LatencyHistogram(),
+                    'db_queries': 0, 'user_ids': set()}
+
+        windows = {
+            'last_1m': (current_slot - 60 // self.bucket_seconds + 1, empty()),
+            'last_5m': (current_slot - 300 // self.bucket_seconds + 1, empty()),
+            'last_15m': (oldest_slot, empty()),
+        }
+        by_status = defaultdict(int)
+        routes = {}
+
+        def add(bucket):
+            if bucket.slot < oldest_slot or bucket.slot > current_slot:
+                return
+            for status, count in bucket.by_status.items():
+                by_status[status] += count
+            for route_key, stats in bucket.routes.items():
+                if route_key not in routes:
+                    routes[route_key] = _RouteStats()
+                routes[route_key].merge(stats)
+            for first_slot, acc in windows.values():
+                if bucket.slot < first_slot:
+                    continue
+                acc['requests'] += bucket.requests
+                acc['errors'] += bucket.errors
+                acc['latency'].merge(bucket.latency)
+                acc['db_latency'].merge(bucket.db_latency)
+                acc['db_queries'] += bucket.db_queries
+                acc['user_ids'] |= bucket.user_ids
+
         with self._lock:
-            self._purge_old(now)
-            items = list(self._requests)
-            # Purge old heartbeats (older than window)
-            cutoff = now - self.window_seconds
-            self._heartbeats = {sid: (ts, uid) for sid, (ts, uid) in self._heartbeats.items() if ts >= cutoff}
-
-        # Aggregate
-        total = len(items)
-        last_1m = [r for r in items if r[0] >= now - 60]
-        last_5m = [r for r in items if r[0] >= now - 300]
-
-        def agg(rows):
-            if not rows:
-                return {
-                    'requests': 0,
-                    'errors': 0,
-                    'avg_response_ms': 0,
-                    'p95_response_ms': 0,
-                }
-            durations = sorted(r[2] for r in rows)
-            p95 = durations[int(0.95 * (len(durations) - 1))] if durations else 0
-            return {
-                'requests': len(rows),
-                'errors': sum(1 for r in rows if r[1] >= 500),
-                'avg_response_ms': sum(durations) / len(durations) if durations else 0,
-                'p95_response_ms': p95,
-            }
+            self._drain_all()
+            for bucket in self._buckets:
+                add(bucket)
+            route_blueprints = dict(self._route_blueprints)
 
-        # Unique active users
-        active_users_15m = len({r[3] for r in items if r[3] is not None})
-        active_users_1m = len({r[3] for r in last_1m if r[3] is not None})
+        # gộp dữ liệu của các worker khác (ngoài lock, đọc file không chặn record_request)
+        peer_states = self._read_peer_states(now)
+        for state in peer_states:
+            for data in state.get('buckets', []):
+                add(_Bucket.from_dict(data))
+            for method, rule, blueprint in state.get('route_blueprints', []):
+                route_blueprints.setdefault((method, rule), blueprint)
 
         # Heartbeat-based online metrics (more accurate for "users on site")
-        online_clients_1m = len([1 for _, (ts, _) in self._heartbeats.items() if ts >= now - ONLINE_WINDOW_SEC])
-        online_users_1m = len({uid for (_, (ts, uid)) in self._heartbeats.items() if ts >= now - ONLINE_WINDOW_SEC and uid is not None})
+        if peer_states:
+            clients = self._merge_online_clients(peer_states, now)
+            online_clients_1m = len(clients)
+            online_users_1m = len({uid for _, uid in clients.values() if uid is not None})
+        else:
+            online_clients_1m, online_users_1m = heartbeat_store.counts()
 
-        by_status = defaultdict(int)
-        for _, status, _, _ in items:
-            by_status[status] += 1
+        def agg(acc):
+            return {
+                'requests': acc['requests'],
+                'errors': acc['errors'],
+                **acc['latency'].summary(suffix='_response_ms'),
+                **acc['db_latency'].summary(suffix='_db_ms'),
+                'avg_db_queries': acc['db_queries'] / acc['requests'] if acc['requests'] else 0,
+            }
+
+        routes_15m = []
+        for (method, rule), stats in routes.items():
+            routes_15m.append({
+                'method': method,
+                'route': rule,
+                'blueprint': route_blueprints.get((method, rule)),
+                'requests': stats.requests,
+                'errors': stats.errors,
+                'client_errors': stats.client_errors,
+                'error_rate': stats.errors / stats.requests if stats.requests else 0,
+                **stats.latency.summary(suffix='_response_ms'),
+                'avg_db_ms': stats.db_latency.summary()['avg_ms'],
+                'p95_db_ms': stats.db_latency.quantile(0.95),
+                'avg_db_queries': stats.db_queries / stats.requests if stats.requests else 0,
+                'max_db_queries': stats.max_db_queries,
+            })
+        routes_15m.sort(key=lambda r: r['requests'], reverse=True)
+        slowest_routes_15m = sorted(routes_15m, key=lambda r: r['p95_response_ms'], reverse=True)[:top_n]
+
+        last_1m = windows['last_1m'][1]
+        last_15m = windows['last_15m'][1]
 
         return {
             'totals': {
-                'requests_15m': total,
-                'active_users_15m': active_users_15m,
-                'active_users_1m': active_users_1m,
+                'requests_15m': last_15m['requests'],
+                'active_users_15m': len(last_15m['user_ids']),
+                'active_users_1m': len(last_1m['user_ids']),
                 'online_clients_1m': online_clients_1m,
                 'online_users_1m': online_users_1m,
                 'by_status_15m': dict(by_status),
             },
             'last_1m': agg(last_1m),
-            'last_5m': agg(last_5m),
+            'last_5m': agg(windows['last_5m'][1]),
+            'last_15m': agg(last_15m),
+            'routes_15m': routes_15m,
+            'slowest_routes_15m': slowest_routes_15m,
+            'workers': 1 + len(peer_states),
             'generated_at': int(now),
         }
 
+    def minute_aggregates(self, start_ts: float, end_ts: float):
+        """
+        Gộp các bucket có thời điểm trong [start_ts, end_ts) theo từng phút (dùng cho metrics history)
+
+        Returns:
+            dict: {minute_start: {'requests', 'errors', 'client_errors', 'db_queries',
+                                  'by_status', 'latency', 'db_latency'}}
+        """
+        minutes = {}
+        with self._lock:
+            self._drain_all()
+            for bucket in self._buckets:
+                ts = bucket.slot * self.bucket_seconds
+                if not bucket.requests or ts < start_ts or ts >= end_ts:
+                    continue
+                minute = int(ts // 60) * 60
+                acc = minutes.get(minute)
+                if acc is None:
+                    acc = minutes[minute] = {
+                        'requests': 0, 'errors': 0, 'client_errors': 0, 'db_queries': 0,
+                        'by_status': defaultdict(int), 'latency': LatencyHistogram(), 'db_latency': LatencyHistogram(),
+                    }
+                acc['requests'] += bucket.requests
+                acc['errors'] += bucket.errors
+                acc['db_queries'] += bucket.db_queries
+                for status, count in bucket.by_status.items():
+                    acc['by_status'][status] += count
+                    if 400 <= status < 500:
+                        acc['client_errors'] += count
+                acc['latency'].merge(bucket.latency)
+                acc['db_latency'].merge(bucket.db_latency)
+        return minutes
+
+    def online_clients(self):
+        """Client đang online của mọi worker: {client_id: (last_seen_ts, user_id)}, mới nhất trước"""
+        now = time.time()
+        peer_states = self._read_peer_states(now)
+        clients = self._merge_online_clients(peer_states, now)
+        return dict(sorted(clients.items(), key=lambda item: item[1][0], reverse=True))
+
+    @staticmethod
+    def _merge_online_clients(peer_states, now: float):
+        clients = {client_id: (ts, uid) for client_id, ts, uid in heartbeat_store.online()}
+        cutoff = now - ONLINE_WINDOW_SEC
+        for state in peer_states:
+            for client_id, (ts, uid) in state.get('heartbeats', {}).items():
+                # cùng 1 client có thể gửi heartbeat tới nhiều worker, giữ lần gần nhất
+                if ts >= cutoff and (client_id not in clients or clients[client_id][0] < ts):
+                    clients[client_id] = (ts, uid)
+        return clients
+
+    # ============= CROSS-WORKER EXPORT =============
+
+    def export_state(self):
+        """Ghi trạng thái của worker hiện tại ra file riêng (ghi file tạm rồi os.replace nên người đọc không thấy file dở dang)"""
+        if not self.export_dir or self._export_path is None:
+            return
+        now = time.time()
+        oldest_slot = int(now // self.bucket_seconds) - len(self._buckets) + 1
+        with self._lock:
+            self._drain_all()
+            state = {
+                'pid': os.getpid(),
+                'written_at': now,
+                'buckets': [b.to_dict() for b in self._buckets if b.slot >= oldest_slot and b.requests],
+                'heartbeats': {client_id: [ts, uid] for client_id, ts, uid in heartbeat_store.online()},
+                'route_blueprints': [[method, rule, bp] for (method, rule), bp in self._route_blueprints.items()],
+            }
+        tmp_path = f'{self._export_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self._export_path)
+
+    def ensure_exporter(self):
+        """Chạy thread export trong process hiện tại nếu chưa chạy (gọi được ở mọi request, chỉ so sánh pid)"""
+        if self.export_dir and self._exporter_pid != os.getpid():
+            self._start_exporter()
+
+    def _start_exporter(self):
+        with self._lock:
+            pid = os.getpid()
+            if self._exporter_pid == pid:
+                return
+            self._exporter_pid = pid
+            os.makedirs(self.export_dir, exist_ok=True)
+            # thêm thời điểm khởi động vào tên file để worker mới trùng pid không ghi đè dữ liệu của worker cũ
+            self._export_path = os.path.join(self.export_dir, f'worker-{pid}-{time.time_ns()}.json')
+
+        def loop():
+            while True:
+                time.sleep(self.export_interval)
+                try:
+                    self.export_state()
+                except Exception:
+                    pass
+
+        threading.Thread(target=loop, name='metrics-export', daemon=True).start()
+        # worker tắt bình thường (restart, scale down) vẫn ghi lại vài giây dữ liệu cuối
+        atexit.register(self.export_state)
+
+    def _read_peer_states(self, now: float):
+        """Đọc file trạng thái của các worker khác; file quá cũ (worker đã chết hơn 1 window) thì xóa"""
+        if not self.export_dir:
+            return []
+        try:
+            names = os.listdir(self.export_dir)
+        except OSError:
+            return []
+        own_name = os.path.basename(self._export_path) if self._export_path else None
+        states = []
+        for name in names:
+            if not name.startswith('worker-') or not name.endswith('.json') or name == own_name:
+                continue
+            path = os.path.join(self.export_dir, name)
+            try:
+                if os.path.getmtime(path) < now - self.window_seconds - self.export_interval:
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # worker khác vừa xóa file hoặc file hỏng, bỏ qua
+        return states
+
 
 # Singleton instance used by app
-metrics_collector = MetricsCollector()
+metrics_collector = MetricsCollector(export_dir=METRICS_DIR)
+
 
-def record_heartbeat(session_id: str, user_id: int | None):
-    now = time.time()
-    if not session_id:
+# ============= SQL TIMING =============
+# cộng dồn số query và thời gian SQL của request hiện tại vào flask.g, đo bằng perf_counter (monotonic)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_query_start', None)
+    if start is None or not has_request_context():
         return
-    with metrics_collector._lock:
-        metrics_collector._heartbeats[session_id] = (now, user_id)
+    g._db_time_ms = g.get('_db_time_ms', 0.0) + (time.perf_counter() - start) * 1000.0
+    g._db_queries = g.get('_db_queries', 0) + 1
+
+
+def install_query_timing():
+    """Đăng ký event cho mọi SQLAlchemy Engine (gọi 1 lần khi tạo app)"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def get_request_db_stats():
+    """(db_time_ms, db_queries) của request hiện tại"""
+    return g.get('_db_time_ms', 0.0), g.get('_db_queries', 0)
+
+
+# ============= PROMETHEUS =============
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + '}'
+
+
+def render_prometheus(snapshot):
+    """Chuyển kết quả snapshot() sang định dạng text exposition của Prometheus.
+
+    Các giá trị là gauge trên cửa sổ trượt (1m/5m/15m) giống dashboard admin; thời gian tính bằng giây.
+    """
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(**labels) if labels else ""} {value}')
+
+    quantiles = (('0.5', 'p50'), ('0.9', 'p90'), ('0.95', 'p95'), ('0.99', 'p99'), ('1', 'max'))
+    windows = (('1m', snapshot['last_1m']), ('5m', snapshot['last_5m']), ('15m', snapshot['last_15m']))
+    totals = snapshot['totals']
+
+    metric('app_metrics_workers', 'Number of worker processes merged into these metrics',
+           [({}, snapshot.get('workers', 1))])
+    metric('app_requests', 'Requests in the sliding window',
+           [({'window': w}, agg['requests']) for w, agg in windows])
+    metric('app_request_errors', 'Requests answered with 5xx in the sliding window',
+           [({'window': w}, agg['errors']) for w, agg in windows])
+    metric('app_response_time_seconds', 'Response time quantiles in the sliding window',
+           [({'window': w, 'quantile': q}, agg[f'{key}_response_ms'] / 1000.0)
+            for w, agg in windows for q, key in quantiles])
+    metric('app_db_time_seconds', 'SQL time per request quantiles in the sliding window',
+           [({'window': w, 'quantile': q}, agg[f'{key}_db_ms'] / 1000.0)
+            for w, agg in windows for q, key in quantiles])
+    metric('app_responses_15m', 'Responses by status code over the last 15 minutes',
+           [({'status': status}, count) for status, count in sorted(totals['by_status_15m'].items())])
+    metric('app_active_users', 'Distinct authenticated users that made requests',
+           [({'window': '1m'}, totals['active_users_1m']), ({'window': '15m'}, totals['active_users_15m'])])
+    metric('app_online_clients', 'Browser clients that sent a heartbeat recently',
+           [({}, totals['online_clients_1m'])])
+    metric('app_online_users', 'Distinct users that sent a heartbeat recently',
+           [({}, totals['online_users_1m'])])
+
+    routes = snapshot['routes_15m']
+    metric('app_route_requests_15m', 'Requests per route template over the last 15 minutes',
+           [({'method': r['method'], 'route': r['route']}, r['requests']) for r in routes])
+    metric('app_route_errors_15m', 'Requests answered with 5xx per route template over the last 15 minutes',
+           [({'method': r['method'], 'route': r['route']}, r['errors']) for r in routes])
+    metric('app_route_response_time_seconds', 'Response time quantiles per route template over the last 15 minutes',
+           [({'method': r['method'], 'route': r['route'], 'quantile': q}, r[f'{key}_response_ms'] / 1000.0)
+            for r in routes for q, key in quantiles])
+    return '\n'.join(lines) + '\n'
 
 
@@ -0,0 +1,256 @@
+# metrics_history.py lưu lịch sử metrics lâu hơn cửa sổ 15 phút của metrics_collector
+# mỗi worker có 1 thread nền, mỗi phút gộp các bucket đã xong thành 1 dòng / phút và ghi cả lô vào file SQLite
+# (không ghi gì trên thread của request). Dòng phút được gộp tiếp thành dòng giờ, dòng giờ thành dòng ngày,
+# dữ liệu cũ bị xóa theo thời gian lưu của từng độ phân giải.
+# Nhiều worker ghi chung 1 file: mỗi worker ghi dòng riêng, khi đọc các dòng cùng thời điểm được cộng lại
+# (các counter cộng được, histogram gộp được).
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from collections import defaultdict
+from utils.histogram import LatencyHistogram
+from utils.metrics import metrics_collector
+
+_DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'metrics_history.db')
+# đường dẫn file SQLite, để trống để tắt metrics history
+METRICS_HISTORY_DB = os.environ.get('METRICS_HISTORY_DB', _DEFAULT_DB)
+# số ngày giữ lại dữ liệu theo phút / giờ / ngày
+METRICS_HISTORY_RETENTION_DAYS = {
+    'minute': float(os.environ.get('METRICS_HISTORY_MINUTE_DAYS', 2)),
+    'hour': float(os.environ.get('METRICS_HISTORY_HOUR_DAYS', 30)),
+    'day': float(os.environ.get('METRICS_HISTORY_DAY_DAYS', 365)),
+}
+
+ROLLUP_INTERVAL_SEC = 60
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+FINER_RESOLUTION = {'hour': 'minute', 'day': 'hour'}
+# dòng giờ chỉ được tạo sau khi mọi worker đã kịp ghi dòng phút cuối cùng của giờ đó
+DOWNSAMPLE_GRACE_SEC = 3 * ROLLUP_INTERVAL_SEC
+MAX_POINTS = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics_rollup (
+    resolution TEXT NOT NULL,
+    bucket_start INTEGER NOT NULL,
+    requests INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    client_errors INTEGER NOT NULL,
+    db_queries INTEGER NOT NULL,
+    by_status TEXT NOT NULL,
+    latency TEXT NOT NULL,
+    db_latency TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_metrics_rollup_resolution_start ON metrics_rollup (resolution, bucket_start);
+"""
+
+
+def _empty():
+    return {'requests': 0, 'errors': 0, 'client_errors': 0, 'db_queries': 0,
+            'by_status': defaultdict(int), 'latency': LatencyHistogram(), 'db_latency': LatencyHistogram()}
+
+
+def _merge(acc, data):
+    acc['requests'] += data['requests']
+    acc['errors'] += data['errors']
+    acc['client_errors'] += data['client_errors']
+    acc['db_queries'] += data['db_queries']
+    for status, count in data['by_status'].items():
+        acc['by_status'][int(status)] += count
+    acc['latency'].merge(data['latency'])
+    acc['db_latency'].merge(data['db_latency'])
+    return acc
+
+
+def _to_row(resolution, bucket_start, data):
+    return (resolution, bucket_start, data['requests'], data['errors'], data['client_errors'], data['db_queries'],
+            json.dumps({str(k): v for k, v in data['by_status'].items()}),
+            json.dumps(data['latency'].to_dict()), json.dumps(data['db_latency'].to_dict()))
+
+
+def _from_row(row):
+    return row[0], {
+        'requests': row[1],
+        'errors': row[2],
+        'client_errors': row[3],
+        'db_queries': row[4],
+        'by_status': json.loads(row[5]),
+        'latency': LatencyHistogram.from_dict(json.loads(row[6])),
+        'db_latency': LatencyHistogram.from_dict(json.loads(row[7])),
+    }
+
+
+class MetricsHistory:
+    """Rollup metrics theo phút/giờ/ngày vào file SQLite, truy vấn theo khoảng thời gian."""
+
+    def __init__(self, path: str | None = METRICS_HISTORY_DB, collector=metrics_collector):
+        self.path = path or None
+        self.collector = collector
+        self._lock = threading.Lock()
+        self._rolled_until = 0  # các phút trước mốc này đã được ghi
+        self._writer_pid = None
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')  # worker đọc không bị chặn khi worker khác đang ghi
+        return conn
+
+    def ensure_started(self):
+        """Chạy thread rollup trong process hiện tại nếu chưa chạy (gunicorn fork worker sau khi import)"""
+        if not self.enabled or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self._connect()
+            conn.executescript(_SCHEMA)
+            conn.close()
+        except (OSError, sqlite3.Error) as e:
+            print(f"[Metrics History] Disabled, cannot open {self.path}: {str(e)}")
+            self.path = None
+            return
+
+        def loop():
+            while True:
+                time.sleep(ROLLUP_INTERVAL_SEC)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[Metrics History] Rollup error: {str(e)}")
+
+        threading.Thread(target=loop, name='metrics-history', daemon=True).start()
+        # worker tắt bình thường thì ghi nốt cả phút đang chạy dở
+        atexit.register(self.flush, include_current=True)
+
+    def flush(self, include_current: bool = False):
+        """Ghi các phút đã xong (1 transaction cho cả lô), rồi downsample và xóa dữ liệu hết hạn"""
+        now = time.time()
+        until = now if include_current else int(now // 60) * 60
+        with self._lock:
+            minutes = self.collector.minute_aggregates(self._rolled_until, until)
+            self._rolled_until = until
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany('INSERT INTO metrics_rollup VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 [_to_row('minute', minute, data) for minute, data in sorted(minutes.items())])
+            self._downsample(conn, 'hour', now)
+            self._downsample(conn, 'day', now)
+            with conn:
+                for resolution, days in METRICS_HISTORY_RETENTION_DAYS.items():
+                    conn.execute('DELETE FROM metrics_rollup WHERE resolution = ? AND bucket_start < ?',
+                                 (resolution, int(now - days * 86400)))
+        finally:
+            conn.close()
+
+    def _downsample(self, conn, resolution, now):
+        """Tạo các dòng `resolution` còn thiếu từ các dòng của độ phân giải nhỏ hơn"""
+        size = RESOLUTIONS[resolution]
+        finer = FINER_RESOLUTION[resolution]
+        # BEGIN IMMEDIATE giữ write lock của file: chỉ 1 worker downsample tại 1 thời điểm, không tạo dòng trùng
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            last = conn.execute('SELECT MAX(bucket_start) FROM metrics_rollup WHERE resolution = ?',
+                                (resolution,)).fetchone()[0]
+            if last is not None:
+                start = last + size
+            else:
+                first = conn.execute('SELECT MIN(bucket_start) FROM metrics_rollup WHERE resolution = ?',
+                                     (finer,)).fetchone()[0]
+                if first is None:
+                    conn.execute('COMMIT')
+                    return
+                start = first // size * size
+            # chỉ gộp các khoảng đã kết thúc và (với dòng ngày) đã có đủ dòng giờ
+            end = int(now - DOWNSAMPLE_GRACE_SEC) // size * size
+            if resolution == 'day':
+                last_hour = conn.execute("SELECT MAX(bucket_start) FROM metrics_rollup WHERE resolution = 'hour'").fetchone()[0]
+                end = min(end, (last_hour + RESOLUTIONS['hour']) // size * size if last_hour is not None else start)
+            if end > start:
+                periods = defaultdict(_empty)
+                rows = conn.execute(
+                    'SELECT bucket_start, requests, errors, client_errors, db_queries, by_status, latency, db_latency '
+                    'FROM metrics_rollup WHERE resolution = ? AND bucket_start >= ? AND bucket_start < ?',
+                    (finer, start, end))
+                for bucket_start, data in map(_from_row, rows):
+                    _merge(periods[bucket_start // size * size], data)
+                # khoảng không có request vẫn được ghi 1 dòng rỗng để lần sau không phải xét lại
+                conn.executemany('INSERT INTO metrics_rollup VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 [_to_row(resolution, period, periods[period]) for period in range(start, end, size)])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _load(self, conn, resolution, start, end):
+        """Các dòng (bucket_start, data) trong [start, end), phần chưa được downsample lấy từ độ phân giải nhỏ hơn"""
+        size = RESOLUTIONS[resolution]
+        rows = [_from_row(row) for row in conn.execute(
+            'SELECT bucket_start, requests, errors, client_errors, db_queries, by_status, latency, db_latency '
+            'FROM metrics_rollup WHERE resolution = ? AND bucket_start >= ? AND bucket_start < ? ORDER BY bucket_start',
+            (resolution, start, end))]
+        covered_until = rows[-1][0] + size if rows else start
+        if resolution in FINER_RESOLUTION and covered_until < end:
+            rows += self._load(conn, FINER_RESOLUTION[resolution], covered_until, end)
+        return rows
+
+    def query(self, start: int, end: int, resolution: str = 'auto'):
+        """
+        Lịch sử metrics trong khoảng [start, end) (unix timestamp)
+
+        Args:
+            resolution: 'minute', 'hour', 'day' hoặc 'auto' (chọn theo độ dài khoảng thời gian)
+
+        Raises:
+            ValueError: tham số không hợp lệ hoặc quá nhiều điểm dữ liệu
+        """
+        if end <= start:
+            raise ValueError("'from' must be before 'to'")
+        if resolution == 'auto':
+            span = end - start
+            resolution = 'minute' if span <= 6 * 3600 else 'hour' if span <= 14 * 86400 else 'day'
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'resolution must be one of: auto, {", ".join(RESOLUTIONS)}')
+        size = RESOLUTIONS[resolution]
+        start = start // size * size
+        if (end - start) // size > MAX_POINTS:
+            raise ValueError(f'Too many points for resolution {resolution}, use a coarser resolution')
+
+        conn = self._connect()
+        try:
+            rows = self._load(conn, resolution, start, end)
+        finally:
+            conn.close()
+
+        periods = defaultdict(_empty)
+        for bucket_start, data in rows:
+            _merge(periods[bucket_start // size * size], data)
+        points = []
+        for period in sorted(periods):
+            data = periods[period]
+            requests = data['requests']
+            points.append({
+                't': period,
+                'requests': requests,
+                'errors': data['errors'],
+                'client_errors': data['client_errors'],
+                **data['latency'].summary(suffix='_response_ms'),
+                'avg_db_ms': data['db_latency'].summary()['avg_ms'],
+                'p95_db_ms': data['db_latency'].quantile(0.95),
+                'avg_db_queries': data['db_queries'] / requests if requests else 0,
+                'by_status': dict(data['by_status']),
+            })
+        return {'from': start, 'to': end, 'resolution': resolution, 'points': points}
+
+
+# Singleton instance used by app
+metrics_history = MetricsHistory()
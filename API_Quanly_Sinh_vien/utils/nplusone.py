@@ -0,0 +1,130 @@
+# nplusone.py phát hiện lỗi N+1 query: cùng 1 câu SQL (chỉ khác tham số) chạy lặp lại nhiều lần trong 1 request,
+# thường do lazy load relationship trong vòng lặp (vd: for member in team.members: member.student)
+# Chỉ bật khi phát triển / test (NPLUSONE_DETECTION=warn hoặc raise), production không tốn chi phí gì.
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_WHITESPACE = re.compile(r'\s+')
+# IN (?, ?, ?) / IN (%s, %s) / IN (__[POSTCOMPILE_x]) có số tham số khác nhau nhưng là cùng 1 dạng câu
+_IN_LIST = re.compile(r'\bIN \((?:[^()\'"]|\([^()]*\))*\)', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Số query (hoặc số lần lặp của 1 câu query) vượt giới hạn cho phép"""
+
+
+def fingerprint(statement: str) -> str:
+    """Dạng chuẩn của câu SQL: bỏ khác biệt về khoảng trắng và số phần tử trong IN (...)"""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', statement)).strip()
+
+
+def _caller_location():
+    """Dòng code trong app (ngoài thư viện và utils) đã gây ra query, để biết vòng lặp nằm ở đâu"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_API_ROOT) and not filename.startswith(_API_ROOT + 'utils' + os.sep):
+            return f'{filename[len(_API_ROOT):]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    shapes = g.get('_query_shapes')
+    if shapes is None:
+        shapes = g._query_shapes = Counter()
+        g._query_locations = {}
+    shape = fingerprint(statement)
+    shapes[shape] += 1
+    if shape not in g._query_locations:
+        g._query_locations[shape] = _caller_location()
+
+
+def find_repeated_queries(threshold: int):
+    """Các câu query của request hiện tại chạy nhiều hơn `threshold` lần: [{'statement', 'count', 'location'}]"""
+    shapes = g.get('_query_shapes')
+    if not shapes:
+        return []
+    return [
+        {'statement': shape, 'count': count, 'location': g._query_locations.get(shape)}
+        for shape, count in shapes.most_common() if count > threshold
+    ]
+
+
+def install_nplusone_detection(app):
+    """
+    Bật phát hiện N+1 theo app.config['NPLUSONE_DETECTION']:
+        'off'   - không làm gì (mặc định)
+        'warn'  - in cảnh báo kèm câu SQL và dòng code gây ra
+        'raise' - trả về 500 thay cho response để test / dev thấy lỗi ngay
+    Ngưỡng: app.config['NPLUSONE_THRESHOLD'] (1 câu query chạy quá số lần này trong 1 request)
+    """
+    mode = (app.config.get('NPLUSONE_DETECTION') or 'off').lower()
+    if mode not in ('warn', 'raise'):
+        return
+    threshold = app.config.get('NPLUSONE_THRESHOLD', 5)
+    if not event.contains(Engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.after_request
+    def _check_nplusone(response):
+        repeated = find_repeated_queries(threshold)
+        if not repeated:
+            return response
+        for item in repeated:
+            print(f"[N+1] {request.method} {request.path}: query ran {item['count']} times "
+                  f"(from {item['location']}): {item['statement'][:200]}")
+        if mode == 'raise':
+            return jsonify({'error': 'N+1 query detected', 'queries': repeated}), 500
+        return response
+
+
+@contextmanager
+def count_queries():
+    """
+    Ghi lại mọi câu SQL chạy trong khối with (mọi request / thread)
+
+        with count_queries() as statements:
+            client.get('/api/teams/')
+        print(len(statements))
+    """
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'after_cursor_execute', listener)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'after_cursor_execute', listener)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, max_repeats: int | None = None):
+    """
+    Giới hạn số query của 1 đoạn code (vd: 1 lần gọi endpoint trong test), dùng được làm fixture pytest
+
+        with assert_max_queries(5, max_repeats=2):
+            client.get('/api/teams/', headers=headers)
+
+    Raises:
+        QueryBudgetExceeded: tổng số query > max_queries, hoặc 1 câu query lặp lại > max_repeats lần
+    """
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > max_queries:
+        raise QueryBudgetExceeded(f'{len(statements)} queries executed, budget is {max_queries}')
+    if max_repeats is not None:
+        shape, count = next(iter(Counter(map(fingerprint, statements)).most_common(1)), (None, 0))
+        if count > max_repeats:
+            raise QueryBudgetExceeded(f'Query ran {count} times, at most {max_repeats} allowed: {shape[:200]}')
@@ -0,0 +1,165 @@
+# pagination.py phân trang cho các endpoint danh sách
+# - luôn có ORDER BY ổn định (cột sort + id làm tiebreaker) và per_page bị giới hạn
+# - keyset (cursor): gửi ?cursor= (rỗng cho trang đầu) rồi dùng next_cursor của response cho trang sau.
+#   Trang sau được lọc bằng WHERE (cột sort, id) > (giá trị cuối của trang trước) nên không cần OFFSET
+#   hay COUNT(*), trang sâu nhanh như trang đầu và không bị lặp/sót khi dữ liệu thay đổi giữa 2 lần gọi
+# - page/per_page như cũ (có total, pages) vẫn dùng được cho frontend hiện tại
+# - ?include_total=0 bỏ câu COUNT(*) (hiện "trang N" ngay, lấy tổng sau), ?include_total=approx dùng
+#   COUNT(*) đã cache theo bộ filter (xem utils/count_cache.py), ?include_total=1 đếm chính xác
+import json
+import math
+import base64
+from datetime import date, datetime
+from flask import request
+from sqlalchemy import and_, or_
+from utils.count_cache import count_cache
+from utils.fields import load_fields
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+_TOTAL_MODES = {'1': 'exact', 'true': 'exact', 'exact': 'exact', '0': None, 'false': None, 'none': None,
+                'approx': 'approx'}
+
+
+class Page:
+    """Kết quả 1 trang: items + next_cursor (None nếu là trang cuối), total/pages chỉ có khi được đếm."""
+
+    def __init__(self, items, next_cursor, per_page, total=None, current_page=None, total_mode=None,
+                 has_more=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.has_more = next_cursor is not None if has_more is None else has_more
+        self.per_page = per_page
+        self.total = total
+        self.pages = math.ceil(total / per_page) if total is not None else None
+        self.current_page = current_page
+        self.total_mode = total_mode
+
+    def to_dict(self, key, data):
+        """Body JSON của response, vd: page.to_dict('students', [s.to_dict() for s in page.items])"""
+        result = {
+            key: data,
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'per_page': self.per_page,
+        }
+        if self.current_page is not None:
+            result['current_page'] = self.current_page
+        if self.total is not None:
+            result['total'] = self.total
+            result['pages'] = self.pages
+            result['total_is_approximate'] = self.total_mode == 'approx'
+        return result
+
+
+def _per_page(default_per_page):
+    return min(max(request.args.get('per_page', default_per_page, type=int), 1), MAX_PER_PAGE)
+
+
+def _total_mode(default):
+    include_total = request.args.get('include_total', default).lower()
+    if include_total not in _TOTAL_MODES:
+        raise ValueError("include_total must be one of: 1, 0, approx")
+    return _TOTAL_MODES[include_total]
+
+
+def offset_params(default_per_page=DEFAULT_PER_PAGE):
+    """
+    (page, per_page, total_mode) từ request cho các danh sách chỉ phân trang theo offset
+    (vd: kết quả tìm kiếm xếp theo độ liên quan, không có cột sort để làm cursor)
+    """
+    return max(request.args.get('page', 1, type=int), 1), _per_page(default_per_page), _total_mode('1')
+
+
+def _encode_cursor(sort, column, item):
+    value = getattr(item, column.key)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, sort, column):
+    try:
+        sort_in_cursor, value, last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if value is not None:
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+        last_id = int(last_id)
+    except (ValueError, TypeError, NotImplementedError):
+        raise ValueError('Invalid cursor')
+    if sort_in_cursor != sort:
+        raise ValueError('Cursor does not match the sort parameter')
+    return value, last_id
+
+
+def _after(column, pk, value, last_id, descending):
+    """Điều kiện 'đứng sau (value, last_id)' theo thứ tự sort; NULL được xếp nhỏ nhất như MySQL/SQLite"""
+    if column is pk:
+        return pk < last_id if descending else pk > last_id
+    if not descending:
+        if value is None:
+            return or_(column.isnot(None), and_(column.is_(None), pk > last_id))
+        return or_(column > value, and_(column == value, pk > last_id))
+    if value is None:
+        return and_(column.is_(None), pk < last_id)
+    return or_(column < value, and_(column == value, pk < last_id), column.is_(None))
+
+
+def paginate(query, model, sorts, default_sort='id', default_per_page=DEFAULT_PER_PAGE, allow_offset=True,
+             fields=None):
+    """
+    Phân trang query theo tham số request: sort, per_page, cursor (keyset) hoặc page (offset)
+
+    Args:
+        sorts: {tên: cột} các cột được phép sort, vd {'id': Student.id, 'created_at': Student.created_at};
+               ?sort=-created_at để sort giảm dần
+        allow_offset: False thì luôn dùng cursor (các danh sách con như /projects/<id>/teams)
+        fields: kết quả parse_fields(), chỉ SELECT các cột này (+ cột sort để tạo cursor)
+
+    ?include_total=1|0|approx: có đếm tổng hay không, mặc định 1 ở chế độ page và 0 ở chế độ cursor
+
+    Raises:
+        ValueError: sort, cursor hoặc include_total không hợp lệ (route trả về 400)
+    """
+    per_page = _per_page(default_per_page)
+    sort = request.args.get('sort') or default_sort
+    descending = sort.startswith('-')
+    column = sorts.get(sort.lstrip('-'))
+    if column is None:
+        raise ValueError(f"Invalid sort '{sort}', allowed: {', '.join(sorts)} (prefix '-' for descending)")
+
+    query = load_fields(query, model, fields, column)
+
+    cursor = request.args.get('cursor')
+    offset_mode = cursor is None and allow_offset
+    total_mode = _total_mode('1' if offset_mode else '0')
+    # đếm trên query chưa có ORDER BY / điều kiện cursor: tổng của cả danh sách đã lọc
+    if total_mode == 'approx':
+        total = count_cache.count(query)
+    elif total_mode == 'exact':
+        total = query.count()
+    else:
+        total = None
+
+    pk = model.id
+    if column is pk:
+        query = query.order_by(pk.desc() if descending else pk.asc())
+    else:
+        query = query.order_by(*((column.desc(), pk.desc()) if descending else (column.asc(), pk.asc())))
+
+    page = None
+    if offset_mode:
+        page = max(request.args.get('page', 1, type=int), 1)
+        query = query.offset((page - 1) * per_page)
+    elif cursor:
+        value, last_id = _decode_cursor(cursor, sort, column)
+        query = query.filter(_after(column, pk, value, last_id, descending))
+    # lấy thêm 1 dòng để biết còn trang sau hay không, không cần COUNT(*)
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = _encode_cursor(sort, column, items[-1]) if len(rows) > per_page else None
+    return Page(items, next_cursor, per_page, total, page, total_mode)
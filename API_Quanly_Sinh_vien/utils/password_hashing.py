@@ -0,0 +1,122 @@
+# password_hashing.py chạy việc băm/kiểm tra mật khẩu (scrypt/pbkdf2 của werkzeug) trên một pool riêng có giới hạn
+# lúc đầu học kỳ cả lớp cùng đăng nhập, nếu băm trực tiếp trên thread của request thì CPU bị chiếm hết
+# và các request khác phải xếp hàng; pool giới hạn số phép băm chạy song song và số request được chờ
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# số thread băm chạy song song (0 = băm trực tiếp trên thread của request, như trước đây)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+# số phép băm tối đa được xếp hàng chờ, vượt quá thì từ chối ngay thay vì treo request
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 64))
+
+
+class PasswordHashPoolBusy(Exception):
+    """Hàng đợi băm mật khẩu đã đầy, route nên trả về 503"""
+
+
+class PasswordHashPool:
+    """Thread pool có giới hạn cho các phép băm mật khẩu.
+
+    hashlib.scrypt/pbkdf2_hmac nhả GIL khi chạy nên thread pool là đủ, không cần process pool.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers > 0 else None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._run_ms_total = 0.0
+
+    def _wrap(self, fn, args, enforce_limit=True):
+        """Đưa một phép băm vào hàng đợi (tính vào metrics) và trả về hàm thực thi nó"""
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            if enforce_limit and self._queued >= self.max_queue:
+                self._rejected += 1
+                raise PasswordHashPoolBusy('Too many concurrent password operations, please retry')
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_ms_total += (started_at - enqueued_at) * 1000.0
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._run_ms_total += (time.perf_counter() - started_at) * 1000.0
+
+        return task
+
+    def run(self, fn, *args):
+        """Chạy fn(*args) trên pool và chờ kết quả; raise PasswordHashPoolBusy nếu hàng đợi đầy"""
+        task = self._wrap(fn, args)
+        if self._executor is None:
+            return task()
+        return self._executor.submit(task).result()
+
+    def run_many(self, fn, items):
+        """
+        Chạy fn(item) cho từng item song song trên pool, trả về list kết quả theo đúng thứ tự
+
+        Mỗi lúc chỉ gửi tối đa `workers` việc vào pool để các request đăng nhập vẫn được xen vào
+        thay vì phải chờ sau cả một lô import
+        """
+        if self._executor is None:
+            return [self._wrap(fn, (item,), enforce_limit=False)() for item in items]
+        window = deque()
+        results = []
+        for item in items:
+            if len(window) >= self.workers:
+                results.append(window.popleft().result())
+            window.append(self._executor.submit(self._wrap(fn, (item,), enforce_limit=False)))
+        while window:
+            results.append(window.popleft().result())
+        return results
+
+    def stats(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': self._queued,
+                'running': self._running,
+                'max_queued': self._max_queued,
+                'completed': completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._wait_ms_total / completed, 2) if completed else 0,
+                'avg_hash_ms': round(self._run_ms_total / completed, 2) if completed else 0,
+            }
+
+
+# Singleton instance used by app
+password_hash_pool = PasswordHashPool()
+
+
+def hash_password(password):
+    return password_hash_pool.run(generate_password_hash, password)
+
+
+def verify_password(password_hash, password):
+    return password_hash_pool.run(check_password_hash, password_hash, password)
+
+
+def hash_passwords(passwords):
+    """Băm nhiều mật khẩu song song (dùng cho import hàng loạt)"""
+    return password_hash_pool.run_many(generate_password_hash, passwords)
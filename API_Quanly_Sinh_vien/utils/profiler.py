@@ -0,0 +1,196 @@
+# profiler.py chụp profile dạng thống kê (sampling) cho từng request để xem thời gian nằm ở đâu
+# (Flask, SQLAlchemy, to_dict...). Chỉ bật khi cần: admin gửi header X-Profile: 1, hoặc lấy mẫu ngẫu nhiên
+# theo PROFILER_SAMPLE_RATE. Trong lúc request chạy, 1 thread phụ đọc stack của thread xử lý request
+# mỗi vài ms (sys._current_frames) và đếm số lần gặp mỗi stack; kết quả xuất ra dạng collapsed stack
+# (mỗi dòng "frame;frame;... số_mẫu") để vẽ flamegraph bằng flamegraph.pl hoặc speedscope.
+# Không dùng signal (SIGPROF) vì signal chỉ chạy trên main thread, không dùng được với server nhiều thread.
+import os
+import sys
+import time
+import random
+import threading
+import itertools
+from collections import Counter, deque
+from flask import g, request
+from flask_jwt_extended import verify_jwt_in_request
+from utils.identity import get_current_identity, get_verified_user_id
+
+# tỉ lệ request được profile ngẫu nhiên (0 = tắt, 0.01 = 1%)
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+# request lấy mẫu ngẫu nhiên chỉ được lưu khi chậm hơn ngưỡng này (ms); request do admin yêu cầu luôn được lưu
+PROFILER_SLOW_MS = float(os.environ.get('PROFILER_SLOW_MS', 500))
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+PROFILER_MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', 50))
+# số request được profile cùng lúc, giới hạn chi phí khi lượng request lớn
+PROFILER_MAX_CONCURRENT = int(os.environ.get('PROFILER_MAX_CONCURRENT', 2))
+PROFILE_HEADER = 'X-Profile'
+
+_API_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_frame_labels = {}  # code object -> label
+
+
+def _frame_label(code):
+    """Tên frame dạng 'routes/team.py:get_teams', đường dẫn thư viện được rút gọn từ site-packages"""
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if filename.startswith(_API_ROOT):
+            filename = filename[len(_API_ROOT):]
+        elif 'site-packages' + os.sep in filename:
+            filename = filename.split('site-packages' + os.sep, 1)[1]
+        label = _frame_labels[code] = f'{filename}:{code.co_name}'
+    return label
+
+
+class _RequestProfile:
+    """Thread lấy mẫu stack của 1 thread đang xử lý request."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()  # collapsed stack ghi từ gốc tới frame đang chạy
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+
+class ProfileStore:
+    """Profiler theo yêu cầu + bộ nhớ có giới hạn cho các profile đã chụp (cũ nhất bị bỏ trước)."""
+
+    def __init__(self, sample_rate: float = PROFILER_SAMPLE_RATE, slow_ms: float = PROFILER_SLOW_MS,
+                 interval_ms: float = PROFILER_INTERVAL_MS, max_profiles: int = PROFILER_MAX_PROFILES,
+                 max_concurrent: int = PROFILER_MAX_CONCURRENT):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000.0
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._running = 0
+
+    def start(self, trigger: str):
+        """Bắt đầu profile thread hiện tại, trả về None nếu đang có quá nhiều request được profile"""
+        with self._lock:
+            if self._running >= self.max_concurrent:
+                return None
+            self._running += 1
+        profile = _RequestProfile(threading.get_ident(), self.interval)
+        profile.trigger = trigger
+        profile.started_at = time.time()
+        profile.start()
+        return profile
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def finish(self, profile: _RequestProfile, method: str, path: str, route: str | None,
+               status_code: int | None, duration_ms: float, user_id: int | None):
+        """Dừng lấy mẫu và lưu profile (request lấy mẫu ngẫu nhiên mà nhanh thì bỏ qua)"""
+        self.discard(profile)
+        if profile.trigger == 'sample' and duration_ms < self.slow_ms:
+            return None
+        with self._lock:
+            entry = {
+                'id': next(self._ids),
+                'created_at': int(profile.started_at),
+                'trigger': profile.trigger,
+                'method': method,
+                'path': path,
+                'route': route,
+                'status': status_code,
+                'duration_ms': round(duration_ms, 2),
+                'user_id': user_id,
+                'samples': profile.samples,
+                'interval_ms': round(self.interval * 1000, 2),
+                'stacks': profile.stacks,
+            }
+            self._profiles.append(entry)
+        return entry['id']
+
+    def discard(self, profile: _RequestProfile):
+        """Dừng lấy mẫu mà không lưu (gọi được nhiều lần)"""
+        if profile._stop.is_set():
+            return
+        profile.stop()
+        with self._lock:
+            self._running -= 1
+
+    def list(self):
+        """Các profile đã lưu (không kèm stack), mới nhất trước"""
+        with self._lock:
+            return [{key: value for key, value in entry.items() if key != 'stacks'}
+                    for entry in reversed(self._profiles)]
+
+    def collapsed(self, profile_id: int):
+        """Profile dạng collapsed stack ('frame;frame;... count' mỗi dòng), None nếu không còn trong store"""
+        with self._lock:
+            entry = next((e for e in self._profiles if e['id'] == profile_id), None)
+            if entry is None:
+                return None
+            stacks = entry['stacks'].most_common()
+        return ''.join(f'{stack} {count}\n' for stack, count in stacks)
+
+
+# Singleton instance used by app
+profile_store = ProfileStore()
+
+
+def start_request_profile():
+    """before_request: bắt đầu profile nếu admin gửi header X-Profile: 1 hoặc request được lấy mẫu ngẫu nhiên"""
+    trigger = None
+    if request.headers.get(PROFILE_HEADER) == '1':
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_current_identity()
+            if identity and identity['role'] == 'admin':
+                trigger = 'header'
+        except Exception:
+            pass  # token sai thì route tự trả lỗi, chỉ không profile
+    elif profile_store.should_sample():
+        trigger = 'sample'
+    if trigger:
+        profile = profile_store.start(trigger)
+        if profile is not None:
+            g._profile = profile
+
+
+def finish_request_profile(response, duration_ms: float):
+    """after_request: lưu profile của request (nếu có) và trả id trong header X-Profile-Id"""
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return
+    profile_id = profile_store.finish(
+        profile, request.method, request.path,
+        request.url_rule.rule if request.url_rule else None,
+        response.status_code, duration_ms, get_verified_user_id()
+    )
+    if profile_id is not None:
+        response.headers['X-Profile-Id'] = str(profile_id)
+
+
+def discard_request_profile():
+    """teardown_request: dừng thread lấy mẫu nếu request kết thúc bằng lỗi trước after_request"""
+    profile = g.pop('_profile', None)
+    if profile is not None:
+        profile_store.discard(profile)
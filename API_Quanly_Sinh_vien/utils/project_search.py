@@ -0,0 +1,233 @@
+# project_search.py tìm kiếm toàn văn (full-text) projects theo title, description, technology_stack
+# - MySQL: index FULLTEXT (ft_projects_search, ft_projects_title), MATCH ... AGAINST ... IN BOOLEAN MODE,
+#   mọi từ đều phải có (+từ*, tìm cả theo tiền tố), điểm = độ liên quan của cả 3 cột + điểm của riêng title
+# - SQLite (chạy test / dev) hoặc MySQL chưa có index: inverted index trong bộ nhớ của process, chấm điểm BM25
+#   (title nặng hơn technology_stack, nặng hơn description), được dựng lại khi bảng projects có thay đổi
+# Kết quả xếp theo điểm liên quan, mỗi project có 'score' và 'highlights' (đoạn trích có <mark>từ khóa</mark>).
+import html
+import math
+import time
+import bisect
+import threading
+from collections import defaultdict
+from typing import NamedTuple
+from sqlalchemy import inspect
+from sqlalchemy.dialects.mysql import match
+from models import db, Project
+from utils.count_cache import table_versions
+from utils.text import WORD, fold, words
+
+MIN_TERM_LENGTH = 3  # = innodb_ft_min_token_size mặc định, từ ngắn hơn MySQL không đánh index
+MAX_TERMS = 8
+SNIPPET_CHARS = 160
+# các worker khác có thể đã sửa projects: index trong bộ nhớ không sống lâu hơn thời gian này
+INDEX_MAX_AGE_SEC = 60
+# số id khớp được kiểm tra filter trong 1 query IN (...) khi dùng inverted index
+SEARCH_CHUNK = 500
+FIELD_WEIGHTS = {'title': 3.0, 'technology_stack': 2.0, 'description': 1.0}
+TITLE_BOOST = 2.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def parse_terms(q: str):
+    """Các từ khóa (đã bỏ dấu, không trùng) của chuỗi tìm kiếm, bỏ qua từ ngắn hơn MIN_TERM_LENGTH"""
+    terms = []
+    for term in words(q):
+        if len(term) >= MIN_TERM_LENGTH and term not in terms:
+            terms.append(term)
+    if not terms:
+        raise ValueError(f'Search query must contain at least one word of {MIN_TERM_LENGTH}+ characters')
+    return terms[:MAX_TERMS]
+
+
+class _Snapshot(NamedTuple):
+    """1 phiên bản đã dựng xong của inverted index, không bị sửa sau khi tạo"""
+    postings: dict  # từ -> {project_id: tf có trọng số theo cột}
+    vocabulary: list  # các từ đã sort, để tìm theo tiền tố bằng bisect
+    doc_lengths: dict
+    avg_length: float
+
+    def expand(self, term):
+        """Các từ trong index bắt đầu bằng term (giống term* của MySQL)"""
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + '\U0010ffff')
+        return self.vocabulary[start:end]
+
+
+class InvertedIndex:
+    """
+    Inverted index của projects: từ -> {project_id: tf có trọng số theo cột}, dùng khi không có FULLTEXT.
+
+    Lần dựng lại tạo 1 _Snapshot mới và thay bằng 1 phép gán, search đọc snapshot 1 lần khi bắt đầu
+    nên không thấy index dựng dở.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = 0.0
+        self._version = None
+        self._snapshot = _Snapshot({}, [], {}, 0.0)
+
+    @staticmethod
+    def _build():
+        postings = defaultdict(lambda: defaultdict(float))
+        doc_lengths = {}
+        rows = db.session.query(Project.id, Project.title, Project.technology_stack, Project.description)
+        for project_id, *values in rows:
+            length = 0.0
+            for field, value in zip(FIELD_WEIGHTS, values):
+                weight = FIELD_WEIGHTS[field]
+                for term in words(value):
+                    postings[term][project_id] += weight
+                    length += weight
+            doc_lengths[project_id] = length
+        postings = {term: dict(docs) for term, docs in postings.items()}
+        avg_length = sum(doc_lengths.values()) / len(doc_lengths) if doc_lengths else 0.0
+        return _Snapshot(postings, sorted(postings), doc_lengths, avg_length)
+
+    def _ensure_fresh(self):
+        """Snapshot còn mới, dựng lại nếu bảng projects đã thay đổi hoặc quá INDEX_MAX_AGE_SEC"""
+        version = table_versions.get(('projects',))
+        if version == self._version and time.monotonic() - self._built_at < INDEX_MAX_AGE_SEC:
+            return self._snapshot
+        with self._lock:
+            if version == self._version and time.monotonic() - self._built_at < INDEX_MAX_AGE_SEC:
+                return self._snapshot
+            self._snapshot = self._build()
+            self._version = version
+            self._built_at = time.monotonic()
+            return self._snapshot
+
+    def search(self, terms):
+        """{project_id: điểm BM25} của các project chứa mọi từ khóa"""
+        snapshot = self._ensure_fresh()
+        total_docs = len(snapshot.doc_lengths)
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for word in snapshot.expand(term):
+                docs = snapshot.postings[word]
+                idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for project_id, tf in docs.items():
+                    norm = 1 - BM25_B + BM25_B * snapshot.doc_lengths[project_id] / (snapshot.avg_length or 1)
+                    term_scores[project_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {project_id: score + term_scores[project_id]
+                          for project_id, score in scores.items() if project_id in term_scores}
+            if not scores:
+                return {}
+        return dict(scores)
+
+
+def highlight(value, terms, limit=None):
+    """Đoạn text đã escape HTML, các từ khớp (không phân biệt dấu, theo tiền tố) được bọc trong <mark>"""
+    if not value:
+        return None
+    folded = fold(value)
+    if len(folded) != len(value):  # ký tự ghép không tách được 1-1: bỏ qua highlight
+        folded = value.lower()
+    matches = [m.span() for m in WORD.finditer(folded) if any(m.group().startswith(t) for t in terms)]
+    if not matches:
+        return None if limit else html.escape(value)
+    start, end = 0, len(value)
+    if limit and len(value) > limit:
+        start = max(0, matches[0][0] - limit // 4)
+        end = min(len(value), start + limit)
+    parts = ['…' if start > 0 else '']
+    position = start
+    for match_start, match_end in matches:
+        if match_start < start or match_end > end:
+            continue
+        parts.append(html.escape(value[position:match_start]))
+        parts.append(f'<mark>{html.escape(value[match_start:match_end])}</mark>')
+        position = match_end
+    parts.append(html.escape(value[position:end]))
+    parts.append('…' if end < len(value) else '')
+    return ''.join(parts)
+
+
+def highlights(project, terms):
+    """{'title': ..., 'technology_stack': ..., 'description': ...} chỉ gồm các cột có từ khớp"""
+    result = {}
+    for field in FIELD_WEIGHTS:
+        snippet = highlight(getattr(project, field), terms, limit=SNIPPET_CHARS if field == 'description' else None)
+        if snippet and '<mark>' in snippet:
+            result[field] = snippet
+    return result
+
+
+class ProjectSearch:
+    """Chọn MySQL FULLTEXT hoặc inverted index trong bộ nhớ, trả về 1 trang kết quả đã xếp hạng."""
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        self._fulltext = None  # None = chưa kiểm tra
+
+    def uses_fulltext(self):
+        if self._fulltext is None:
+            fulltext = False
+            if db.engine.dialect.name == 'mysql':
+                names = {index['name'] for index in inspect(db.engine).get_indexes('projects')}
+                fulltext = {'ft_projects_search', 'ft_projects_title'} <= names
+                if not fulltext:
+                    print('[Project Search] FULLTEXT indexes missing on projects (run `flask db upgrade`), '
+                          'using in-process index')
+            self._fulltext = fulltext
+        return self._fulltext
+
+    def search(self, query, terms, page, per_page, with_total=True):
+        """
+        1 trang project chứa mọi từ trong terms (kết quả parse_terms), đã lọc theo query,
+        xếp theo điểm giảm dần rồi id
+
+        Returns:
+            (items, {project_id: score}, total hoặc None, has_more)
+        """
+        offset = (page - 1) * per_page
+        if self.uses_fulltext():
+            boolean_query = ' '.join(f'+{term}*' for term in terms)
+            match_all = match(Project.title, Project.description, Project.technology_stack,
+                              against=boolean_query).in_boolean_mode()
+            score = (match_all + TITLE_BOOST * match(Project.title, against=boolean_query).in_boolean_mode())
+            query = query.filter(match_all)
+            total = query.count() if with_total else None
+            rows = query.add_columns(score.label('search_score')).order_by(
+                score.desc(), Project.id
+            ).offset(offset).limit(per_page + 1).all()
+            items = [project for project, _ in rows[:per_page]]
+            scores = {project.id: round(float(value), 4) for project, value in rows[:per_page]}
+            return items, scores, total, len(rows) > per_page
+
+        matched = self.index.search(terms)
+        if not matched:
+            return [], {}, 0 if with_total else None, False
+        ranked = sorted(matched, key=lambda project_id: (-matched[project_id], project_id))
+        allowed = ranked if query.whereclause is None else self._allowed(query, ranked, offset + per_page, with_total)
+        page_ids = allowed[offset:offset + per_page]
+        projects = {project.id: project for project in query.filter(Project.id.in_(page_ids))} if page_ids else {}
+        items = [projects[project_id] for project_id in page_ids if project_id in projects]
+        scores = {project_id: round(matched[project_id], 4) for project_id in page_ids}
+        return items, scores, len(allowed) if with_total else None, offset + per_page < len(allowed)
+
+    @staticmethod
+    def _allowed(query, ranked, end, with_total):
+        """
+        Các id trong ranked (giữ thứ tự) thỏa các filter còn lại của query (status, quyền của student...),
+        kiểm tra từng nhóm SEARCH_CHUNK id; không cần total thì dừng khi đã đủ tới hết trang (+1 để biết has_more)
+        """
+        allowed = []
+        for start in range(0, len(ranked), SEARCH_CHUNK):
+            chunk = ranked[start:start + SEARCH_CHUNK]
+            passed = {project_id for (project_id,) in
+                      query.with_entities(Project.id).filter(Project.id.in_(chunk))}
+            allowed.extend(project_id for project_id in chunk if project_id in passed)
+            if not with_total and len(allowed) > end:
+                break
+        return allowed
+
+
+# Singleton instance used by app
+project_search = ProjectSearch()
@@ -0,0 +1,77 @@
+# stats_cache.py cache kết quả các endpoint thống kê (/statistics của students, teachers, projects, admin)
+# - mỗi entry sống STATS_CACHE_TTL_SEC giây và bị bỏ ngay khi 1 bảng mà thống kê đọc tới có thay đổi được commit
+#   trong process này (table_versions, xem utils/count_cache.py); worker khác commit thì lệch tối đa TTL giây
+# - nhiều request cùng lúc gặp entry hết hạn chỉ tính lại 1 lần: request đầu tiên chạy query,
+#   các request khác chờ và dùng chung kết quả (200 giảng viên mở dashboard = 1 lần tính)
+import os
+import time
+import threading
+from utils.count_cache import table_versions, TableVersions
+
+STATS_CACHE_TTL_SEC = float(os.environ.get('STATS_CACHE_TTL_SEC', 30))
+
+
+class _Refresh:
+    """1 lần tính lại đang chạy, các request khác chờ trên event"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class StatsCache:
+    """TTL cache theo tên thống kê, bỏ entry khi bảng thay đổi, gộp các lần tính lại đồng thời."""
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL_SEC, versions: TableVersions = table_versions):
+        self.ttl = ttl
+        self.versions = versions
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, table versions, value)
+        self._refreshing = {}  # key -> _Refresh
+
+    def get(self, key, tables, compute):
+        """
+        Kết quả compute() còn hạn của key, tính lại nếu hết hạn hoặc 1 bảng trong tables đã thay đổi
+
+        Args:
+            tables: tên các bảng mà compute() đọc tới
+            compute: hàm không tham số chạy các query thống kê (trong app context của request hiện tại)
+        """
+        versions = self.versions.get(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == versions:
+                return entry[2]
+            refresh = self._refreshing.get(key)
+            owner = refresh is None
+            if owner:
+                refresh = self._refreshing[key] = _Refresh()
+
+        if not owner:
+            refresh.done.wait()
+            if refresh.error is not None:
+                raise refresh.error
+            return refresh.value
+
+        try:
+            # version đọc trước khi query: commit xảy ra trong lúc tính thì lần sau sẽ tính lại
+            refresh.value = compute()
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, versions, refresh.value)
+            return refresh.value
+        except Exception as e:
+            refresh.error = e
+            raise
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+            refresh.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance used by app
+stats_cache = StatsCache()
@@ -0,0 +1,235 @@
+# student_import.py xử lý import danh sách sinh viên hàng loạt từ file CSV hoặc XLSX
+# file được đọc dần từng dòng, xử lý theo từng lô (chunk): mỗi lô chỉ cần vài query IN để kiểm tra trùng,
+# băm mật khẩu song song và insert User + Student bằng executemany trong 1 transaction
+import csv
+import io
+import re
+from datetime import date, datetime
+from sqlalchemy import insert
+from models import db, User, Student
+from utils.password_hashing import hash_passwords
+
+IMPORT_CHUNK_SIZE = 500
+
+REQUIRED_COLUMNS = ('student_code', 'full_name', 'major', 'username', 'email', 'password')
+OPTIONAL_COLUMNS = ('date_of_birth', 'phone', 'address', 'class_name', 'year_of_study', 'gpa', 'status')
+STUDENT_STATUSES = ('active', 'inactive', 'graduated', 'suspended')
+EMAIL_PATTERN = re.compile(r'^[^@]+@[^@]+\.[^@]+$')
+
+
+def _check_header(columns):
+    columns = [str(c).strip() for c in columns if c is not None]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f'Missing required columns: {", ".join(missing)}')
+    return columns
+
+
+def _iter_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = _check_header(next(reader, []))
+    for row_number, values in enumerate(reader, start=2):
+        if any(v.strip() for v in values):
+            yield row_number, dict(zip(header, values))
+
+
+def _iter_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('XLSX import requires the openpyxl package')
+    # read_only=True: openpyxl đọc dần từng dòng thay vì load cả workbook vào bộ nhớ
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = _check_header(next(rows, ()))
+        for row_number, values in enumerate(rows, start=2):
+            if any(v not in (None, '') for v in values):
+                yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_roster_rows(file):
+    """
+    Đọc file roster (CSV hoặc XLSX) từ request.files, yield (số dòng, dict) cho từng dòng
+
+    Raises:
+        ValueError: định dạng file không hỗ trợ hoặc thiếu cột bắt buộc
+    """
+    filename = (file.filename or '').lower()
+    if filename.endswith('.csv'):
+        return _iter_csv(file.stream)
+    if filename.endswith('.xlsx'):
+        return _iter_xlsx(file.stream)
+    raise ValueError('Only .csv and .xlsx files are supported')
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel lưu mã số như 2101234 thành số thực
+    value = str(value).strip()
+    return value or None
+
+
+def _parse_row(raw):
+    """Chuẩn hóa 1 dòng thành các giá trị cho User/Student, trả về (values, errors)"""
+    errors = []
+    values = {column: _text(raw.get(column)) for column in REQUIRED_COLUMNS}
+    for column in REQUIRED_COLUMNS:
+        if not values[column]:
+            errors.append(f'{column} is required')
+
+    if values['email'] and not EMAIL_PATTERN.match(values['email']):
+        errors.append('Invalid email format')
+    if values['password'] and len(values['password']) < 6:
+        errors.append('Password must be at least 6 characters')
+
+    values['phone'] = _text(raw.get('phone'))
+    values['address'] = _text(raw.get('address'))
+    values['class_name'] = _text(raw.get('class_name'))
+
+    date_of_birth = raw.get('date_of_birth')
+    if isinstance(date_of_birth, datetime):
+        date_of_birth = date_of_birth.date()
+    elif date_of_birth not in (None, '') and not isinstance(date_of_birth, date):
+        try:
+            date_of_birth = date.fromisoformat(_text(date_of_birth))
+        except ValueError:
+            errors.append('date_of_birth must be YYYY-MM-DD')
+    values['date_of_birth'] = date_of_birth or None
+
+    try:
+        year_of_study = _text(raw.get('year_of_study'))
+        values['year_of_study'] = int(year_of_study) if year_of_study else None
+    except ValueError:
+        errors.append('year_of_study must be an integer')
+    try:
+        gpa = _text(raw.get('gpa'))
+        values['gpa'] = float(gpa) if gpa else 0.0
+    except ValueError:
+        errors.append('gpa must be a number')
+
+    values['status'] = _text(raw.get('status')) or 'active'
+    if values['status'] not in STUDENT_STATUSES:
+        errors.append(f'status must be one of: {", ".join(STUDENT_STATUSES)}')
+
+    return values, errors
+
+
+def _existing(column, keys):
+    """1 query IN để lấy các giá trị đã tồn tại trong database"""
+    if not keys:
+        return set()
+    rows = db.session.query(column).filter(column.in_(keys)).all()
+    return {str(row[0]).lower() for row in rows}
+
+
+def _import_chunk(chunk, report, seen):
+    candidates = []
+    for row_number, raw in chunk:
+        values, errors = _parse_row(raw)
+        if not errors:
+            # trùng lặp ngay trong file (so sánh không phân biệt hoa thường như collation của MySQL)
+            for column in ('student_code', 'username', 'email'):
+                key = values[column].lower()
+                if key in seen[column]:
+                    errors.append(f'Duplicate {column} in file: {values[column]}')
+        if errors:
+            report['errors'].append({'row': row_number, 'student_code': values.get('student_code'), 'errors': errors})
+            continue
+        for column in ('student_code', 'username', 'email'):
+            seen[column].add(values[column].lower())
+        candidates.append((row_number, values))
+
+    # Kiểm tra trùng với database cho cả lô: 3 query IN thay vì 3 query cho mỗi sinh viên
+    existing = {
+        'student_code': _existing(Student.student_code, [v['student_code'] for _, v in candidates]),
+        'username': _existing(User.username, [v['username'] for _, v in candidates]),
+        'email': _existing(User.email, [v['email'] for _, v in candidates]),
+    }
+    labels = {'student_code': 'Student code', 'username': 'Username', 'email': 'Email'}
+    accepted = []
+    for row_number, values in candidates:
+        errors = [f'{labels[c]} already exists' for c in labels if values[c].lower() in existing[c]]
+        if errors:
+            report['errors'].append({'row': row_number, 'student_code': values['student_code'], 'errors': errors})
+        else:
+            accepted.append((row_number, values))
+
+    if not accepted:
+        return
+
+    password_hashes = hash_passwords([values['password'] for _, values in accepted])
+
+    try:
+        db.session.execute(insert(User), [
+            {
+                'username': values['username'],
+                'email': values['email'],
+                'password_hash': password_hash,
+                'role': 'student',
+                'is_active': True,
+            }
+            for (_, values), password_hash in zip(accepted, password_hashes)
+        ])
+        user_ids = dict(db.session.query(User.username, User.id).filter(
+            User.username.in_([values['username'] for _, values in accepted])
+        ).all())
+        db.session.execute(insert(Student), [
+            {
+                'user_id': user_ids[values['username']],
+                'student_code': values['student_code'],
+                'full_name': values['full_name'],
+                'date_of_birth': values['date_of_birth'],
+                'phone': values['phone'],
+                'address': values['address'],
+                'major': values['major'],
+                'class_name': values['class_name'],
+                'year_of_study': values['year_of_study'],
+                'gpa': values['gpa'],
+                'status': values['status'],
+            }
+            for _, values in accepted
+        ])
+        db.session.commit()
+        report['created'] += len(accepted)
+    except Exception as e:
+        # Lô bị lỗi (vd: trùng dữ liệu do request khác insert cùng lúc) thì rollback cả lô
+        db.session.rollback()
+        for row_number, values in accepted:
+            report['errors'].append({'row': row_number, 'student_code': values['student_code'], 'errors': [str(e)]})
+
+
+def import_student_roster(file, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import sinh viên từ file CSV/XLSX theo từng lô
+
+    Cột bắt buộc: student_code, full_name, major, username, email, password
+    Cột tùy chọn: date_of_birth, phone, address, class_name, year_of_study, gpa, status
+
+    Returns:
+        dict: {
+            'total_rows': int,  # số dòng dữ liệu đã đọc
+            'created': int,     # số sinh viên được tạo
+            'failed': int,      # số dòng bị lỗi
+            'errors': list      # [{'row', 'student_code', 'errors'}]
+        }
+    """
+    report = {'total_rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+    seen = {'student_code': set(), 'username': set(), 'email': set()}
+    chunk = []
+    for row in iter_roster_rows(file):
+        report['total_rows'] += 1
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, report, seen)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, report, seen)
+    report['errors'].sort(key=lambda error: error['row'])
+    report['failed'] = len(report['errors'])
+    return report
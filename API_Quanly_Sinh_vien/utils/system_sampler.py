@@ -0,0 +1,117 @@
+# system_sampler.py đo CPU, RAM, ổ đĩa và thông tin process trong 1 thread nền, vài giây một lần
+# trước đây mỗi lần gọi /api/admin/statistics chờ psutil.cpu_percent(interval=0.1) mất 100ms,
+# giờ endpoint chỉ đọc mẫu mới nhất và lịch sử ngắn trong ring buffer nên không bị chặn
+import os
+import time
+import threading
+from collections import deque
+
+# số giây giữa 2 lần đo và số mẫu được giữ lại (mặc định 5s x 120 = 10 phút)
+SYSTEM_SAMPLE_INTERVAL_SEC = float(os.environ.get('SYSTEM_SAMPLE_INTERVAL_SEC', 5))
+SYSTEM_SAMPLE_HISTORY = int(os.environ.get('SYSTEM_SAMPLE_HISTORY', 120))
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+
+
+class SystemSampler:
+    """Thread nền đo tài nguyên hệ thống, giữ các mẫu gần nhất trong deque có giới hạn."""
+
+    def __init__(self, interval: float = SYSTEM_SAMPLE_INTERVAL_SEC, history: int = SYSTEM_SAMPLE_HISTORY):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=history)
+        self._error = None
+        self._sampler_pid = None  # gunicorn fork worker sau khi import, thread phải chạy trong từng worker
+
+    def ensure_started(self):
+        if self._sampler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sampler_pid == os.getpid():
+                return
+            self._sampler_pid = os.getpid()
+            self._samples.clear()
+        threading.Thread(target=self._run, name='system-sampler', daemon=True).start()
+
+    def _run(self):
+        try:
+            import psutil
+        except ImportError:
+            self._error = 'psutil is not installed'
+            return
+        process = psutil.Process(os.getpid())
+        # lần gọi đầu tiên với interval=None chỉ đặt mốc, các lần sau trả về % CPU kể từ lần gọi trước
+        psutil.cpu_percent(interval=None)
+        process.cpu_percent(interval=None)
+        time.sleep(min(self.interval, 1.0))  # mẫu đầu tiên có sớm, không phải chờ hết interval
+        while True:
+            try:
+                sample = self._take_sample(psutil, process)
+                with self._lock:
+                    self._samples.append(sample)
+                    self._error = None
+            except Exception as e:
+                self._error = str(e)
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _take_sample(psutil, process):
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        with process.oneshot():
+            process_info = {
+                'memory_mb': round(process.memory_info().rss / MB, 2),
+                'cpu_percent': round(process.cpu_percent(interval=None), 2),
+                'threads': process.num_threads(),
+                'open_fds': process.num_fds() if hasattr(process, 'num_fds') else None,
+            }
+        return {
+            'sampled_at': int(time.time()),
+            'cpu': {
+                'percent': round(psutil.cpu_percent(interval=None), 2),
+                'cores': psutil.cpu_count()
+            },
+            'memory': {
+                'total_gb': round(memory.total / GB, 2),
+                'used_gb': round(memory.used / GB, 2),
+                'percent': round(memory.percent, 2),
+                'available_gb': round(memory.available / GB, 2)
+            },
+            'disk': {
+                'total_gb': round(disk.total / GB, 2),
+                'used_gb': round(disk.used / GB, 2),
+                'percent': round(disk.percent, 2),
+                'free_gb': round(disk.free / GB, 2)
+            },
+            'process': process_info
+        }
+
+    def latest(self):
+        """Mẫu mới nhất, hoặc {'error': ...} nếu chưa đo được"""
+        self.ensure_started()
+        with self._lock:
+            if self._samples:
+                return self._samples[-1]
+            return {'error': self._error or 'System metrics are not sampled yet'}
+
+    def history(self, limit: int | None = None):
+        """Các mẫu gần nhất (cũ trước), dạng rút gọn để vẽ biểu đồ"""
+        self.ensure_started()
+        with self._lock:
+            samples = list(self._samples)
+        if limit is not None:
+            samples = samples[-limit:] if limit > 0 else []
+        return [{
+            'sampled_at': s['sampled_at'],
+            'cpu_percent': s['cpu']['percent'],
+            'memory_percent': s['memory']['percent'],
+            'disk_percent': s['disk']['percent'],
+            'process_memory_mb': s['process']['memory_mb'],
+            'process_threads': s['process']['threads'],
+            'process_open_fds': s['process']['open_fds'],
+        } for s in samples]
+
+
+# Singleton instance used by app
+system_sampler = SystemSampler()
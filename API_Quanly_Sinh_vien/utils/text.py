@@ -0,0 +1,16 @@
+# text.py chuẩn hóa chuỗi tiếng Việt cho tìm kiếm: chữ thường, bỏ dấu, tách từ
+import re
+import unicodedata
+
+WORD = re.compile(r'\w+')
+
+
+def fold(value: str) -> str:
+    """Chữ thường, bỏ dấu tiếng Việt (đ -> d) để so khớp không phân biệt dấu như collation của MySQL"""
+    value = unicodedata.normalize('NFKD', value.lower().replace('đ', 'd'))
+    return ''.join(ch for ch in value if not unicodedata.combining(ch))
+
+
+def words(value: str | None):
+    """Các từ (đã fold) của chuỗi, vd: 'Nguyễn Văn An' -> ['nguyen', 'van', 'an']"""
+    return WORD.findall(fold(value or ''))
@@ -0,0 +1,193 @@
+# typeahead.py gợi ý nhanh sinh viên / giảng viên theo từng phím gõ, không phân biệt dấu ("nguyen an" khớp
+# "Nguyễn Văn An"). Mỗi process giữ 1 prefix index trong bộ nhớ: danh sách (từ đã bỏ dấu, id) được sort,
+# tìm các từ bắt đầu bằng chuỗi gõ vào bằng bisect nên chỉ tốn O(log n + số kết quả), không quét bảng.
+# Index được cập nhật từng dòng ngay khi commit trong process này (event của Session); thay đổi từ worker khác
+# được lấy về định kỳ theo updated_at, và index được dựng lại toàn bộ sau mỗi TYPEAHEAD_REBUILD_SEC (bắt các
+# dòng bị xóa) hoặc sau khi có insert/update/delete hàng loạt (vd: import danh sách sinh viên).
+import os
+import heapq
+import bisect
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Student, Teacher
+from utils.text import fold, words
+
+TYPEAHEAD_SYNC_SEC = float(os.environ.get('TYPEAHEAD_SYNC_SEC', 10))
+TYPEAHEAD_REBUILD_SEC = float(os.environ.get('TYPEAHEAD_REBUILD_SEC', 600))
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MAX_QUERY_WORDS = 6
+# lệch đồng hồ / transaction commit muộn giữa các worker: lần đồng bộ sau đọc lùi lại 1 khoảng
+_SYNC_OVERLAP = timedelta(seconds=5)
+_END = '\U0010ffff'
+
+
+class TypeaheadIndex:
+    """Prefix index các từ (đã bỏ dấu) của vài cột text của 1 model."""
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns  # cột đầu tiên là tên, dùng để xếp hạng
+        self._lock = threading.Lock()
+        self._entries = []  # [(từ, id)] đã sort
+        self._docs = {}  # id -> _doc()
+        self._built_at = None  # time.monotonic() của lần dựng lại gần nhất, None = phải dựng lại
+        self._synced_at = 0.0
+        self._watermark = None  # updated_at đã đồng bộ tới
+
+    @staticmethod
+    def _doc(doc_id, values):
+        """(tên đã fold, tập các từ, khóa xếp hạng cố định: tên ngắn trước, theo ABC, theo id)"""
+        name = fold(values[0] or '')
+        tokens = frozenset(token for value in values for token in words(value))
+        return name, tokens, (len(name), name, doc_id)
+
+    def _put(self, doc_id, values):
+        self._remove(doc_id)
+        doc = self._docs[doc_id] = self._doc(doc_id, values)
+        for token in doc[1]:
+            bisect.insort(self._entries, (token, doc_id))
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            position = bisect.bisect_left(self._entries, (token, doc_id))
+            if position < len(self._entries) and self._entries[position] == (token, doc_id):
+                del self._entries[position]
+
+    def _select(self):
+        return db.session.query(self.model.id, *(getattr(self.model, column) for column in self.columns))
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at > TYPEAHEAD_REBUILD_SEC:
+            started = datetime.utcnow()
+            docs = {doc_id: self._doc(doc_id, values) for doc_id, *values in self._select()}
+            entries = sorted((token, doc_id) for doc_id, (_, tokens, _) in docs.items() for token in tokens)
+            with self._lock:
+                self._docs, self._entries = docs, entries
+                self._built_at = self._synced_at = now
+                self._watermark = started - _SYNC_OVERLAP
+        elif now - self._synced_at > TYPEAHEAD_SYNC_SEC:
+            started = datetime.utcnow()
+            rows = self._select().filter(self.model.updated_at >= self._watermark).all()
+            with self._lock:
+                for doc_id, *values in rows:
+                    self._put(doc_id, values)
+                self._synced_at = now
+                self._watermark = started - _SYNC_OVERLAP
+
+    def apply(self, upserts, deletes):
+        """Cập nhật index với các dòng vừa commit trong process này"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            for doc_id in deletes:
+                self._remove(doc_id)
+            for doc_id, values in upserts.items():
+                self._put(doc_id, values)
+
+    def invalidate(self):
+        """Dựng lại toàn bộ ở lần tìm kiếm sau"""
+        self._built_at = None
+
+    def _range(self, word):
+        """Vị trí [start, end) trong _entries của các từ bắt đầu bằng word"""
+        return (bisect.bisect_left(self._entries, (word,)),
+                bisect.bisect_left(self._entries, (word + _END,)))
+
+    def search(self, q: str, limit: int = DEFAULT_LIMIT):
+        """Id của tối đa `limit` dòng có mọi từ trong q là tiền tố của 1 từ của dòng, xếp theo độ khớp"""
+        query_words = list(dict.fromkeys(words(q)))[:MAX_QUERY_WORDS]
+        if not query_words:
+            return []
+        self._ensure_fresh()
+        phrase = ' '.join(query_words)
+        whole = frozenset(query_words)
+        with self._lock:
+            # bắt đầu từ từ có ít dòng khớp nhất, các từ còn lại chỉ kiểm tra trên tập ứng viên đã thu hẹp
+            ranges = sorted(((self._range(word), word) for word in query_words),
+                            key=lambda item: item[0][1] - item[0][0])
+            (start, end), _ = ranges[0]
+            candidates = {doc_id for _, doc_id in self._entries[start:end]}
+            rest = [word for _, word in ranges[1:]]
+            docs = {}
+            for doc_id in candidates:
+                doc = self._docs[doc_id]
+                if all(any(token.startswith(word) for token in doc[1]) for word in rest):
+                    docs[doc_id] = doc
+
+        def rank(doc_id):
+            name, tokens, order = docs[doc_id]
+            return (
+                phrase not in tokens,  # khớp đúng mã (student_code / teacher_code)
+                not name.startswith(phrase),  # tên bắt đầu bằng chuỗi gõ vào
+                -len(whole & tokens),  # số từ khớp trọn vẹn
+                order,
+            )
+
+        return heapq.nsmallest(limit, docs, key=rank)
+
+
+# Singleton instance used by app
+student_typeahead = TypeaheadIndex(Student, ('full_name', 'student_code', 'class_name'))
+teacher_typeahead = TypeaheadIndex(Teacher, ('full_name', 'teacher_code', 'specialization'))
+_INDEXES = {Student: student_typeahead, Teacher: teacher_typeahead}
+
+
+def _after_flush(session, flush_context):
+    pending = session.info.setdefault('_typeahead', {})
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        index = _INDEXES.get(type(obj))
+        if index is None:
+            continue
+        upserts, deletes = pending.setdefault(index, ({}, set()))
+        if obj in session.deleted:
+            upserts.pop(obj.id, None)
+            deletes.add(obj.id)
+        else:
+            upserts[obj.id] = tuple(getattr(obj, column) for column in index.columns)
+
+
+def _after_bulk(orm_execute_state):
+    # insert/update/delete hàng loạt không đi qua flush: dựng lại index sau khi commit
+    index = _INDEXES.get(getattr(orm_execute_state.bind_mapper, 'class_', None))
+    if index is not None and (orm_execute_state.is_insert or orm_execute_state.is_update or
+                              orm_execute_state.is_delete):
+        orm_execute_state.session.info.setdefault('_typeahead_invalidate', set()).add(index)
+
+
+def _after_commit(session):
+    for index, (upserts, deletes) in session.info.pop('_typeahead', {}).items():
+        index.apply(upserts, deletes)
+    for index in session.info.pop('_typeahead_invalidate', ()):
+        index.invalidate()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('_typeahead', None)
+    session.info.pop('_typeahead_invalidate', None)
+
+
+def install_typeahead():
+    """Đăng ký event cập nhật index typeahead cho mọi Session (gọi 1 lần khi tạo app)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'do_orm_execute', _after_bulk)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_soft_rollback', _after_rollback)
+
+
+def typeahead(index, q, limit):
+    """Các object khớp q theo thứ tự xếp hạng (?limit= mặc định DEFAULT_LIMIT, tối đa MAX_LIMIT)"""
+    limit = min(max(limit or DEFAULT_LIMIT, 1), MAX_LIMIT)
+    ids = index.search(q, limit)
+    if not ids:
+        return []
+    rows = {obj.id: obj for obj in index.model.query.filter(index.model.id.in_(ids))}
+    return [rows[doc_id] for doc_id in ids if doc_id in rows]
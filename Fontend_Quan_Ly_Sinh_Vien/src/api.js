@@ -65,6 +65,11 @@ export async function getStudents(params = {}){
   return request(`/students/${query ? '?'+query : ''}`)
 }
 
+export async function typeaheadStudents(q, limit = 10){
+  const query = new URLSearchParams({ q, limit }).toString()
+  return request(`/students/typeahead?${query}`)
+}
+
 export async function getStudent(id){
   return request(`/students/${id}`)
 }
@@ -81,6 +86,12 @@ export async function deleteStudent(id){
   return request(`/students/${id}`, { method: 'DELETE' })
 }
 
+export async function importStudents(file){
+  const body = new FormData()
+  body.append('file', file)
+  return request('/students/import', { method: 'POST', body })
+}
+
 export async function getStudentTeams(id){
   return request(`/students/${id}/teams`)
 }
@@ -95,6 +106,11 @@ export async function getTeachers(params = {}){
   return request(`/teachers/${query ? '?'+query : ''}`)
 }
 
+export async function typeaheadTeachers(q, limit = 10){
+  const query = new URLSearchParams({ q, limit }).toString()
+  return request(`/teachers/typeahead?${query}`)
+}
+
 export async function getTeacher(id){
   return request(`/teachers/${id}`)
 }
@@ -263,6 +279,12 @@ export async function getAdminMetrics(){
   return request('/admin/metrics')
 }
 
+export async function getOnlineUsers(limit = 100){
+  return request(`/admin/online?limit=${limit}`)
+}
+
+// clientId: 1 id hoặc mảng id (gửi gộp nhiều client trong 1 request)
 export async function heartbeat(clientId){
-  return request('/monitor/heartbeat', { method: 'POST', body: JSON.stringify({ client_id: clientId }) })
+  const body = Array.isArray(clientId) ? { client_ids: clientId } : { client_id: clientId }
+  return request('/monitor/heartbeat', { method: 'POST', body: JSON.stringify(body) })
 }